@@ -2,6 +2,8 @@
 ASGI config for backend project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
+WebSocket connections to ``/ws/interaccion/`` go to the streaming voice
+interaction; everything else is served by Django.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/6.0/howto/deployment/asgi/
@@ -13,4 +15,16 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'backend.settings')
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+from chatbot.websocket import RUTA as RUTA_INTERACCION, interaccion_websocket  # noqa: E402
+
+
+async def application(scope, receive, send):
+    if scope['type'] == 'websocket':
+        if scope['path'] == RUTA_INTERACCION:
+            return await interaccion_websocket(scope, receive, send)
+        await receive()
+        await send({'type': 'websocket.close', 'code': 1000})
+        return
+    return await django_application(scope, receive, send)
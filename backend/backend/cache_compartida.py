@@ -0,0 +1,598 @@
+"""
+Caché de Django compartida por todos los workers de un nodo, sin Redis.
+
+Los datos viven en un archivo mapeado en memoria (``mmap``) que cada proceso
+abre por su cuenta: lo que guarda un worker lo ven los demás, y cada entrada
+ocupa memoria una sola vez por nodo, no una vez por worker como con
+``LocMemCache``. Conviene que el archivo esté en ``/dev/shm`` (memoria, sin
+escrituras a disco).
+
+El archivo se organiza como memcached:
+
+- Una cabecera con los parámetros y contadores y, por cada clase de tamaño,
+  su lista LRU y su lista de bloques libres.
+- El índice, una tabla hash de ``CUBETAS`` cubetas. Cada cubeta apunta a la
+  primera entrada de su cadena.
+- Páginas de ``TAMANO_PAGINA`` bytes. La primera vez que una clase de tamaño
+  necesita espacio se le asigna una página, que se parte en bloques de ese
+  tamaño. Cada entrada (cabecera, clave y valor serializado con pickle) ocupa
+  un bloque de la menor clase en la que cabe.
+
+Si la clase no tiene bloques libres ni quedan páginas sin asignar, se desaloja
+la entrada de esa clase usada hace más tiempo. Si la clase no tiene entradas,
+se le pasa una página de la clase con más páginas.
+
+Cada operación bloquea el archivo con ``fcntl.flock``. Si un proceso muere a
+mitad de una escritura, el siguiente que toma el bloqueo encuentra la marca de
+escritura en curso y vacía la caché; los datos son descartables. Sin ``fcntl``
+(Windows) el bloqueo es solo entre los hilos de un proceso, que alcanza para
+``runserver``.
+"""
+import bisect
+import hashlib
+import mmap
+import os
+import pickle
+import struct
+import threading
+import time
+from contextlib import contextmanager
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+from django.core.exceptions import ImproperlyConfigured
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+MAGICO = b'AVICACH1'
+TAMANO_BYTES = 64 * 1024 * 1024
+TAMANO_PAGINA = 1024 * 1024
+BLOQUE_MINIMO = 128
+FACTOR_CLASES = 1.25
+
+# mágico, tamaño total, tamaño de página, cubetas, clases, páginas, páginas asignadas,
+# escritura en curso, entradas, aciertos, fallos, desalojos
+CABECERA = struct.Struct('<8sQIIIIIIQQQQ')
+H_ASIGNADAS, H_EN_CURSO, H_ENTRADAS, H_ACIERTOS, H_FALLOS, H_DESALOJOS = 32, 36, 40, 48, 56, 64
+
+# Por clase: tamaño de bloque, páginas, entrada más reciente y más antigua de la LRU, primer bloque libre
+CLASE = struct.Struct('<IIQQQ')
+C_PAGINAS, C_RECIENTE, C_ANTIGUA, C_LIBRE = 4, 8, 16, 24
+
+# Por entrada: siguiente en la cubeta, anterior y siguiente en la LRU (el siguiente también
+# encadena los bloques libres), hash de la clave, expiración (0: nunca), largo de la clave,
+# largo del valor, en uso
+ENTRADA = struct.Struct('<QQQQdIII4x')
+E_CUBETA, E_ANTERIOR, E_SIGUIENTE, E_HASH, E_EXPIRA, E_CLAVE, E_VALOR, E_USO = 0, 8, 16, 24, 32, 40, 44, 48
+
+U32 = struct.Struct('<I')
+U64 = struct.Struct('<Q')
+F64 = struct.Struct('<d')
+
+
+def _alinear(valor, multiplo):
+    return (valor + multiplo - 1) // multiplo * multiplo
+
+
+def tamanos_de_clase(tamano_pagina):
+    """Tamaños de bloque de cada clase: crecen un 25 % hasta media página, más una página entera."""
+    tamanos = []
+    tamano = BLOQUE_MINIMO
+    while tamano <= tamano_pagina // 2:
+        tamanos.append(tamano)
+        tamano = _alinear(int(tamano * FACTOR_CLASES), 8)
+    tamanos.append(tamano_pagina)
+    return tamanos
+
+
+def hash_clave(clave):
+    # Igual en todos los procesos (hash() de Python cambia en cada uno)
+    return int.from_bytes(hashlib.blake2b(clave, digest_size=8).digest(), 'little')
+
+
+class ArchivoCache:
+    """
+    Las estructuras de la caché sobre el archivo mapeado. Los métodos públicos
+    toman el bloqueo; los privados suponen que ya está tomado.
+    """
+
+    def __init__(self, ruta, tamano=TAMANO_BYTES, tamano_pagina=TAMANO_PAGINA, cubetas=None):
+        self.ruta = os.fspath(ruta)
+        self.tamano = tamano
+        self.tamano_pagina = tamano_pagina
+        self.tamanos = tamanos_de_clase(tamano_pagina)
+        self.cubetas = cubetas or max(1024, tamano // 1024)
+
+        self._off_clases = CABECERA.size
+        self._off_tabla_paginas = self._off_clases + len(self.tamanos) * CLASE.size
+        maximo_paginas = tamano // tamano_pagina
+        self._off_cubetas = _alinear(self._off_tabla_paginas + maximo_paginas, 8)
+        self._inicio_paginas = _alinear(self._off_cubetas + self.cubetas * U64.size, mmap.PAGESIZE)
+        self.paginas = (tamano - self._inicio_paginas) // tamano_pagina
+        if self.paginas < 1:
+            raise ImproperlyConfigured(
+                f'La caché compartida necesita más de {self._inicio_paginas + tamano_pagina} bytes'
+            )
+
+        self._lock = threading.Lock()
+        self._fd = None
+        self._mm = None
+        self._pid = None
+        self._inodo = None
+
+    # Archivo y bloqueo
+
+    @staticmethod
+    def _bloquear(fd):
+        if fcntl is not None:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+
+    @staticmethod
+    def _desbloquear(fd):
+        if fcntl is not None:
+            fcntl.flock(fd, fcntl.LOCK_UN)
+
+    def _cabecera_esperada(self):
+        return CABECERA.pack(
+            MAGICO, self.tamano, self.tamano_pagina, self.cubetas, len(self.tamanos), self.paginas, 0, 0, 0, 0, 0, 0
+        )[:32]
+
+    def _cerrar(self):
+        if self._mm is not None:
+            self._mm.close()
+        if self._fd is not None:
+            os.close(self._fd)
+        self._mm = self._fd = None
+
+    def _abrir(self):
+        """Abre (o crea) el archivo; si es de otra configuración, lo reemplaza por uno nuevo."""
+        self._cerrar()
+        while True:
+            fd = os.open(self.ruta, os.O_RDWR | os.O_CREAT, 0o600)
+            self._bloquear(fd)
+            mm = None
+            try:
+                tamano_actual = os.fstat(fd).st_size
+                if tamano_actual == 0:
+                    os.ftruncate(fd, self.tamano)
+                    mm = mmap.mmap(fd, self.tamano)
+                    self._mm = mm
+                    self._inicializar()
+                elif tamano_actual == self.tamano:
+                    mm = mmap.mmap(fd, self.tamano)
+                    if mm[:32] != self._cabecera_esperada():
+                        mm.close()
+                        mm = None
+            finally:
+                self._desbloquear(fd)
+            if mm is not None:
+                break
+            # Otro tamaño o formato: los procesos que lo tienen abierto lo notan por el inodo
+            os.close(fd)
+            try:
+                os.unlink(self.ruta)
+            except FileNotFoundError:
+                pass
+        self._fd = fd
+        self._mm = mm
+        self._pid = os.getpid()
+        self._inodo = os.fstat(fd).st_ino
+
+    def _vigente(self):
+        try:
+            return os.stat(self.ruta).st_ino == self._inodo
+        except FileNotFoundError:
+            return False
+
+    @contextmanager
+    def bloqueado(self):
+        """Bloqueo exclusivo del archivo, entre hilos y entre procesos."""
+        with self._lock:
+            # Tras un fork el descriptor heredado comparte el bloqueo con el padre
+            if self._pid != os.getpid():
+                self._abrir()
+            while True:
+                self._bloquear(self._fd)
+                if self._vigente():
+                    break
+                self._desbloquear(self._fd)
+                self._abrir()
+            try:
+                if self._u32(H_EN_CURSO):
+                    self._inicializar()
+                self._escribir_u32(H_EN_CURSO, 1)
+                yield
+                self._escribir_u32(H_EN_CURSO, 0)
+            finally:
+                self._desbloquear(self._fd)
+
+    # Lectura y escritura de campos
+
+    def _u32(self, offset):
+        return U32.unpack_from(self._mm, offset)[0]
+
+    def _escribir_u32(self, offset, valor):
+        U32.pack_into(self._mm, offset, valor)
+
+    def _u64(self, offset):
+        return U64.unpack_from(self._mm, offset)[0]
+
+    def _escribir_u64(self, offset, valor):
+        U64.pack_into(self._mm, offset, valor)
+
+    def _sumar(self, offset, delta):
+        self._escribir_u64(offset, self._u64(offset) + delta)
+
+    def _clase(self, indice):
+        return self._off_clases + indice * CLASE.size
+
+    def _clase_de(self, entrada):
+        pagina = (entrada - self._inicio_paginas) // self.tamano_pagina
+        return self._clase(self._mm[self._off_tabla_paginas + pagina] - 1)
+
+    def _cubeta(self, hash_):
+        return self._off_cubetas + hash_ % self.cubetas * U64.size
+
+    def _clave(self, entrada):
+        inicio = entrada + ENTRADA.size
+        return self._mm[inicio:inicio + self._u32(entrada + E_CLAVE)]
+
+    def _valor(self, entrada):
+        inicio = entrada + ENTRADA.size + self._u32(entrada + E_CLAVE)
+        return self._mm[inicio:inicio + self._u32(entrada + E_VALOR)]
+
+    # Estructuras
+
+    def _inicializar(self):
+        self._mm[:self._inicio_paginas] = bytes(self._inicio_paginas)
+        CABECERA.pack_into(
+            self._mm, 0,
+            MAGICO, self.tamano, self.tamano_pagina, self.cubetas, len(self.tamanos), self.paginas, 0, 0, 0, 0, 0, 0
+        )
+        for indice, tamano in enumerate(self.tamanos):
+            CLASE.pack_into(self._mm, self._clase(indice), tamano, 0, 0, 0, 0)
+
+    def _buscar(self, clave, hash_):
+        entrada = self._u64(self._cubeta(hash_))
+        while entrada:
+            if self._u64(entrada + E_HASH) == hash_ and self._clave(entrada) == clave:
+                return entrada
+            entrada = self._u64(entrada + E_CUBETA)
+        return 0
+
+    def _quitar_de_lru(self, clase, entrada):
+        anterior = self._u64(entrada + E_ANTERIOR)
+        siguiente = self._u64(entrada + E_SIGUIENTE)
+        if anterior:
+            self._escribir_u64(anterior + E_SIGUIENTE, siguiente)
+        else:
+            self._escribir_u64(clase + C_RECIENTE, siguiente)
+        if siguiente:
+            self._escribir_u64(siguiente + E_ANTERIOR, anterior)
+        else:
+            self._escribir_u64(clase + C_ANTIGUA, anterior)
+
+    def _poner_primera(self, clase, entrada):
+        reciente = self._u64(clase + C_RECIENTE)
+        self._escribir_u64(entrada + E_ANTERIOR, 0)
+        self._escribir_u64(entrada + E_SIGUIENTE, reciente)
+        if reciente:
+            self._escribir_u64(reciente + E_ANTERIOR, entrada)
+        else:
+            self._escribir_u64(clase + C_ANTIGUA, entrada)
+        self._escribir_u64(clase + C_RECIENTE, entrada)
+
+    def _liberar(self, clase, bloque):
+        self._escribir_u32(bloque + E_USO, 0)
+        self._escribir_u64(bloque + E_SIGUIENTE, self._u64(clase + C_LIBRE))
+        self._escribir_u64(clase + C_LIBRE, bloque)
+
+    def _eliminar(self, entrada):
+        """Saca ``entrada`` de su cubeta y de la LRU y libera su bloque."""
+        cubeta = self._cubeta(self._u64(entrada + E_HASH))
+        siguiente = self._u64(entrada + E_CUBETA)
+        actual = self._u64(cubeta)
+        if actual == entrada:
+            self._escribir_u64(cubeta, siguiente)
+        else:
+            while self._u64(actual + E_CUBETA) != entrada:
+                actual = self._u64(actual + E_CUBETA)
+            self._escribir_u64(actual + E_CUBETA, siguiente)
+        clase = self._clase_de(entrada)
+        self._quitar_de_lru(clase, entrada)
+        self._liberar(clase, entrada)
+        self._sumar(H_ENTRADAS, -1)
+
+    def _partir_pagina(self, pagina, indice):
+        clase = self._clase(indice)
+        tamano = self.tamanos[indice]
+        self._mm[self._off_tabla_paginas + pagina] = indice + 1
+        self._escribir_u32(clase + C_PAGINAS, self._u32(clase + C_PAGINAS) + 1)
+        base = self._inicio_paginas + pagina * self.tamano_pagina
+        # Al revés, para que la lista de libres quede en orden de dirección
+        for bloque in range(base + (self.tamano_pagina // tamano - 1) * tamano, base - 1, -tamano):
+            self._liberar(clase, bloque)
+
+    def _reasignar_pagina(self, indice):
+        """Pasa a la clase ``indice`` una página de la clase con más páginas; ``False`` si no hay."""
+        paginas = [self._u32(self._clase(i) + C_PAGINAS) if i != indice else 0 for i in range(len(self.tamanos))]
+        donante = max(range(len(paginas)), key=paginas.__getitem__)
+        if not paginas[donante]:
+            return False
+        clase = self._clase(donante)
+        # La página de la entrada más antigua de la donante o, si no tiene entradas, cualquiera suya
+        antigua = self._u64(clase + C_ANTIGUA)
+        if antigua:
+            pagina = (antigua - self._inicio_paginas) // self.tamano_pagina
+        else:
+            pagina = self._mm.find(bytes([donante + 1]), self._off_tabla_paginas, self._off_tabla_paginas + self.paginas)
+            pagina -= self._off_tabla_paginas
+        inicio = self._inicio_paginas + pagina * self.tamano_pagina
+        fin = inicio + self.tamano_pagina
+        tamano = self.tamanos[donante]
+        for bloque in range(inicio, inicio + self.tamano_pagina // tamano * tamano, tamano):
+            if self._u32(bloque + E_USO):
+                self._eliminar(bloque)
+                self._sumar(H_DESALOJOS, 1)
+
+        # Los bloques de la página salen de la lista de libres de la donante
+        anterior, bloque = 0, self._u64(clase + C_LIBRE)
+        while bloque:
+            siguiente = self._u64(bloque + E_SIGUIENTE)
+            if inicio <= bloque < fin:
+                if anterior:
+                    self._escribir_u64(anterior + E_SIGUIENTE, siguiente)
+                else:
+                    self._escribir_u64(clase + C_LIBRE, siguiente)
+            else:
+                anterior = bloque
+            bloque = siguiente
+        self._escribir_u32(clase + C_PAGINAS, paginas[donante] - 1)
+        self._partir_pagina(pagina, indice)
+        return True
+
+    def _asignar(self, indice):
+        """Un bloque libre de la clase ``indice`` (desaloja si hace falta); 0 si no se consigue."""
+        clase = self._clase(indice)
+        while True:
+            bloque = self._u64(clase + C_LIBRE)
+            if bloque:
+                self._escribir_u64(clase + C_LIBRE, self._u64(bloque + E_SIGUIENTE))
+                return bloque
+            asignadas = self._u32(H_ASIGNADAS)
+            if asignadas < self.paginas:
+                self._escribir_u32(H_ASIGNADAS, asignadas + 1)
+                self._partir_pagina(asignadas, indice)
+                continue
+            antigua = self._u64(clase + C_ANTIGUA)
+            if antigua:
+                self._eliminar(antigua)
+                self._sumar(H_DESALOJOS, 1)
+                continue
+            if not self._reasignar_pagina(indice):
+                return 0
+
+    def _vigente_en(self, entrada, ahora):
+        expira = F64.unpack_from(self._mm, entrada + E_EXPIRA)[0]
+        return not expira or expira > ahora
+
+    def _leer(self, clave, hash_, ahora):
+        entrada = self._buscar(clave, hash_)
+        if entrada and not self._vigente_en(entrada, ahora):
+            self._eliminar(entrada)
+            entrada = 0
+        if not entrada:
+            self._sumar(H_FALLOS, 1)
+            return None
+        clase = self._clase_de(entrada)
+        if self._u64(clase + C_RECIENTE) != entrada:
+            self._quitar_de_lru(clase, entrada)
+            self._poner_primera(clase, entrada)
+        self._sumar(H_ACIERTOS, 1)
+        return self._valor(entrada)
+
+    def _escribir(self, clave, hash_, valor, expira):
+        tamano = ENTRADA.size + len(clave) + len(valor)
+        indice = bisect.bisect_left(self.tamanos, tamano)
+        entrada = self._buscar(clave, hash_)
+        if entrada and (indice == len(self.tamanos) or self._clase_de(entrada) != self._clase(indice)):
+            self._eliminar(entrada)
+            entrada = 0
+        if indice == len(self.tamanos):
+            # No cabe ni en una página: como memcached, no se guarda
+            return False
+
+        clase = self._clase(indice)
+        if entrada:
+            self._quitar_de_lru(clase, entrada)
+        else:
+            entrada = self._asignar(indice)
+            if not entrada:
+                return False
+            cubeta = self._cubeta(hash_)
+            self._escribir_u64(entrada + E_CUBETA, self._u64(cubeta))
+            self._escribir_u64(cubeta, entrada)
+            self._sumar(H_ENTRADAS, 1)
+        F64.pack_into(self._mm, entrada + E_EXPIRA, expira or 0.0)
+        U64.pack_into(self._mm, entrada + E_HASH, hash_)
+        U32.pack_into(self._mm, entrada + E_CLAVE, len(clave))
+        U32.pack_into(self._mm, entrada + E_VALOR, len(valor))
+        U32.pack_into(self._mm, entrada + E_USO, 1)
+        inicio = entrada + ENTRADA.size
+        self._mm[inicio:inicio + tamano - ENTRADA.size] = clave + valor
+        self._poner_primera(clase, entrada)
+        return True
+
+    # Operaciones
+
+    def leer(self, clave, ahora):
+        """Valor guardado bajo ``clave`` o ``None`` si no está o expiró."""
+        hash_ = hash_clave(clave)
+        with self.bloqueado():
+            return self._leer(clave, hash_, ahora)
+
+    def leer_varias(self, claves, ahora):
+        """``{clave: valor}`` de las ``claves`` presentes, con un solo bloqueo."""
+        hashes = [hash_clave(clave) for clave in claves]
+        with self.bloqueado():
+            valores = {clave: self._leer(clave, hash_, ahora) for clave, hash_ in zip(claves, hashes)}
+        return {clave: valor for clave, valor in valores.items() if valor is not None}
+
+    def escribir(self, clave, valor, expira, solo_si_falta=False, ahora=None):
+        """Guarda ``valor``; ``False`` si no cabe o, con ``solo_si_falta``, si ya estaba."""
+        hash_ = hash_clave(clave)
+        with self.bloqueado():
+            if solo_si_falta:
+                entrada = self._buscar(clave, hash_)
+                if entrada and self._vigente_en(entrada, ahora):
+                    return False
+            return self._escribir(clave, hash_, valor, expira)
+
+    def actualizar(self, clave, funcion, ahora):
+        """
+        Reemplaza el valor por ``funcion(valor)`` sin soltar el bloqueo y lo
+        devuelve; ``None`` si la clave no está (o el nuevo valor no cabe).
+        """
+        hash_ = hash_clave(clave)
+        error = None
+        with self.bloqueado():
+            entrada = self._buscar(clave, hash_)
+            if not entrada or not self._vigente_en(entrada, ahora):
+                return None
+            expira = F64.unpack_from(self._mm, entrada + E_EXPIRA)[0]
+            try:
+                valor = funcion(self._valor(entrada))
+            except Exception as exc:
+                # Sin propagarla dentro del bloqueo: dejaría la marca de escritura en curso
+                error = exc
+            else:
+                return valor if self._escribir(clave, hash_, valor, expira) else None
+        raise error
+
+    def tocar(self, clave, expira, ahora):
+        hash_ = hash_clave(clave)
+        with self.bloqueado():
+            entrada = self._buscar(clave, hash_)
+            if not entrada or not self._vigente_en(entrada, ahora):
+                return False
+            F64.pack_into(self._mm, entrada + E_EXPIRA, expira or 0.0)
+            return True
+
+    def contiene(self, clave, ahora):
+        hash_ = hash_clave(clave)
+        with self.bloqueado():
+            entrada = self._buscar(clave, hash_)
+            return bool(entrada) and self._vigente_en(entrada, ahora)
+
+    def borrar(self, clave):
+        hash_ = hash_clave(clave)
+        with self.bloqueado():
+            entrada = self._buscar(clave, hash_)
+            if entrada:
+                self._eliminar(entrada)
+            return bool(entrada)
+
+    def vaciar(self):
+        with self.bloqueado():
+            self._inicializar()
+
+    def estadisticas(self):
+        with self.bloqueado():
+            _, tamano, tamano_pagina, _, _, paginas, asignadas, _, entradas, aciertos, fallos, desalojos = (
+                CABECERA.unpack_from(self._mm, 0)
+            )
+        return {
+            'tamano': tamano,
+            'paginas': paginas,
+            'paginas_asignadas': asignadas,
+            'entradas': entradas,
+            'aciertos': aciertos,
+            'fallos': fallos,
+            'desalojos': desalojos,
+        }
+
+
+# Un ArchivoCache por ruta y proceso: Django crea una instancia del backend por hilo
+_archivos = {}
+_archivos_lock = threading.Lock()
+
+
+def obtener_archivo(ruta, tamano, tamano_pagina, cubetas):
+    with _archivos_lock:
+        archivo = _archivos.get(ruta)
+        if archivo is None or (archivo.tamano, archivo.tamano_pagina) != (tamano, tamano_pagina):
+            archivo = _archivos[ruta] = ArchivoCache(ruta, tamano, tamano_pagina, cubetas)
+        return archivo
+
+
+class CacheMemoriaCompartida(BaseCache):
+    """
+    Backend de caché de Django sobre ``ArchivoCache``. ``LOCATION`` es la ruta
+    del archivo; ``OPTIONS`` acepta ``TAMANO_BYTES`` (tamaño del archivo),
+    ``TAMANO_PAGINA`` (tamaño máximo de una entrada) y ``CUBETAS`` (del índice).
+    """
+    pickle_protocol = pickle.HIGHEST_PROTOCOL
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        if not location:
+            raise ImproperlyConfigured('CacheMemoriaCompartida necesita la ruta del archivo en LOCATION')
+        opciones = params.get('OPTIONS', {})
+        self._archivo = obtener_archivo(
+            location,
+            int(opciones.get('TAMANO_BYTES', TAMANO_BYTES)),
+            int(opciones.get('TAMANO_PAGINA', TAMANO_PAGINA)),
+            int(opciones.get('CUBETAS', 0)) or None,
+        )
+
+    def _clave(self, key, version):
+        return self.make_and_validate_key(key, version=version).encode()
+
+    def _expira(self, timeout):
+        # None: no expira. Con timeout=0 Django devuelve un instante ya pasado
+        return self.get_backend_timeout(timeout)
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        valor = pickle.dumps(value, self.pickle_protocol)
+        return self._archivo.escribir(
+            self._clave(key, version), valor, self._expira(timeout), solo_si_falta=True, ahora=time.time()
+        )
+
+    def get(self, key, default=None, version=None):
+        valor = self._archivo.leer(self._clave(key, version), time.time())
+        return default if valor is None else pickle.loads(valor)
+
+    def get_many(self, keys, version=None):
+        claves = {self._clave(key, version): key for key in keys}
+        valores = self._archivo.leer_varias(list(claves), time.time())
+        return {claves[clave]: pickle.loads(valor) for clave, valor in valores.items()}
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self._archivo.escribir(self._clave(key, version), pickle.dumps(value, self.pickle_protocol), self._expira(timeout))
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        return self._archivo.tocar(self._clave(key, version), self._expira(timeout), time.time())
+
+    def incr(self, key, delta=1, version=None):
+        """Atómico entre procesos: se lee y se escribe sin soltar el bloqueo."""
+        def sumar(valor):
+            return pickle.dumps(pickle.loads(valor) + delta, self.pickle_protocol)
+
+        valor = self._archivo.actualizar(self._clave(key, version), sumar, time.time())
+        if valor is None:
+            raise ValueError(f"Key '{key}' not found")
+        return pickle.loads(valor)
+
+    def has_key(self, key, version=None):
+        return self._archivo.contiene(self._clave(key, version), time.time())
+
+    def delete(self, key, version=None):
+        return self._archivo.borrar(self._clave(key, version))
+
+    def clear(self):
+        self._archivo.vaciar()
+
+    def estadisticas(self):
+        return self._archivo.estadisticas()
@@ -5,6 +5,7 @@ Configuración para el sistema de aprendizaje de inglés con Avatar 3D.
 """
 
 import os
+import tempfile
 from pathlib import Path
 from datetime import timedelta
 import dj_database_url
@@ -118,11 +119,37 @@ AUTH_PASSWORD_VALIDATORS = [
     },
 ]
 
+# Hash de contraseñas: PBKDF2 de Django calculado en un pool acotado (users/hashers.py).
+# Reemplaza a PBKDF2PasswordHasher (mismo algoritmo): no deben estar los dos
+PASSWORD_HASHERS = [
+    'users.hashers.PBKDF2PoolHasher',
+    'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+    'django.contrib.auth.hashers.Argon2PasswordHasher',
+    'django.contrib.auth.hashers.BCryptSHA256PasswordHasher',
+    'django.contrib.auth.hashers.ScryptPasswordHasher',
+]
+
+# Hilos de petición por worker: debe coincidir con --threads de gunicorn (ver README)
+WORKER_HILOS = int(os.environ.get('WORKER_HILOS', '8'))
+# Hilos de hash por worker y hashes en curso o en espera antes de responder 503 con Retry-After.
+# Cada hilo de petición espera a lo sumo un hash, así que el límite debe quedar por debajo de
+# WORKER_HILOS; por defecto la mitad, y los demás hilos siguen atendiendo el resto de la API
+PASSWORD_HASH_HILOS = int(os.environ.get('PASSWORD_HASH_HILOS', str(os.cpu_count() or 2)))
+PASSWORD_HASH_COLA_MAX = int(os.environ.get('PASSWORD_HASH_COLA_MAX', str(max(1, WORKER_HILOS // 2))))
+
+# Importación masiva de estudiantes (users/importacion.py): filas por lote y iteraciones PBKDF2
+# de las contraseñas iniciales (Django las sube a las de PBKDF2PasswordHasher en el primer login).
+# Hasta ese primer login el hash es más débil que el de una cuenta normal: no bajar de la cifra
+# por defecto y pedir a los estudiantes importados que entren (o cambien la contraseña) pronto
+IMPORTACION_LOTE = int(os.environ.get('IMPORTACION_LOTE', '1000'))
+IMPORTACION_HASH_ITERACIONES = int(os.environ.get('IMPORTACION_HASH_ITERACIONES', '50000'))
+
 
 # Django REST Framework Configuration
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        # JWT con tipo de usuario y perfil en los claims: sin consultas por petición
+        'users.autenticacion.AutenticacionJWT',
         'rest_framework.authentication.SessionAuthentication',
     ],
     'DEFAULT_PERMISSION_CLASSES': [
@@ -138,11 +165,19 @@ SIMPLE_JWT = {
     'ACCESS_TOKEN_LIFETIME': timedelta(hours=24),
     'REFRESH_TOKEN_LIFETIME': timedelta(days=7),
     'ROTATE_REFRESH_TOKENS': True,
+    # Sin la app token_blacklist: la revocación la hace users/revocacion.py
     'BLACKLIST_AFTER_ROTATION': True,
     'AUTH_HEADER_TYPES': ('Bearer',),
     'AUTH_TOKEN_CLASSES': ('rest_framework_simplejwt.tokens.AccessToken',),
+    'TOKEN_REFRESH_SERIALIZER': 'users.serializers.TokenRefrescoSerializer',
 }
 
+# Revocación de tokens: cada worker relee los JTI revocados cada REVOCACION_REFRESCO_S
+# y reconstruye su filtro de Bloom cada REVOCACION_RECONSTRUCCION_S (descarta los expirados)
+REVOCACION_REFRESCO_S = int(os.environ.get('REVOCACION_REFRESCO_S', '5'))
+REVOCACION_RECONSTRUCCION_S = int(os.environ.get('REVOCACION_RECONSTRUCCION_S', '600'))
+REVOCACION_BLOOM_CAPACIDAD = int(os.environ.get('REVOCACION_BLOOM_CAPACIDAD', '100000'))
+
 
 # CORS Configuration - Permitir frontend React/Vite y Ngrok
 CORS_ALLOW_ALL_ORIGINS = True
@@ -173,5 +208,58 @@ MEDIA_URL = 'media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
 
+# Pipeline de servicios del agente (ASR, NLP, TTS)
+# Hilos compartidos para ejecutar en paralelo las etapas independientes
+PIPELINE_MAX_WORKERS = int(os.environ.get('PIPELINE_MAX_WORKERS', '8'))
+# Espera máxima de una etapa por un hilo libre; su timeout corre desde que arranca
+PIPELINE_ESPERA_COLA_MS = int(os.environ.get('PIPELINE_ESPERA_COLA_MS', '5000'))
+
+# Caché del audio TTS: archivos bajo MEDIA_ROOT y un LRU en memoria limitado por bytes
+TTS_CACHE_DIR = MEDIA_ROOT / 'tts_cache'
+TTS_CACHE_MEMORIA_BYTES = int(os.environ.get('TTS_CACHE_MEMORIA_BYTES', str(32 * 1024 * 1024)))
+
+# Servidor ASR compartido (manage.py servidor_asr): una copia del modelo para todos los workers
+ASR_SOCKET_PATH = os.environ.get('ASR_SOCKET_PATH', '/tmp/avi-asr.sock')
+
+# ASR incremental (/ws/interaccion/): silencio tras la voz que cierra la frase
+# y energía RMS (PCM16) a partir de la cual una ventana de 20 ms cuenta como voz
+ASR_COLA_SILENCIO_MS = int(os.environ.get('ASR_COLA_SILENCIO_MS', '600'))
+ASR_UMBRAL_VOZ = int(os.environ.get('ASR_UMBRAL_VOZ', '500'))
+
+# Micro-lotes de inferencia: con peticiones concurrentes, cada lote espera hasta
+# INFERENCIA_LOTE_ESPERA_MS a que lleguen más, hasta INFERENCIA_LOTE_MAX por lote
+INFERENCIA_LOTE_ESPERA_MS = int(os.environ.get('INFERENCIA_LOTE_ESPERA_MS', '20'))
+INFERENCIA_LOTE_MAX = int(os.environ.get('INFERENCIA_LOTE_MAX', '8'))
+
+
+# Audio del estudiante: tamaño máximo por clip. Hasta FILE_UPLOAD_MAX_MEMORY_SIZE
+# se mantiene en memoria; por encima se vuelca a un archivo temporal.
+AUDIO_MAX_BYTES = int(os.environ.get('AUDIO_MAX_BYTES', str(25 * 1024 * 1024)))
+
+# Máximo de frases por lote en /api/interaccion/lote/
+INTERACCION_LOTE_MAX = int(os.environ.get('INTERACCION_LOTE_MAX', '50'))
+
+# Agentes y configuración de servicios en memoria (chatbot/catalogo.py): cada worker revisa
+# la versión compartida cada CATALOGO_REFRESCO_S y recarga igual cada CATALOGO_RECARGA_S
+CATALOGO_REFRESCO_S = int(os.environ.get('CATALOGO_REFRESCO_S', '5'))
+CATALOGO_RECARGA_S = int(os.environ.get('CATALOGO_RECARGA_S', '300'))
+
+
+# Caché de Django compartida por todos los workers del nodo, sin Redis: un archivo mapeado
+# en memoria (backend/cache_compartida.py). En /dev/shm si existe, para no escribir a disco
+CACHES = {
+    'default': {
+        'BACKEND': 'backend.cache_compartida.CacheMemoriaCompartida',
+        'LOCATION': os.environ.get(
+            'CACHE_MMAP_RUTA',
+            os.path.join('/dev/shm' if os.path.isdir('/dev/shm') else tempfile.gettempdir(), 'avi-cache.mmap')
+        ),
+        'OPTIONS': {
+            'TAMANO_BYTES': int(os.environ.get('CACHE_MMAP_BYTES', str(64 * 1024 * 1024))),
+        },
+    }
+}
+
+
 # Default primary key field type
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
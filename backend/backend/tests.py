@@ -0,0 +1,163 @@
+"""
+Tests del proyecto (caché compartida).
+"""
+import multiprocessing
+import os
+import shutil
+import tempfile
+
+from django.test import SimpleTestCase
+
+from .cache_compartida import ENTRADA, H_EN_CURSO, ArchivoCache, CacheMemoriaCompartida, tamanos_de_clase
+
+PAGINA = 4096
+
+
+def crear_cache(ruta):
+    return CacheMemoriaCompartida(ruta, {'OPTIONS': {'TAMANO_BYTES': 8 * PAGINA, 'TAMANO_PAGINA': PAGINA}})
+
+
+def _sumar_en_otro_proceso(ruta, veces):
+    cache = crear_cache(ruta)
+    for _ in range(veces):
+        cache.incr('contador')
+
+
+def _morir_a_mitad_de_escritura(ruta):
+    archivo = ArchivoCache(ruta, 3 * PAGINA, PAGINA, cubetas=64)
+    with archivo.bloqueado():
+        os._exit(1)
+
+
+class CacheCompartidaTest(SimpleTestCase):
+    """Operaciones, expiración, desalojo y páginas de la caché sobre mmap."""
+
+    def setUp(self):
+        directorio = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directorio)
+        self.ruta = os.path.join(directorio, 'cache.mmap')
+
+    def archivo(self):
+        # La cabecera, la tabla de páginas y el índice ocupan los primeros 4 KiB: quedan dos páginas
+        archivo = ArchivoCache(self.ruta, 3 * PAGINA, PAGINA, cubetas=64)
+        self.assertEqual(archivo.paginas, 2)
+        return archivo
+
+    def cache(self):
+        return crear_cache(self.ruta)
+
+    def test_get_set_delete(self):
+        cache = self.cache()
+        self.assertIsNone(cache.get('clave'))
+        cache.set('clave', {'valor': [1, 2]})
+        self.assertEqual(cache.get('clave'), {'valor': [1, 2]})
+        self.assertTrue(cache.has_key('clave'))
+        self.assertFalse(cache.add('clave', 'otro'))
+        self.assertTrue(cache.add('nueva', 'otro'))
+        self.assertEqual(cache.get_many(['clave', 'nueva', 'falta']), {'clave': {'valor': [1, 2]}, 'nueva': 'otro'})
+
+        # Un valor más grande cambia de clase de tamaño
+        cache.set('clave', 'x' * 1000)
+        self.assertEqual(cache.get('clave'), 'x' * 1000)
+        self.assertTrue(cache.delete('clave'))
+        self.assertFalse(cache.delete('clave'))
+        self.assertIsNone(cache.get('clave'))
+        self.assertEqual(cache.estadisticas()['entradas'], 1)
+
+        # Otra instancia del backend (otro hilo) ve lo mismo
+        self.assertEqual(self.cache().get('nueva'), 'otro')
+        # Lo que no cabe en una página no se guarda
+        cache.set('grande', b'x' * PAGINA)
+        self.assertIsNone(cache.get('grande'))
+
+    def test_expiracion(self):
+        archivo = self.archivo()
+        archivo.escribir(b'clave', b'valor', expira=100.0)
+        archivo.escribir(b'siempre', b'valor', expira=None)
+        self.assertEqual(archivo.leer(b'clave', ahora=99.0), b'valor')
+        self.assertTrue(archivo.tocar(b'clave', 200.0, ahora=99.0))
+        self.assertEqual(archivo.leer(b'clave', ahora=150.0), b'valor')
+        self.assertIsNone(archivo.leer(b'clave', ahora=200.0))
+        self.assertEqual(archivo.leer(b'siempre', ahora=1e12), b'valor')
+        # La entrada vencida se eliminó al leerla
+        self.assertEqual(archivo.estadisticas()['entradas'], 1)
+        # Con expiración vencida, add puede ocupar la clave
+        archivo.escribir(b'vencida', b'vieja', expira=10.0)
+        self.assertTrue(archivo.escribir(b'vencida', b'nueva', expira=None, solo_si_falta=True, ahora=20.0))
+        self.assertEqual(archivo.leer(b'vencida', ahora=20.0), b'nueva')
+
+        cache = self.cache()
+        cache.set('cero', 'valor', timeout=0)
+        self.assertIsNone(cache.get('cero'))
+
+    def test_desalojo_lru_dentro_de_la_clase(self):
+        archivo = self.archivo()
+        por_pagina = PAGINA // tamanos_de_clase(PAGINA)[0]
+        claves = [f'k{i:03d}'.encode() for i in range(2 * por_pagina)]
+        for clave in claves:
+            self.assertTrue(archivo.escribir(clave, b'v', expira=None))
+        self.assertEqual(archivo.estadisticas()['paginas_asignadas'], 2)
+        self.assertEqual(archivo.estadisticas()['desalojos'], 0)
+
+        # Leer la más antigua la vuelve la más reciente: se desaloja la segunda
+        self.assertEqual(archivo.leer(claves[0], ahora=0.0), b'v')
+        archivo.escribir(b'nueva', b'v', expira=None)
+        self.assertEqual(archivo.estadisticas()['desalojos'], 1)
+        self.assertIsNone(archivo.leer(claves[1], ahora=0.0))
+        self.assertEqual(archivo.leer(claves[0], ahora=0.0), b'v')
+        self.assertEqual(archivo.leer(b'nueva', ahora=0.0), b'v')
+        self.assertEqual(archivo.estadisticas()['entradas'], 2 * por_pagina)
+
+    def test_reasignacion_de_pagina(self):
+        archivo = self.archivo()
+        por_pagina = PAGINA // tamanos_de_clase(PAGINA)[0]
+        claves = [f'k{i:03d}'.encode() for i in range(2 * por_pagina)]
+        for clave in claves:
+            archivo.escribir(clave, b'v', expira=None)
+
+        # Otra clase sin páginas libres toma la página de la entrada más antigua de la clase chica
+        grande = b'x' * (1000 - ENTRADA.size)
+        self.assertTrue(archivo.escribir(b'grande', grande, expira=None))
+        self.assertEqual(archivo.leer(b'grande', ahora=0.0), grande)
+        estadisticas = archivo.estadisticas()
+        self.assertEqual(estadisticas['desalojos'], por_pagina)
+        self.assertEqual(estadisticas['entradas'], por_pagina + 1)
+        self.assertTrue(all(archivo.leer(clave, ahora=0.0) is None for clave in claves[:por_pagina]))
+        self.assertTrue(all(archivo.leer(clave, ahora=0.0) == b'v' for clave in claves[por_pagina:]))
+
+        # La clase chica sigue funcionando con la página que le queda
+        self.assertTrue(archivo.escribir(b'otra', b'v', expira=None))
+        self.assertEqual(archivo.leer(b'otra', ahora=0.0), b'v')
+        self.assertEqual(archivo.leer(b'grande', ahora=0.0), grande)
+
+    def test_incr_entre_procesos(self):
+        cache = self.cache()
+        cache.set('contador', 0)
+        contexto = multiprocessing.get_context('fork')
+        procesos = [contexto.Process(target=_sumar_en_otro_proceso, args=(self.ruta, 200)) for _ in range(2)]
+        for proceso in procesos:
+            proceso.start()
+        for _ in range(200):
+            cache.incr('contador')
+        for proceso in procesos:
+            proceso.join(30)
+            self.assertEqual(proceso.exitcode, 0)
+        self.assertEqual(cache.get('contador'), 600)
+        with self.assertRaises(ValueError):
+            cache.incr('falta')
+
+    def test_reinicio_tras_escritura_interrumpida(self):
+        archivo = self.archivo()
+        archivo.escribir(b'clave', b'valor', expira=None)
+        # Un proceso muere con el bloqueo tomado: deja la marca de escritura en curso
+        proceso = multiprocessing.get_context('fork').Process(target=_morir_a_mitad_de_escritura, args=(self.ruta,))
+        proceso.start()
+        proceso.join(30)
+        self.assertEqual(proceso.exitcode, 1)
+        self.assertEqual(archivo._u32(H_EN_CURSO), 1)
+
+        self.assertIsNone(archivo.leer(b'clave', ahora=0.0))
+        self.assertEqual(archivo._u32(H_EN_CURSO), 0)
+        self.assertEqual(archivo.estadisticas()['entradas'], 0)
+        self.assertTrue(archivo.escribir(b'clave', b'nuevo', expira=None))
+        self.assertEqual(archivo.leer(b'clave', ahora=0.0), b'nuevo')
@@ -2,7 +2,10 @@
 Admin para la app Chatbot.
 """
 from django.contrib import admin
-from .models import AgenteVirtual, SesionPractica, Retroalimentacion, ConfiguracionServicio
+from .models import (
+    AgenteVirtual, SesionPractica, Retroalimentacion, TurnoConversacion, ConfiguracionServicio,
+    EstadisticasEstudiante
+)
 
 
 @admin.register(AgenteVirtual)
@@ -33,9 +36,25 @@ class RetroalimentacionAdmin(admin.ModelAdmin):
     date_hierarchy = 'created_at'
 
 
+@admin.register(TurnoConversacion)
+class TurnoConversacionAdmin(admin.ModelAdmin):
+    """Admin para el modelo TurnoConversacion."""
+    list_display = ['id', 'sesion', 'tipo', 'timestamp']
+    list_filter = ['tipo']
+    search_fields = ['texto']
+    raw_id_fields = ['sesion']
+
+
 @admin.register(ConfiguracionServicio)
 class ConfiguracionServicioAdmin(admin.ModelAdmin):
     """Admin para el modelo ConfiguracionServicio."""
     list_display = ['nombre_servicio', 'tipo', 'is_active', 'created_at']
     list_filter = ['tipo', 'is_active']
     search_fields = ['nombre_servicio']
+
+
+@admin.register(EstadisticasEstudiante)
+class EstadisticasEstudianteAdmin(admin.ModelAdmin):
+    """Admin para el modelo EstadisticasEstudiante."""
+    list_display = ['estudiante', 'sesiones_totales', 'sesiones_completadas', 'tiempo_total_minutos', 'updated_at']
+    raw_id_fields = ['estudiante']
@@ -0,0 +1,91 @@
+"""
+Recepción del audio del estudiante.
+
+El audio llega como archivo multipart, como cuerpo crudo ``audio/*`` (con
+Content-Length o con Transfer-Encoding: chunked) o, por compatibilidad, en
+base64 dentro del JSON. Los dos primeros caminos se leen por bloques en un
+archivo temporal que solo vive en memoria hasta ``FILE_UPLOAD_MAX_MEMORY_SIZE``,
+así la memoria por petición queda acotada sin importar la duración del clip.
+"""
+import base64
+import binascii
+import io
+import mimetypes
+import tempfile
+
+from django.conf import settings
+from django.core.files import File
+from rest_framework import status
+from rest_framework.exceptions import APIException, ParseError
+
+TAMAÑO_BLOQUE = 64 * 1024
+
+
+class AudioDemasiadoGrande(APIException):
+    status_code = status.HTTP_413_REQUEST_ENTITY_TOO_LARGE
+    default_detail = 'El audio excede el tamaño máximo permitido.'
+    default_code = 'audio_demasiado_grande'
+
+
+class AudioSinVoz(APIException):
+    status_code = status.HTTP_400_BAD_REQUEST
+    default_detail = 'No se detectó voz en el audio.'
+    default_code = 'audio_sin_voz'
+
+
+def es_audio_crudo(request):
+    """Indica si el cuerpo de la petición es directamente el audio (``audio/*``)."""
+    return request.content_type.split(';')[0].strip().startswith('audio/')
+
+
+def _flujo_entrada(request):
+    """
+    Flujo del cuerpo de la petición. Con Transfer-Encoding: chunked no hay
+    Content-Length, así que en WSGI se lee ``wsgi.input`` si el servidor
+    (gunicorn) indica que el flujo termina por sí solo.
+    """
+    django_request = request._request
+    meta = django_request.META
+    if (
+        'CONTENT_LENGTH' not in meta
+        and meta.get('HTTP_TRANSFER_ENCODING', '').lower() == 'chunked'
+        and meta.get('wsgi.input_terminated')
+    ):
+        return meta['wsgi.input']
+    return django_request
+
+
+def recibir_audio_crudo(request):
+    """Copia por bloques el cuerpo ``audio/*`` a un archivo temporal y lo devuelve como ``File``."""
+    flujo = _flujo_entrada(request)
+    archivo = tempfile.SpooledTemporaryFile(max_size=settings.FILE_UPLOAD_MAX_MEMORY_SIZE)
+    tamaño = 0
+    while True:
+        bloque = flujo.read(TAMAÑO_BLOQUE)
+        if not bloque:
+            break
+        tamaño += len(bloque)
+        if tamaño > settings.AUDIO_MAX_BYTES:
+            archivo.close()
+            raise AudioDemasiadoGrande()
+        archivo.write(bloque)
+    archivo.seek(0)
+
+    tipo = request.content_type.split(';')[0].strip()
+    audio = File(archivo, name=f'audio{mimetypes.guess_extension(tipo) or ".bin"}')
+    audio.size = tamaño
+    audio.content_type = tipo
+    return audio
+
+
+def decodificar_audio_base64(texto):
+    """Camino heredado: decodifica ``audio_base64`` a un flujo binario en memoria."""
+    if ',' in texto[:100] and texto.startswith('data:'):
+        texto = texto.split(',', 1)[1]
+    try:
+        contenido = base64.b64decode(texto, validate=False)
+    except (binascii.Error, ValueError):
+        raise ParseError('audio_base64 no es base64 válido.')
+    if len(contenido) > settings.AUDIO_MAX_BYTES:
+        raise AudioDemasiadoGrande()
+    return io.BytesIO(contenido)
@@ -0,0 +1,144 @@
+"""
+Caché en memoria de los agentes virtuales y de la configuración de servicios.
+
+Estas filas cambian pocas veces al año, pero se leían al crear cada sesión (el
+agente) y en cada interacción (la configuración del pipeline). Cada worker
+guarda una copia y las rutas calientes no consultan esas tablas.
+
+La copia lleva la versión del catálogo con la que se cargó. La versión vive en
+la caché compartida del nodo (``backend/cache_compartida.py``) y cambia al
+confirmarse el guardado o borrado de un ``AgenteVirtual`` o un
+``ConfiguracionServicio`` (señales). Cada worker compara su versión con la
+compartida cada ``CATALOGO_REFRESCO_S``: un cambio llega al worker que lo hizo
+de inmediato y a los demás del nodo en a lo sumo ese tiempo. Además, cada
+``CATALOGO_RECARGA_S`` la copia se recarga aunque la versión no haya cambiado,
+para los cambios que no pasan por las señales (``QuerySet.update``, otro nodo).
+
+Las instancias devueltas se comparten entre hilos: no deben modificarse.
+"""
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .models import AgenteVirtual, ConfiguracionServicio, SesionPractica
+
+CLAVE_VERSION = 'chatbot:catalogo:version'
+
+
+def _nueva_version():
+    # Distinta de las anteriores aunque la caché compartida se haya vaciado
+    return time.time_ns()
+
+
+class Catalogo:
+    """Copia de agentes y configuraciones del worker, con su versión."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._version = None
+        # (agentes, configuraciones), o None si hay que cargarlos; se reemplaza entero
+        self._datos = None
+        self._revisado = float('-inf')
+        self._cargado = float('-inf')
+
+    def _version_compartida(self):
+        version = cache.get(CLAVE_VERSION)
+        if version is None:
+            cache.add(CLAVE_VERSION, _nueva_version(), None)
+            version = cache.get(CLAVE_VERSION)
+        return version
+
+    def _cargar(self, version):
+        # motor.py importa este módulo
+        from .servicios.motor import cargar_configuraciones
+
+        agentes = {agente.pk: agente for agente in AgenteVirtual.objects.order_by('pk')}
+        self._datos = datos = (agentes, cargar_configuraciones())
+        self._version = version
+        self._cargado = time.monotonic()
+        return datos
+
+    def _vigentes(self):
+        """
+        ``(agentes, configuraciones)`` vigentes. Quien llama usa solo esta tupla:
+        ``descartar`` puede vaciar ``_datos`` en cualquier momento.
+        """
+        datos = self._datos
+        if datos is not None and time.monotonic() - self._revisado < settings.CATALOGO_REFRESCO_S:
+            return datos
+        with self._lock:
+            datos = self._datos
+            reloj = time.monotonic()
+            if datos is not None and reloj - self._revisado < settings.CATALOGO_REFRESCO_S:
+                return datos
+            # La versión se lee antes que las filas: un cambio confirmado durante la
+            # carga deja otra versión y se recarga en la próxima revisión
+            version = self._version_compartida()
+            if datos is None or version != self._version or reloj - self._cargado >= settings.CATALOGO_RECARGA_S:
+                datos = self._cargar(version)
+            self._revisado = time.monotonic()
+            return datos
+
+    def descartar(self):
+        self._datos = None
+
+    def agentes(self):
+        return self._vigentes()[0]
+
+    def configuraciones(self):
+        return self._vigentes()[1]
+
+
+_catalogo = Catalogo()
+
+
+def agente(agente_id):
+    """``AgenteVirtual`` con ese id, activo o no; ``None`` si no existe."""
+    try:
+        return _catalogo.agentes().get(int(agente_id))
+    except (TypeError, ValueError):
+        return None
+
+
+def agente_activo(agente_id=None):
+    """El agente activo ``agente_id`` o, sin id, el primero activo; ``None`` si no hay."""
+    if agente_id:
+        encontrado = agente(agente_id)
+        return encontrado if encontrado is not None and encontrado.is_active else None
+    return next((encontrado for encontrado in _catalogo.agentes().values() if encontrado.is_active), None)
+
+
+def adjuntar_agente(sesion):
+    """Deja el agente de ``sesion`` en su caché de relación, sin consultarlo."""
+    encontrado = agente(sesion.agente_id) if sesion.agente_id else None
+    if encontrado is not None:
+        SesionPractica.agente.field.set_cached_value(sesion, encontrado)
+    return sesion
+
+
+def configuraciones_servicio():
+    """``{etapa: configuracion}`` de los servicios activos (ver ``cargar_configuraciones``)."""
+    return _catalogo.configuraciones()
+
+
+def invalidar():
+    """Cambia la versión compartida y descarta la copia de este worker."""
+    try:
+        cache.incr(CLAVE_VERSION)
+    except ValueError:
+        cache.set(CLAVE_VERSION, _nueva_version(), None)
+    _catalogo.descartar()
+
+
+@receiver([post_save, post_delete], sender=AgenteVirtual)
+@receiver([post_save, post_delete], sender=ConfiguracionServicio)
+def _al_cambiar(sender, **kwargs):
+    # Este worker deja su copia ya; los demás, al confirmarse la transacción (antes
+    # podrían recargar las filas viejas con la versión nueva)
+    _catalogo.descartar()
+    transaction.on_commit(invalidar)
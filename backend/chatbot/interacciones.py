@@ -0,0 +1,206 @@
+"""
+Procesamiento de interacciones estudiante-agente.
+
+``evaluar_interaccion`` ejecuta el pipeline para una frase y arma la
+retroalimentación sin guardarla; ``guardar_interacciones`` persiste un lote
+ordenado de frases de una sesión con un ``bulk_create`` por tabla y un solo
+UPDATE de contadores. El endpoint individual es un lote de una frase, así que
+ambos caminos producen exactamente el mismo resultado por frase.
+
+``eventos_interaccion`` emite los resultados como Server-Sent Events a medida
+que cada etapa termina (transcripción, puntuaciones y errores, respuesta,
+audio) y al final la misma respuesta que el endpoint individual. Es un
+generador asíncrono: bajo ASGI (uvicorn) cada evento sale en cuanto está
+listo, sin broker; el pipeline corre en un hilo y publica en una cola asyncio.
+"""
+import asyncio
+import json
+import logging
+import time
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connections, transaction
+from django.db.models import F
+from django.utils import timezone
+from rest_framework.exceptions import APIException
+
+from .audio import AudioSinVoz
+from .models import Retroalimentacion, SesionPractica, TipoTurno, TurnoConversacion
+from .serializers import RetroalimentacionSerializer
+from .servicios import ContextoInteraccion
+
+logger = logging.getLogger(__name__)
+
+
+class ResultadoInteraccion:
+    """Resultado de evaluar una frase: retroalimentación sin guardar y datos de respuesta."""
+
+    def __init__(self, retroalimentacion, puntuacion_general, respuesta_audio_url, etapas_por_defecto=()):
+        self.retroalimentacion = retroalimentacion
+        self.puntuacion_general = puntuacion_general
+        self.respuesta_audio_url = respuesta_audio_url
+        # Etapas que fallaron o excedieron su timeout: su resultado es el por defecto
+        self.etapas_por_defecto = sorted(etapas_por_defecto)
+
+    @property
+    def correcta(self):
+        return self.puntuacion_general >= 70
+
+    @property
+    def emocion_avatar(self):
+        if self.puntuacion_general >= 90:
+            return 'feliz'
+        elif self.puntuacion_general >= 70:
+            return 'neutral'
+        elif self.puntuacion_general >= 50:
+            return 'pensativo'
+        return 'animando'
+
+    def como_respuesta(self):
+        """Cuerpo de respuesta de la interacción (una vez guardada la retroalimentación)."""
+        respuesta_agente = self.retroalimentacion.respuesta_agente
+        return {
+            'success': True,
+            'mensaje': 'Interacción procesada correctamente',
+            'retroalimentacion': RetroalimentacionSerializer(self.retroalimentacion).data,
+            'respuesta_texto': respuesta_agente,
+            'respuesta_audio_url': self.respuesta_audio_url,
+            'puntuacion_general': self.puntuacion_general,
+            'necesita_repetir': not self.correcta,
+            'emocion_avatar': self.emocion_avatar,
+            'animacion_avatar': 'hablar' if respuesta_agente else 'escuchar',
+            'etapas_por_defecto': self.etapas_por_defecto
+        }
+
+
+def evaluar_interaccion(motor, sesion, texto_estudiante='', texto_esperado='', audio=None, al_completar=None):
+    """
+    Ejecuta el pipeline para una frase y devuelve un ``ResultadoInteraccion``.
+    ``al_completar`` se pasa al motor para recibir cada etapa al terminar.
+    """
+    inicio = time.time()
+
+    # Pipeline de servicios: ASR -> (pronunciación | gramática | prosodia) -> respuesta -> TTS
+    contexto = ContextoInteraccion(
+        texto_estudiante=texto_estudiante,
+        texto_esperado=texto_esperado,
+        audio=audio,
+        agente=sesion.agente
+    )
+    motor.ejecutar(contexto, al_completar)
+    if contexto.cancelacion:
+        raise AudioSinVoz(contexto.cancelacion)
+
+    texto_estudiante = contexto.texto
+    puntuacion_pronunciacion = contexto.resultado('pronunciacion', 'puntuacion_pronunciacion')
+    puntuacion_fluidez = contexto.resultado('prosodia', 'puntuacion_fluidez')
+    puntuacion_entonacion = contexto.resultado('prosodia', 'puntuacion_entonacion')
+    puntuacion_ritmo = contexto.resultado('prosodia', 'puntuacion_ritmo')
+    errores = contexto.resultado('gramatica', 'errores')
+
+    puntuacion_general = (
+        puntuacion_pronunciacion + puntuacion_fluidez +
+        puntuacion_entonacion + puntuacion_ritmo
+    ) / 4
+
+    retroalimentacion = Retroalimentacion(
+        sesion=sesion,
+        texto_original=texto_estudiante,
+        texto_esperado=texto_esperado,
+        texto_corregido=texto_esperado if errores else texto_estudiante,
+        puntuacion_pronunciacion=puntuacion_pronunciacion,
+        puntuacion_fluidez=puntuacion_fluidez,
+        puntuacion_entonacion=puntuacion_entonacion,
+        puntuacion_ritmo=puntuacion_ritmo,
+        errores_gramaticales=errores,
+        sugerencias=contexto.resultado('gramatica', 'sugerencias'),
+        respuesta_agente=contexto.resultado('respuesta', 'texto'),
+        tiempo_respuesta_ms=int((time.time() - inicio) * 1000)
+    )
+    return ResultadoInteraccion(
+        retroalimentacion, puntuacion_general, contexto.resultado('tts', 'audio_url'), contexto.errores
+    )
+
+
+def guardar_interacciones(sesion, resultados):
+    """
+    Guarda en orden las retroalimentaciones y turnos de ``resultados`` y suma
+    sus métricas a la sesión con un único UPDATE.
+    """
+    if not resultados:
+        return
+    retroalimentaciones = [resultado.retroalimentacion for resultado in resultados]
+    correctas = sum(1 for resultado in resultados if resultado.correcta)
+    ahora = timezone.now()
+    turnos = []
+    for retroalimentacion in retroalimentaciones:
+        turnos.append(TurnoConversacion(
+            sesion=sesion, tipo=TipoTurno.ESTUDIANTE, texto=retroalimentacion.texto_original, timestamp=ahora
+        ))
+        turnos.append(TurnoConversacion(
+            sesion=sesion, tipo=TipoTurno.AGENTE, texto=retroalimentacion.respuesta_agente, timestamp=ahora
+        ))
+
+    with transaction.atomic():
+        Retroalimentacion.objects.bulk_create(retroalimentaciones)
+        SesionPractica.objects.filter(pk=sesion.pk).update(
+            palabras_practicadas=F('palabras_practicadas') + sum(
+                len(retroalimentacion.texto_original.split()) for retroalimentacion in retroalimentaciones
+            ),
+            frases_correctas=F('frases_correctas') + correctas,
+            frases_incorrectas=F('frases_incorrectas') + len(resultados) - correctas,
+            total_retroalimentaciones=F('total_retroalimentaciones') + len(resultados),
+        )
+        TurnoConversacion.objects.bulk_create(turnos)
+
+
+def formato_sse(evento, datos):
+    """Serializa un evento en el formato de Server-Sent Events."""
+    return f"event: {evento}\ndata: {json.dumps(datos, cls=DjangoJSONEncoder)}\n\n"
+
+
+def datos_etapa(nombre, contexto):
+    """Datos que se publican al terminar una etapa."""
+    if nombre == 'asr':
+        return {'texto': contexto.texto}
+    return contexto.resultados.get(nombre, {})
+
+
+async def eventos_interaccion(motor, sesion, texto_estudiante='', texto_esperado='', audio=None):
+    """
+    Genera los eventos SSE de una interacción: uno por etapa del pipeline
+    (``asr``, ``pronunciacion``, ``gramatica``, ``prosodia``, ``respuesta``,
+    ``tts``) y un evento final ``resultado`` con la respuesta completa ya
+    guardada, o ``error`` si algo falla.
+    """
+    loop = asyncio.get_running_loop()
+    cola = asyncio.Queue()
+
+    def publicar(evento, datos):
+        loop.call_soon_threadsafe(cola.put_nowait, (evento, datos))
+
+    def procesar():
+        try:
+            resultado = evaluar_interaccion(
+                motor, sesion, texto_estudiante, texto_esperado, audio,
+                al_completar=lambda nombre, contexto: publicar(nombre, datos_etapa(nombre, contexto))
+            )
+            guardar_interacciones(sesion, [resultado])
+            publicar('resultado', resultado.como_respuesta())
+        except APIException as exc:
+            publicar('error', {'error': exc.detail})
+        except Exception:
+            logger.exception('Error procesando la interacción en streaming')
+            publicar('error', {'error': 'No se pudo procesar la interacción'})
+        finally:
+            # Conexiones abiertas por este hilo del executor
+            connections.close_all()
+            publicar(None, None)
+
+    tarea = loop.run_in_executor(None, procesar)
+    while True:
+        evento, datos = await cola.get()
+        if evento is None:
+            break
+        yield formato_sse(evento, datos)
+    await tarea
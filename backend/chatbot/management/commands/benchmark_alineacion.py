@@ -0,0 +1,79 @@
+"""
+Micro-benchmark del motor de alineación (pronunciación y errores).
+
+Mide el tiempo por alineación sobre un párrafo con distintos niveles de error,
+sin caché (cada iteración normaliza, tokeniza y alinea desde cero) y con caché.
+
+Uso:
+    python manage.py benchmark_alineacion
+    python manage.py benchmark_alineacion --palabras 200 --iteraciones 2000
+"""
+import random
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+
+from chatbot.servicios import alineacion
+
+VOCABULARIO = (
+    'the quick brown fox jumps over lazy dog while my teacher reads a long story about '
+    'travelling through small towns near the river and we never stop learning new words '
+    "every day because practice doesn't make perfect it makes progress"
+).split()
+
+
+def variar(palabras, proporcion, aleatorio):
+    """Copia de ``palabras`` con una ``proporcion`` de sustituciones, omisiones e inserciones."""
+    resultado = []
+    for palabra in palabras:
+        if aleatorio.random() >= proporcion:
+            resultado.append(palabra)
+            continue
+        operacion = aleatorio.randrange(3)
+        if operacion == 0:
+            resultado.append(aleatorio.choice(VOCABULARIO))
+        elif operacion == 2:
+            resultado.extend([palabra, aleatorio.choice(VOCABULARIO)])
+    return resultado
+
+
+class Command(BaseCommand):
+    help = 'Mide la latencia del motor de alineación en párrafos largos.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--palabras', type=int, default=120, help='Palabras del texto esperado.')
+        parser.add_argument('--iteraciones', type=int, default=1000)
+        parser.add_argument('--semilla', type=int, default=0)
+
+    def _medir(self, estudiante, esperado, iteraciones, con_cache):
+        tiempos = []
+        for _ in range(iteraciones):
+            if not con_cache:
+                alineacion.normalizar.cache_clear()
+                alineacion.tokenizar.cache_clear()
+                alineacion.alinear.cache_clear()
+            inicio = time.perf_counter_ns()
+            resultado = alineacion.alinear(estudiante, esperado)
+            alineacion.puntuacion(resultado)
+            alineacion.errores(resultado)
+            tiempos.append((time.perf_counter_ns() - inicio) / 1000)
+        tiempos.sort()
+        return statistics.mean(tiempos), tiempos[len(tiempos) // 2], tiempos[int(len(tiempos) * 0.99) - 1]
+
+    def handle(self, *args, **options):
+        aleatorio = random.Random(options['semilla'])
+        esperado = [aleatorio.choice(VOCABULARIO) for _ in range(options['palabras'])]
+        texto_esperado = ' '.join(esperado).capitalize() + '.'
+
+        self.stdout.write(f"Texto esperado: {options['palabras']} palabras, {options['iteraciones']} iteraciones")
+        self.stdout.write(f"{'errores':>8} {'caché':>6} {'media µs':>10} {'p50 µs':>10} {'p99 µs':>10}")
+        for proporcion in (0.0, 0.05, 0.2, 0.5):
+            texto_estudiante = ' '.join(variar(esperado, proporcion, aleatorio))
+            for con_cache in (False, True):
+                media, p50, p99 = self._medir(
+                    texto_estudiante, texto_esperado, options['iteraciones'], con_cache
+                )
+                self.stdout.write(
+                    f"{proporcion:>7.0%} {'sí' if con_cache else 'no':>6} {media:>10.1f} {p50:>10.1f} {p99:>10.1f}"
+                )
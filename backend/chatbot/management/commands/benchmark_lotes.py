@@ -0,0 +1,97 @@
+"""
+Benchmark del planificador de micro-lotes de inferencia ASR.
+
+Lanza ``--concurrencia`` clientes que transcriben clips sin pausa y compara
+la inferencia sin lotes (una llamada por petición) con micro-lotes: peticiones
+por segundo, latencia p50/p95 y tamaño medio de lote. Por defecto usa el
+modelo simulado con un costo fijo por lote más un costo por clip, como un
+modelo vectorizado; con ``--modelo whisper`` se mide el modelo real.
+
+Uso:
+    python manage.py benchmark_lotes --concurrencia 1,4,16
+    python manage.py benchmark_lotes --modelo whisper --opciones '{"nombre": "base"}' --peticiones 64
+"""
+import json
+import math
+import statistics
+import threading
+import time
+
+import numpy as np
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from chatbot.servicios.asr import leer_pcm, obtener_modelo
+from chatbot.servicios.lotes import PlanificadorLotes
+
+from .benchmark_preprocesamiento import clip_sintetico
+
+
+class Command(BaseCommand):
+    help = 'Compara el rendimiento de la inferencia ASR con y sin micro-lotes.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrencia', default='1,4,16', help='Clientes simultáneos (lista separada por comas).')
+        parser.add_argument('--peticiones', type=int, default=200, help='Peticiones por medición.')
+        parser.add_argument('--modelo', default='simulado')
+        parser.add_argument(
+            '--opciones', default='{"latencia_ms": 40, "latencia_item_ms": 4}',
+            help='Opciones JSON del modelo.'
+        )
+        parser.add_argument('--espera-ms', type=int, default=settings.INFERENCIA_LOTE_ESPERA_MS)
+        parser.add_argument('--maximo', type=int, default=settings.INFERENCIA_LOTE_MAX)
+
+    def _medir(self, funcion_lote, clip, concurrencia, peticiones, espera_ms, maximo):
+        planificador = PlanificadorLotes(funcion_lote, 'benchmark', espera_ms=espera_ms, maximo=maximo)
+        restantes = [peticiones]
+        latencias = []
+        lock = threading.Lock()
+
+        def cliente():
+            while True:
+                with lock:
+                    if not restantes[0]:
+                        return
+                    restantes[0] -= 1
+                inicio = time.perf_counter()
+                planificador.enviar(clip)
+                with lock:
+                    latencias.append((time.perf_counter() - inicio) * 1000)
+
+        hilos = [threading.Thread(target=cliente) for _ in range(concurrencia)]
+        inicio = time.perf_counter()
+        for hilo in hilos:
+            hilo.start()
+        for hilo in hilos:
+            hilo.join()
+        duracion = time.perf_counter() - inicio
+        latencias.sort()
+        return {
+            'rps': peticiones / duracion,
+            'p50': statistics.median(latencias),
+            'p95': latencias[math.ceil(len(latencias) * 0.95) - 1],
+            'tamaño': planificador.estadisticas()['tamaño_medio'],
+        }
+
+    def handle(self, *args, **options):
+        modelo, lock = obtener_modelo(options['modelo'], json.loads(options['opciones']))
+        clip = leer_pcm(clip_sintetico(np.random.default_rng(0), frecuencia=16000))
+
+        def funcion_lote(clips):
+            with lock:
+                return modelo.transcribir_lote(clips)
+
+        # Carga perezosa y calentamiento fuera de la medición
+        funcion_lote([clip])
+
+        self.stdout.write(f"{'modo':<12}{'clientes':>9}{'pet/s':>9}{'p50 ms':>9}{'p95 ms':>9}{'lote':>7}")
+        for concurrencia in [int(valor) for valor in options['concurrencia'].split(',')]:
+            for modo, espera_ms, maximo in (
+                ('sin lotes', 0, 1),
+                ('micro-lotes', options['espera_ms'], options['maximo']),
+            ):
+                resultado = self._medir(funcion_lote, clip, concurrencia, options['peticiones'], espera_ms, maximo)
+                self.stdout.write(
+                    f"{modo:<12}{concurrencia:>9}{resultado['rps']:>9.1f}{resultado['p50']:>9.1f}"
+                    f"{resultado['p95']:>9.1f}{resultado['tamaño']:>7.2f}"
+                )
@@ -0,0 +1,142 @@
+"""
+Benchmark del preprocesamiento de audio (VAD + recorte de silencio).
+
+Mide cuánto audio llega al ASR antes y después de recortar el silencio, el
+costo del preprocesamiento y el tiempo de inferencia ASR ahorrado. Con un
+modelo ASR (``--modelo`` o la configuración ASR activa con ``"backend":
+"modelo"``) la inferencia se mide; sin modelo se estima con ``--rtf``.
+
+Uso:
+    python manage.py benchmark_preprocesamiento --corpus /ruta/a/clips_wav
+    python manage.py benchmark_preprocesamiento --clips 50 --modelo vosk --opciones '{"ruta_modelo": "..."}'
+"""
+import io
+import json
+import math
+import os
+import statistics
+import time
+import wave
+
+import numpy as np
+from django.core.management.base import BaseCommand, CommandError
+
+from chatbot.servicios.asr import transcribir_en_proceso
+from chatbot.servicios.base import ContextoInteraccion
+from chatbot.servicios.motor import cargar_configuraciones
+from chatbot.servicios.preprocesamiento import PreprocesamientoAudio, a_pcm16
+
+
+def clip_sintetico(aleatorio, frecuencia=44100):
+    """WAV con silencio (ruido de fondo) al inicio y al final y un tramo de 'voz' en medio."""
+    silencio_inicio, voz, silencio_fin = aleatorio.uniform(0.5, 3), aleatorio.uniform(1, 4), aleatorio.uniform(0.5, 3)
+    total = int((silencio_inicio + voz + silencio_fin) * frecuencia)
+    t = np.arange(total) / frecuencia
+    muestras = 0.003 * aleatorio.standard_normal(total)
+    tramo = (t >= silencio_inicio) & (t < silencio_inicio + voz)
+    # Armónicos con envolvente silábica (~4 Hz) para imitar voz
+    envolvente = 0.5 + 0.5 * np.sin(2 * np.pi * 4 * t[tramo]) ** 2
+    fundamental = 120 + 30 * np.sin(2 * np.pi * 0.5 * t[tramo])
+    fase = 2 * np.pi * np.cumsum(fundamental) / frecuencia
+    muestras[tramo] += 0.25 * envolvente * sum(np.sin(k * fase) / k for k in range(1, 6))
+    buffer = io.BytesIO()
+    with wave.open(buffer, 'wb') as salida:
+        salida.setnchannels(1)
+        salida.setsampwidth(2)
+        salida.setframerate(frecuencia)
+        salida.writeframes(a_pcm16(muestras.astype(np.float32)))
+    return buffer.getvalue()
+
+
+class Command(BaseCommand):
+    help = 'Mide el audio y el tiempo de inferencia ASR que ahorra el recorte de silencio.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--corpus', help='Directorio con clips .wav (por defecto, clips sintéticos).')
+        parser.add_argument('--clips', type=int, default=30, help='Clips sintéticos si no hay --corpus.')
+        parser.add_argument('--modelo', help='Modelo ASR a medir (vosk, whisper, simulado).')
+        parser.add_argument('--opciones', default='{}', help='Opciones JSON del modelo ASR.')
+        parser.add_argument(
+            '--rtf', type=float, default=0.3,
+            help='Factor de tiempo real para estimar la inferencia si no hay modelo.'
+        )
+        parser.add_argument('--semilla', type=int, default=0)
+
+    def _corpus(self, options):
+        if not options['corpus']:
+            aleatorio = np.random.default_rng(options['semilla'])
+            return [(f'sintetico_{i}', clip_sintetico(aleatorio)) for i in range(options['clips'])]
+        if not os.path.isdir(options['corpus']):
+            raise CommandError(f"No existe el directorio {options['corpus']}")
+        clips = []
+        for nombre in sorted(os.listdir(options['corpus'])):
+            if nombre.lower().endswith('.wav'):
+                with open(os.path.join(options['corpus'], nombre), 'rb') as archivo:
+                    clips.append((nombre, archivo.read()))
+        if not clips:
+            raise CommandError('El corpus no tiene archivos .wav')
+        return clips
+
+    def _modelo(self, options):
+        if options['modelo']:
+            return options['modelo'], json.loads(options['opciones'])
+        configuracion = cargar_configuraciones().get('asr', {})
+        if configuracion.get('backend') == 'modelo':
+            return configuracion.get('modelo', 'simulado'), configuracion.get('opciones', {})
+        return None, None
+
+    def _inferencia(self, modelo, opciones, audio):
+        inicio = time.perf_counter()
+        transcribir_en_proceso(modelo, opciones, audio)
+        return (time.perf_counter() - inicio) * 1000
+
+    def handle(self, *args, **options):
+        clips = self._corpus(options)
+        modelo, opciones = self._modelo(options)
+        etapa = PreprocesamientoAudio(cargar_configuraciones().get('preprocesamiento', {}))
+        if modelo:
+            # Carga el modelo fuera de la medición
+            transcribir_en_proceso(modelo, opciones, clips[0][1])
+
+        duracion_total = duracion_voz = 0.0
+        sin_voz = 0
+        tiempos_pre = []
+        asr_original = asr_recortado = 0.0
+        for nombre, datos in clips:
+            contexto = ContextoInteraccion(audio=io.BytesIO(datos))
+            inicio = time.perf_counter()
+            resultado = etapa.ejecutar(contexto)
+            tiempos_pre.append((time.perf_counter() - inicio) * 1000)
+
+            duracion_total += resultado['duracion_ms'] / 1000
+            duracion_voz += resultado['voz_ms'] / 1000
+            if not resultado['voz']:
+                sin_voz += 1
+            if modelo:
+                asr_original += self._inferencia(modelo, opciones, datos)
+                if resultado['voz']:
+                    asr_recortado += self._inferencia(modelo, opciones, contexto.audio_procesado.read())
+
+        if not modelo:
+            asr_original = duracion_total * options['rtf'] * 1000
+            asr_recortado = duracion_voz * options['rtf'] * 1000
+        preprocesamiento_total = sum(tiempos_pre)
+        tiempos_pre.sort()
+
+        self.stdout.write(f'Clips: {len(clips)} ({sin_voz} sin voz, rechazados antes del ASR)')
+        self.stdout.write(
+            f'Audio al ASR: {duracion_total:.1f} s -> {duracion_voz:.1f} s '
+            f'({100 * (1 - duracion_voz / duracion_total):.0f}% menos)'
+        )
+        self.stdout.write(
+            f'Preprocesamiento: media {statistics.mean(tiempos_pre):.2f} ms, '
+            f'p95 {tiempos_pre[math.ceil(len(tiempos_pre) * 0.95) - 1]:.2f} ms por clip'
+        )
+        origen = f"modelo '{modelo}' (medido)" if modelo else f"estimado con RTF {options['rtf']}"
+        self.stdout.write(f'Inferencia ASR, {origen}:')
+        self.stdout.write(f'  sin recorte: {asr_original:.0f} ms')
+        self.stdout.write(f'  con recorte: {asr_recortado:.0f} ms + {preprocesamiento_total:.0f} ms de preprocesamiento')
+        ahorro = asr_original - asr_recortado - preprocesamiento_total
+        self.stdout.write(self.style.SUCCESS(
+            f'Ahorro neto: {ahorro:.0f} ms ({100 * ahorro / asr_original:.0f}%)' if asr_original else 'Sin inferencia que comparar'
+        ))
@@ -0,0 +1,95 @@
+"""
+Benchmark de las métricas de prosodia (fluidez, entonación, ritmo).
+
+Pasa cada clip por el preprocesamiento y mide solo la etapa de prosodia:
+tiempo de CPU por segundo de audio, clips por segundo y la distribución de
+las puntuaciones obtenidas.
+
+Uso:
+    python manage.py benchmark_prosodia --corpus /ruta/a/clips_wav
+    python manage.py benchmark_prosodia --clips 50 --repeticiones 20
+"""
+import io
+import math
+import os
+import statistics
+import time
+
+import numpy as np
+from django.core.management.base import BaseCommand, CommandError
+
+from chatbot.servicios.base import ContextoInteraccion
+from chatbot.servicios.locales import ProsodiaLocal
+from chatbot.servicios.preprocesamiento import PreprocesamientoAudio
+
+from .benchmark_preprocesamiento import clip_sintetico
+
+PUNTUACIONES = ('puntuacion_fluidez', 'puntuacion_entonacion', 'puntuacion_ritmo')
+
+
+class Command(BaseCommand):
+    help = 'Mide el costo de CPU de las métricas de prosodia sobre un directorio de WAV.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--corpus', help='Directorio con clips .wav (por defecto, clips sintéticos).')
+        parser.add_argument('--clips', type=int, default=30, help='Clips sintéticos si no hay --corpus.')
+        parser.add_argument('--repeticiones', type=int, default=5, help='Veces que se procesa cada clip.')
+        parser.add_argument('--semilla', type=int, default=0)
+
+    def _corpus(self, options):
+        if not options['corpus']:
+            aleatorio = np.random.default_rng(options['semilla'])
+            return [(f'sintetico_{i}', clip_sintetico(aleatorio)) for i in range(options['clips'])]
+        if not os.path.isdir(options['corpus']):
+            raise CommandError(f"No existe el directorio {options['corpus']}")
+        clips = []
+        for nombre in sorted(os.listdir(options['corpus'])):
+            if nombre.lower().endswith('.wav'):
+                with open(os.path.join(options['corpus'], nombre), 'rb') as archivo:
+                    clips.append((nombre, archivo.read()))
+        if not clips:
+            raise CommandError('El corpus no tiene archivos .wav')
+        return clips
+
+    def handle(self, *args, **options):
+        preprocesamiento = PreprocesamientoAudio()
+        etapa = ProsodiaLocal()
+        contextos = []
+        for nombre, datos in self._corpus(options):
+            contexto = ContextoInteraccion(audio=io.BytesIO(datos))
+            preprocesamiento.ejecutar(contexto)
+            if contexto.muestras is None:
+                self.stdout.write(f'{nombre}: sin voz, se omite')
+                continue
+            contextos.append(contexto)
+        if not contextos:
+            raise CommandError('Ningún clip tiene voz')
+
+        audio_s = sum(len(contexto.muestras) / contexto.frecuencia for contexto in contextos)
+        tiempos = []
+        cpu_inicio = time.process_time()
+        pared_inicio = time.perf_counter()
+        for _ in range(options['repeticiones']):
+            for contexto in contextos:
+                inicio = time.process_time()
+                etapa.ejecutar(contexto)
+                tiempos.append((time.process_time() - inicio) * 1000)
+        cpu_ms = (time.process_time() - cpu_inicio) * 1000 / options['repeticiones']
+        pared_s = (time.perf_counter() - pared_inicio) / options['repeticiones']
+        resultados = [etapa.ejecutar(contexto) for contexto in contextos]
+        tiempos.sort()
+
+        self.stdout.write(f'Clips: {len(contextos)} ({audio_s:.1f} s de voz), {options["repeticiones"]} repeticiones')
+        self.stdout.write(self.style.SUCCESS(
+            f'CPU: {cpu_ms / audio_s:.2f} ms por segundo de audio '
+            f'({audio_s * 1000 / cpu_ms:.0f}x tiempo real, {len(contextos) / pared_s:.0f} clips/s)'
+        ))
+        self.stdout.write(
+            f'Por clip: media {statistics.mean(tiempos):.2f} ms, '
+            f'p95 {tiempos[math.ceil(len(tiempos) * 0.95) - 1]:.2f} ms'
+        )
+        for clave in PUNTUACIONES:
+            valores = [resultado[clave] for resultado in resultados]
+            self.stdout.write(
+                f'{clave}: media {statistics.mean(valores):.1f}, min {min(valores):.1f}, max {max(valores):.1f}'
+            )
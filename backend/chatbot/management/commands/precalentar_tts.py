@@ -0,0 +1,53 @@
+"""
+Pre-renderiza el banco de frases del agente en la caché TTS.
+
+Uso:
+    python manage.py precalentar_tts
+    python manage.py precalentar_tts --voz en-US --voz es-ES
+"""
+from django.core.management.base import BaseCommand
+
+from chatbot.models import AgenteVirtual
+from chatbot.servicios import MotorPipeline
+from chatbot.servicios.locales import RESPUESTAS
+from chatbot.servicios.tts import obtener_cache_tts
+
+
+class Command(BaseCommand):
+    help = 'Sintetiza y guarda en caché el audio de las respuestas frecuentes del agente.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--voz', action='append', dest='voces',
+            help='Voz a pre-renderizar (se puede repetir). Por defecto, las de los agentes activos.'
+        )
+
+    def handle(self, *args, **options):
+        voces = options['voces'] or sorted(set(
+            AgenteVirtual.objects.filter(is_active=True).values_list('voz_configurada', flat=True)
+        ))
+        if not voces:
+            voces = [AgenteVirtual._meta.get_field('voz_configurada').default]
+
+        etapa = next(e for e in MotorPipeline.desde_configuracion().etapas if e.nombre == 'tts')
+        cache = obtener_cache_tts()
+        frases = [frase for grupo in RESPUESTAS.values() for frase in grupo]
+
+        nuevas = existentes = sin_audio = 0
+        for voz in voces:
+            for frase in frases:
+                if cache.contiene(cache.clave(frase, voz, etapa.version)):
+                    existentes += 1
+                elif etapa.renderizar(frase, voz):
+                    nuevas += 1
+                else:
+                    sin_audio += 1
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Caché TTS: {nuevas} frases sintetizadas, {existentes} ya en caché'
+            f' ({len(frases)} frases x {len(voces)} voces)'
+        ))
+        if sin_audio:
+            self.stdout.write(self.style.WARNING(
+                f'{sin_audio} frases sin audio: el backend TTS configurado no genera audio'
+            ))
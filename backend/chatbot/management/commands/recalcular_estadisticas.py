@@ -0,0 +1,30 @@
+"""
+Reconstruye desde cero las estadísticas acumuladas de los estudiantes.
+
+Uso:
+    python manage.py recalcular_estadisticas
+    python manage.py recalcular_estadisticas --estudiante 12 --estudiante 15
+"""
+from django.core.management.base import BaseCommand
+
+from chatbot.models import EstadisticasEstudiante
+from users.models import Estudiante
+
+
+class Command(BaseCommand):
+    help = 'Recalcula EstadisticasEstudiante a partir de las sesiones para corregir desvíos.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--estudiante', type=int, action='append', dest='estudiantes',
+            help='ID del estudiante a recalcular (se puede repetir). Por defecto, todos.'
+        )
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        estudiantes = Estudiante.objects.all()
+        if options['estudiantes']:
+            estudiantes = estudiantes.filter(id__in=options['estudiantes'])
+
+        total = EstadisticasEstudiante.recalcular_todos(estudiantes, batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Estadísticas recalculadas para {total} estudiantes'))
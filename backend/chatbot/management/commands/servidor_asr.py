@@ -0,0 +1,49 @@
+"""
+Servidor ASR compartido: carga el modelo una sola vez y atiende a todos los
+workers de gunicorn por un socket Unix.
+
+Uso:
+    python manage.py servidor_asr
+    python manage.py servidor_asr --socket /run/avi/asr.sock --precargar
+"""
+import signal
+import sys
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from chatbot.servicios.asr import ServidorASR, obtener_modelo
+from chatbot.servicios.motor import cargar_configuraciones
+
+
+class Command(BaseCommand):
+    help = 'Inicia el servidor de inferencia ASR compartido por los workers.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--socket', default=settings.ASR_SOCKET_PATH,
+            help='Ruta del socket Unix (por defecto ASR_SOCKET_PATH).'
+        )
+        parser.add_argument(
+            '--precargar', action='store_true',
+            help='Carga al iniciar el modelo de la configuración ASR activa.'
+        )
+
+    def handle(self, *args, **options):
+        if options['precargar']:
+            configuracion = cargar_configuraciones().get('asr', {})
+            if configuracion.get('backend') == 'modelo':
+                modelo = configuracion.get('modelo', 'simulado')
+                obtener_modelo(modelo, configuracion.get('opciones', {}))
+                self.stdout.write(f"Modelo ASR '{modelo}' cargado")
+
+        servidor = ServidorASR(options['socket'])
+        # SIGTERM (systemd, docker stop) también cierra el servidor y borra el socket
+        signal.signal(signal.SIGTERM, lambda *args: sys.exit(0))
+        self.stdout.write(self.style.SUCCESS(f"Servidor ASR escuchando en {options['socket']}"))
+        try:
+            servidor.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            servidor.server_close()
@@ -0,0 +1,77 @@
+# Generated by Django 6.0 on 2026-10-18 10:07
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+from django.utils.dateparse import parse_datetime
+
+
+def copiar_historial_a_turnos(apps, schema_editor):
+    """Convierte el JSON historial_conversacion de cada sesión en filas de TurnoConversacion."""
+    SesionPractica = apps.get_model('chatbot', 'SesionPractica')
+    TurnoConversacion = apps.get_model('chatbot', 'TurnoConversacion')
+
+    turnos = []
+    sesiones = SesionPractica.objects.exclude(historial_conversacion=None).only(
+        'id', 'fecha_inicio', 'historial_conversacion'
+    )
+    for sesion in sesiones.iterator():
+        for elemento in sesion.historial_conversacion or []:
+            timestamp = parse_datetime(elemento.get('timestamp') or '') or sesion.fecha_inicio
+            turnos.append(TurnoConversacion(
+                sesion_id=sesion.id,
+                tipo=elemento.get('tipo', 'estudiante'),
+                texto=elemento.get('texto') or '',
+                timestamp=timestamp
+            ))
+        if len(turnos) >= 1000:
+            TurnoConversacion.objects.bulk_create(turnos)
+            turnos = []
+    TurnoConversacion.objects.bulk_create(turnos)
+
+
+def copiar_turnos_a_historial(apps, schema_editor):
+    """Reconstruye historial_conversacion a partir de los turnos."""
+    SesionPractica = apps.get_model('chatbot', 'SesionPractica')
+    TurnoConversacion = apps.get_model('chatbot', 'TurnoConversacion')
+
+    historiales = {}
+    for turno in TurnoConversacion.objects.order_by('sesion_id', 'id').iterator():
+        historiales.setdefault(turno.sesion_id, []).append({
+            'tipo': turno.tipo,
+            'texto': turno.texto,
+            'timestamp': turno.timestamp.isoformat()
+        })
+    for sesion_id, historial in historiales.items():
+        SesionPractica.objects.filter(pk=sesion_id).update(historial_conversacion=historial)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chatbot', '0002_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TurnoConversacion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tipo', models.CharField(choices=[('estudiante', 'Estudiante'), ('agente', 'Agente')], max_length=20, verbose_name='Tipo')),
+                ('texto', models.TextField(blank=True, default='', verbose_name='Texto')),
+                ('timestamp', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Fecha')),
+                ('sesion', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='turnos', to='chatbot.sesionpractica', verbose_name='Sesión')),
+            ],
+            options={
+                'verbose_name': 'Turno de Conversación',
+                'verbose_name_plural': 'Turnos de Conversación',
+                'ordering': ['id'],
+                'indexes': [models.Index(fields=['sesion', 'id'], name='turno_sesion_id_idx')],
+            },
+        ),
+        migrations.RunPython(copiar_historial_a_turnos, copiar_turnos_a_historial),
+        migrations.RemoveField(
+            model_name='sesionpractica',
+            name='historial_conversacion',
+        ),
+    ]
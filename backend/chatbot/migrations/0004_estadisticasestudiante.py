@@ -0,0 +1,66 @@
+# Generated by Django 6.0 on 2026-10-18 10:10
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, Q, Sum
+
+
+def poblar_estadisticas(apps, schema_editor):
+    """Calcula las estadísticas iniciales de cada estudiante a partir de sus sesiones."""
+    Estudiante = apps.get_model('users', 'Estudiante')
+    SesionPractica = apps.get_model('chatbot', 'SesionPractica')
+    EstadisticasEstudiante = apps.get_model('chatbot', 'EstadisticasEstudiante')
+
+    completada = Q(estado='completada')
+    totales = {
+        fila.pop('estudiante_id'): fila
+        for fila in SesionPractica.objects.values('estudiante_id').annotate(
+            sesiones_totales=Count('id'),
+            sesiones_completadas=Count('id', filter=completada),
+            tiempo_total_minutos=Sum('duracion_minutos', filter=completada),
+            palabras_practicadas=Sum('palabras_practicadas', filter=completada),
+            frases_correctas=Sum('frases_correctas', filter=completada),
+            frases_incorrectas=Sum('frases_incorrectas', filter=completada),
+            suma_puntuacion=Sum('puntuacion_sesion', filter=completada),
+        ).order_by()
+    }
+    EstadisticasEstudiante.objects.bulk_create(
+        [
+            EstadisticasEstudiante(
+                estudiante_id=estudiante_id,
+                **{campo: valor or 0 for campo, valor in totales.get(estudiante_id, {}).items()}
+            )
+            for estudiante_id in Estudiante.objects.values_list('id', flat=True)
+        ],
+        batch_size=1000
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chatbot', '0003_turnoconversacion'),
+        ('users', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EstadisticasEstudiante',
+            fields=[
+                ('estudiante', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='estadisticas', serialize=False, to='users.estudiante', verbose_name='Estudiante')),
+                ('sesiones_totales', models.PositiveIntegerField(default=0, verbose_name='Sesiones Totales')),
+                ('sesiones_completadas', models.PositiveIntegerField(default=0, verbose_name='Sesiones Completadas')),
+                ('tiempo_total_minutos', models.PositiveIntegerField(default=0, verbose_name='Tiempo Total (minutos)')),
+                ('palabras_practicadas', models.PositiveIntegerField(default=0, verbose_name='Palabras Practicadas')),
+                ('frases_correctas', models.PositiveIntegerField(default=0, verbose_name='Frases Correctas')),
+                ('frases_incorrectas', models.PositiveIntegerField(default=0, verbose_name='Frases Incorrectas')),
+                ('suma_puntuacion', models.FloatField(default=0.0, help_text='Suma de puntuacion_sesion de las sesiones completadas', verbose_name='Suma de Puntuaciones')),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Estadísticas de Estudiante',
+                'verbose_name_plural': 'Estadísticas de Estudiantes',
+            },
+        ),
+        migrations.RunPython(poblar_estadisticas, migrations.RunPython.noop),
+    ]
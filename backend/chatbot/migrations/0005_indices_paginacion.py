@@ -0,0 +1,26 @@
+# Generated by Django 6.0 on 2026-10-18 10:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chatbot', '0004_estadisticasestudiante'),
+        ('users', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='retroalimentacion',
+            index=models.Index(fields=['sesion', 'created_at', 'id'], name='retro_sesion_fecha_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='sesionpractica',
+            index=models.Index(fields=['fecha_inicio', 'id'], name='sesion_fecha_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='sesionpractica',
+            index=models.Index(fields=['estudiante', 'fecha_inicio', 'id'], name='sesion_est_fecha_id_idx'),
+        ),
+    ]
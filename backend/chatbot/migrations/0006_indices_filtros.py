@@ -0,0 +1,17 @@
+# Generated by Django 6.0 on 2026-10-18 10:13
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chatbot', '0005_indices_paginacion'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='sesionpractica',
+            index=models.Index(fields=['estudiante', 'estado', 'fecha_inicio'], name='sesion_est_estado_fecha_idx'),
+        ),
+    ]
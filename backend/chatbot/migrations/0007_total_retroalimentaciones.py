@@ -0,0 +1,36 @@
+# Generated by Django 6.0 on 2026-10-18 10:14
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def contar_retroalimentaciones(apps, schema_editor):
+    """Inicializa el contador con el número actual de retroalimentaciones."""
+    SesionPractica = apps.get_model('chatbot', 'SesionPractica')
+    Retroalimentacion = apps.get_model('chatbot', 'Retroalimentacion')
+
+    conteo = (
+        Retroalimentacion.objects.filter(sesion=OuterRef('pk'))
+        .order_by()
+        .values('sesion')
+        .annotate(total=Count('id'))
+        .values('total')
+    )
+    SesionPractica.objects.update(total_retroalimentaciones=Coalesce(Subquery(conteo), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chatbot', '0006_indices_filtros'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='sesionpractica',
+            name='total_retroalimentaciones',
+            field=models.PositiveIntegerField(default=0, help_text='Contador desnormalizado de retroalimentaciones de la sesión', verbose_name='Total de Retroalimentaciones'),
+        ),
+        migrations.RunPython(contar_retroalimentaciones, migrations.RunPython.noop),
+    ]
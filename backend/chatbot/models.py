@@ -5,9 +5,17 @@ Basado en el diagrama de clases:
 - AgenteVirtual: Orquesta los servicios ASR, NLP y TTS
 - SesionPractica: Interacción principal del estudiante
 - Retroalimentacion: Corrección gramatical y métricas de pronunciación
+- TurnoConversacion: Historial de conversación de la sesión (append-only)
 - ConfiguracionServicio: Configuración de servicios externos
+- EstadisticasEstudiante: Métricas acumuladas por estudiante
 """
-from django.db import models
+from django.core.exceptions import ValidationError
+from django.db import models, transaction
+from django.db.models import Case, Count, F, FloatField, Q, Sum, When
+from django.db.models.functions import Cast, Greatest
+from django.db.models.signals import post_delete
+from django.dispatch import receiver
+from django.utils import timezone
 from users.models import Estudiante
 
 
@@ -27,6 +35,12 @@ class TipoServicio(models.TextChoices):
     TTS = 'TTS', 'Síntesis de Voz (TTS)'
 
 
+class TipoTurno(models.TextChoices):
+    """Emisor de un turno de la conversación."""
+    ESTUDIANTE = 'estudiante', 'Estudiante'
+    AGENTE = 'agente', 'Agente'
+
+
 class AgenteVirtual(models.Model):
     """
     Modelo del Agente Virtual.
@@ -139,6 +153,11 @@ class SesionPractica(models.Model):
         verbose_name='Puntuación de la Sesión',
         help_text='Puntuación de 0 a 100'
     )
+    total_retroalimentaciones = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Total de Retroalimentaciones',
+        help_text='Contador desnormalizado de retroalimentaciones de la sesión'
+    )
     
     # Estado y tiempos
     estado = models.CharField(
@@ -157,18 +176,18 @@ class SesionPractica(models.Model):
         verbose_name='Fecha de Fin'
     )
     
-    # Historial de conversación
-    historial_conversacion = models.JSONField(
-        blank=True,
-        null=True,
-        default=list,
-        verbose_name='Historial de Conversación'
-    )
-    
     class Meta:
         verbose_name = 'Sesión de Práctica'
         verbose_name_plural = 'Sesiones de Práctica'
         ordering = ['-fecha_inicio']
+        indexes = [
+            # Paginación por clave (fecha_inicio, id), global y por estudiante
+            models.Index(fields=['fecha_inicio', 'id'], name='sesion_fecha_id_idx'),
+            models.Index(fields=['estudiante', 'fecha_inicio', 'id'], name='sesion_est_fecha_id_idx'),
+            # Filtros por estudiante y estado, ordenados por -fecha_inicio; también sirve a los
+            # agregados de sesiones completadas (estudiante, estado='completada')
+            models.Index(fields=['estudiante', 'estado', 'fecha_inicio'], name='sesion_est_estado_fecha_idx'),
+        ]
     
     def __str__(self):
         return f"Sesión {self.id} - {self.estudiante.usuario.get_full_name()} - {self.estado}"
@@ -178,8 +197,96 @@ class SesionPractica(models.Model):
         total = self.frases_correctas + self.frases_incorrectas
         if total > 0:
             self.puntuacion_sesion = (self.frases_correctas / total) * 100
-            self.save()
+            self.save(update_fields=['puntuacion_sesion'])
         return self.puntuacion_sesion
+    
+    def finalizar(self):
+        """
+        Completa la sesión y suma sus métricas a las estadísticas y al perfil
+        del estudiante, todo con UPDATE atómicos. Solo la primera llamada la
+        completa: devuelve ``False`` si ya lo estaba, así un doble envío no
+        cuenta la sesión dos veces. Recarga la instancia con los valores finales.
+        """
+        ahora = timezone.now()
+        duracion_minutos = int((ahora - self.fecha_inicio).total_seconds() / 60)
+        # Puntuación con los contadores que hay en la fila al completarla, no los leídos antes
+        puntuacion = Case(
+            When(
+                Q(frases_correctas__gt=0) | Q(frases_incorrectas__gt=0),
+                then=Cast('frases_correctas', FloatField()) * 100 / (F('frases_correctas') + F('frases_incorrectas')),
+            ),
+            default=F('puntuacion_sesion'),
+        )
+        with transaction.atomic():
+            completada = SesionPractica.objects.filter(pk=self.pk).exclude(
+                estado=EstadoSesion.COMPLETADA
+            ).update(
+                estado=EstadoSesion.COMPLETADA,
+                fecha_fin=ahora,
+                duracion_minutos=duracion_minutos,
+                puntuacion_sesion=puntuacion,
+            )
+            self.refresh_from_db()
+            if not completada:
+                return False
+            
+            estadisticas = EstadisticasEstudiante.registrar_sesion_completada(self)
+            metricas = {
+                'sesiones_completadas': F('sesiones_completadas') + 1,
+                'horas_practica': F('horas_practica') + self.duracion_minutos // 60,
+            }
+            if estadisticas.puntuacion_promedio:
+                metricas['puntuacion_promedio'] = estadisticas.puntuacion_promedio
+            Estudiante.objects.filter(pk=self.estudiante_id).update(**metricas)
+        return True
+
+
+class TurnoConversacion(models.Model):
+    """
+    Modelo de Turno de Conversación.
+    Historial de la sesión guardado fila por fila: agregar un turno es un
+    INSERT pequeño en lugar de reescribir todo el historial de la sesión.
+    """
+    sesion = models.ForeignKey(
+        SesionPractica,
+        on_delete=models.CASCADE,
+        related_name='turnos',
+        db_index=False,  # cubierto por el índice (sesion, id)
+        verbose_name='Sesión'
+    )
+    tipo = models.CharField(
+        max_length=20,
+        choices=TipoTurno.choices,
+        verbose_name='Tipo'
+    )
+    texto = models.TextField(
+        blank=True,
+        default='',
+        verbose_name='Texto'
+    )
+    timestamp = models.DateTimeField(
+        default=timezone.now,
+        verbose_name='Fecha'
+    )
+    
+    class Meta:
+        verbose_name = 'Turno de Conversación'
+        verbose_name_plural = 'Turnos de Conversación'
+        ordering = ['id']
+        indexes = [
+            models.Index(fields=['sesion', 'id'], name='turno_sesion_id_idx'),
+        ]
+    
+    def __str__(self):
+        return f"Turno {self.id} - Sesión {self.sesion_id} - {self.tipo}"
+    
+    def como_dict(self):
+        """Formato histórico de un elemento de ``historial_conversacion``."""
+        return {
+            'tipo': self.tipo,
+            'texto': self.texto,
+            'timestamp': self.timestamp.isoformat()
+        }
 
 
 class Retroalimentacion(models.Model):
@@ -300,6 +407,10 @@ class Retroalimentacion(models.Model):
         verbose_name = 'Retroalimentación'
         verbose_name_plural = 'Retroalimentaciones'
         ordering = ['-created_at']
+        indexes = [
+            # Paginación por clave (created_at, id) dentro de una sesión
+            models.Index(fields=['sesion', 'created_at', 'id'], name='retro_sesion_fecha_id_idx'),
+        ]
     
     def __str__(self):
         return f"Retroalimentación {self.id} - Sesión {self.sesion.id}"
@@ -345,3 +456,203 @@ class ConfiguracionServicio(models.Model):
     
     def __str__(self):
         return f"{self.nombre_servicio} ({self.tipo})"
+    
+    def clean(self):
+        """Rechaza etapas o backends que el pipeline no conoce: fallarían en cada interacción."""
+        # servicios importa este módulo
+        from .servicios.base import existe_backend, obtener_backend
+        from .servicios.motor import ETAPAS
+        
+        configuracion = self.configuracion or {}
+        if not isinstance(configuracion, dict):
+            raise ValidationError({'configuracion': 'Debe ser un objeto JSON.'})
+        backend = configuracion.get('backend', 'local')
+        etapas = configuracion.get('etapas')
+        if etapas is None:
+            # Aplica a las etapas de su tipo: alguna debe tener el backend
+            if not any(
+                obtener_backend(etapa, 'local').tipo == self.tipo and existe_backend(etapa, backend)
+                for etapa in ETAPAS
+            ):
+                raise ValidationError({
+                    'configuracion': f"Backend '{backend}' no registrado para ninguna etapa de tipo {self.tipo}."
+                })
+            return
+        if not isinstance(etapas, list):
+            raise ValidationError({'configuracion': '"etapas" debe ser una lista.'})
+        errores = []
+        for etapa in etapas:
+            if etapa not in ETAPAS:
+                errores.append(f"Etapa '{etapa}' desconocida.")
+            elif not existe_backend(etapa, backend):
+                errores.append(f"Backend '{backend}' no registrado para la etapa '{etapa}'.")
+        if errores:
+            raise ValidationError({'configuracion': errores})
+
+
+class EstadisticasEstudiante(models.Model):
+    """
+    Estadísticas acumuladas de un estudiante.
+    Se actualizan con sumas y conteos incrementales al iniciar y finalizar
+    sesiones, así el dashboard lee una sola fila en lugar de agregar todas
+    las sesiones, y se restan al eliminar una sesión. ``recalcular`` las
+    reconstruye desde cero.
+    """
+    estudiante = models.OneToOneField(
+        Estudiante,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='estadisticas',
+        verbose_name='Estudiante'
+    )
+    sesiones_totales = models.PositiveIntegerField(default=0, verbose_name='Sesiones Totales')
+    sesiones_completadas = models.PositiveIntegerField(default=0, verbose_name='Sesiones Completadas')
+    tiempo_total_minutos = models.PositiveIntegerField(default=0, verbose_name='Tiempo Total (minutos)')
+    palabras_practicadas = models.PositiveIntegerField(default=0, verbose_name='Palabras Practicadas')
+    frases_correctas = models.PositiveIntegerField(default=0, verbose_name='Frases Correctas')
+    frases_incorrectas = models.PositiveIntegerField(default=0, verbose_name='Frases Incorrectas')
+    suma_puntuacion = models.FloatField(
+        default=0.0,
+        verbose_name='Suma de Puntuaciones',
+        help_text='Suma de puntuacion_sesion de las sesiones completadas'
+    )
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        verbose_name = 'Estadísticas de Estudiante'
+        verbose_name_plural = 'Estadísticas de Estudiantes'
+    
+    def __str__(self):
+        return f"Estadísticas de {self.estudiante_id}"
+    
+    @property
+    def puntuacion_promedio(self):
+        if not self.sesiones_completadas:
+            return 0.0
+        return self.suma_puntuacion / self.sesiones_completadas
+    
+    @classmethod
+    def recalcular(cls, estudiante_id):
+        """Reconstruye las estadísticas del estudiante a partir de sus sesiones."""
+        completada = Q(estado=EstadoSesion.COMPLETADA)
+        totales = SesionPractica.objects.filter(estudiante_id=estudiante_id).aggregate(
+            sesiones_totales=Count('id'),
+            sesiones_completadas=Count('id', filter=completada),
+            tiempo_total_minutos=Sum('duracion_minutos', filter=completada),
+            palabras_practicadas=Sum('palabras_practicadas', filter=completada),
+            frases_correctas=Sum('frases_correctas', filter=completada),
+            frases_incorrectas=Sum('frases_incorrectas', filter=completada),
+            suma_puntuacion=Sum('puntuacion_sesion', filter=completada),
+        )
+        valores = {campo: valor or 0 for campo, valor in totales.items()}
+        estadisticas, _ = cls.objects.update_or_create(
+            estudiante_id=estudiante_id, defaults=valores
+        )
+        return estadisticas
+    
+    @classmethod
+    def recalcular_todos(cls, estudiantes=None, batch_size=1000):
+        """
+        Reconstruye las estadísticas de varios estudiantes (todos por defecto)
+        por lotes: una consulta agrupada y un upsert por lote. Devuelve cuántos procesó.
+        """
+        if estudiantes is None:
+            estudiantes = Estudiante.objects.all()
+        estudiante_ids = list(estudiantes.order_by('id').values_list('id', flat=True))
+        
+        completada = Q(estado=EstadoSesion.COMPLETADA)
+        campos = [
+            'sesiones_totales', 'sesiones_completadas', 'tiempo_total_minutos',
+            'palabras_practicadas', 'frases_correctas', 'frases_incorrectas',
+            'suma_puntuacion', 'updated_at',
+        ]
+        for inicio in range(0, len(estudiante_ids), batch_size):
+            lote = estudiante_ids[inicio:inicio + batch_size]
+            totales = {
+                fila.pop('estudiante_id'): fila
+                for fila in SesionPractica.objects.filter(estudiante_id__in=lote)
+                .values('estudiante_id')
+                .annotate(
+                    sesiones_totales=Count('id'),
+                    sesiones_completadas=Count('id', filter=completada),
+                    tiempo_total_minutos=Sum('duracion_minutos', filter=completada),
+                    palabras_practicadas=Sum('palabras_practicadas', filter=completada),
+                    frases_correctas=Sum('frases_correctas', filter=completada),
+                    frases_incorrectas=Sum('frases_incorrectas', filter=completada),
+                    suma_puntuacion=Sum('puntuacion_sesion', filter=completada),
+                )
+                .order_by()
+            }
+            ahora = timezone.now()
+            filas = [
+                cls(
+                    estudiante_id=estudiante_id,
+                    updated_at=ahora,
+                    **{campo: valor or 0 for campo, valor in totales.get(estudiante_id, {}).items()}
+                )
+                for estudiante_id in lote
+            ]
+            cls.objects.bulk_create(
+                filas,
+                update_conflicts=True,
+                unique_fields=['estudiante'],
+                update_fields=campos,
+            )
+        return len(estudiante_ids)
+    
+    @classmethod
+    def registrar_sesion_iniciada(cls, estudiante_id):
+        """Suma una sesión iniciada (O(1))."""
+        actualizadas = cls.objects.filter(pk=estudiante_id).update(
+            sesiones_totales=F('sesiones_totales') + 1
+        )
+        if not actualizadas:
+            cls.recalcular(estudiante_id)
+    
+    @classmethod
+    def registrar_sesion_completada(cls, sesion):
+        """Acumula las métricas de una sesión recién completada (O(1))."""
+        actualizadas = cls.objects.filter(pk=sesion.estudiante_id).update(
+            sesiones_completadas=F('sesiones_completadas') + 1,
+            tiempo_total_minutos=F('tiempo_total_minutos') + sesion.duracion_minutos,
+            palabras_practicadas=F('palabras_practicadas') + sesion.palabras_practicadas,
+            frases_correctas=F('frases_correctas') + sesion.frases_correctas,
+            frases_incorrectas=F('frases_incorrectas') + sesion.frases_incorrectas,
+            suma_puntuacion=F('suma_puntuacion') + sesion.puntuacion_sesion,
+        )
+        if not actualizadas:
+            return cls.recalcular(sesion.estudiante_id)
+        return cls.objects.get(pk=sesion.estudiante_id)
+    
+    @classmethod
+    def registrar_sesion_eliminada(cls, sesion):
+        """
+        Resta lo que sumó una sesión eliminada (O(1)). Sin fila no hace nada:
+        puede ser el borrado en cascada del propio estudiante.
+        """
+        metricas = {'sesiones_totales': Greatest(F('sesiones_totales') - 1, 0)}
+        if sesion.estado == EstadoSesion.COMPLETADA:
+            for campo, valor in (
+                ('sesiones_completadas', 1),
+                ('tiempo_total_minutos', sesion.duracion_minutos),
+                ('palabras_practicadas', sesion.palabras_practicadas),
+                ('frases_correctas', sesion.frases_correctas),
+                ('frases_incorrectas', sesion.frases_incorrectas),
+            ):
+                metricas[campo] = Greatest(F(campo) - valor, 0)
+            metricas['suma_puntuacion'] = F('suma_puntuacion') - sesion.puntuacion_sesion
+        cls.objects.filter(pk=sesion.estudiante_id).update(**metricas)
+
+
+@receiver(post_delete, sender=SesionPractica)
+def _al_eliminar_sesion(sender, instance, **kwargs):
+    # Corre dentro de la transacción del borrado
+    EstadisticasEstudiante.registrar_sesion_eliminada(instance)
+    if instance.estado != EstadoSesion.COMPLETADA:
+        return
+    estadisticas = EstadisticasEstudiante.objects.filter(pk=instance.estudiante_id).first()
+    Estudiante.objects.filter(pk=instance.estudiante_id).update(
+        sesiones_completadas=Greatest(F('sesiones_completadas') - 1, 0),
+        horas_practica=Greatest(F('horas_practica') - instance.duracion_minutos // 60, 0),
+        puntuacion_promedio=estadisticas.puntuacion_promedio if estadisticas else F('puntuacion_promedio'),
+    )
@@ -0,0 +1,167 @@
+"""
+Paginadores de la app Chatbot.
+"""
+import base64
+import json
+
+from django.conf import settings
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import ParseError
+from rest_framework.pagination import (
+    BasePagination, CursorPagination, PageNumberPagination, replace_query_param, remove_query_param
+)
+from rest_framework.response import Response
+
+# Mayor id de un BigAutoField: uno más grande haría fallar la consulta
+ID_MAXIMO = 2 ** 63 - 1
+
+
+class HistorialPagination(CursorPagination):
+    """
+    Paginación por cursor del historial de conversación.
+    Usa el índice (sesion, id), así cada página cuesta lo mismo sin importar su profundidad.
+    """
+    ordering = 'id'
+    page_size = 50
+    page_size_query_param = 'limite'
+    max_page_size = 200
+
+
+class ReportePagination(PageNumberPagination):
+    """
+    Paginación del reporte de estudiantes para docentes.
+    Conserva las claves ``total_estudiantes`` y ``reportes`` de la respuesta original.
+    """
+    page_size = 50
+    page_size_query_param = 'page_size'
+    max_page_size = 500
+    
+    def get_paginated_response(self, data):
+        return Response({
+            'total_estudiantes': self.page.paginator.count,
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'reportes': data
+        })
+
+
+class KeysetPagination(BasePagination):
+    """
+    Paginación por clave compuesta ``(campo, id)`` en orden descendente.
+
+    El cursor guarda el último par ``(campo, id)`` visto, de modo que cada
+    página es un rango sobre el índice compuesto y cuesta lo mismo a
+    cualquier profundidad (sin OFFSET). El total se calcula con un COUNT
+    que el cliente puede omitir con ``?total=false``.
+    """
+    campo = None
+    page_size = settings.REST_FRAMEWORK['PAGE_SIZE']
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    cursor_query_param = 'cursor'
+    total_query_param = 'total'
+    invalid_cursor_message = 'Cursor inválido'
+    
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        self.page_size = self.get_page_size(request)
+        cursor = self.decode_cursor(request)
+        
+        self.total = None
+        if request.query_params.get(self.total_query_param, 'true').lower() not in ('false', '0', 'no'):
+            self.total = queryset.count()
+        
+        campo = self.campo
+        if cursor is None:
+            queryset = queryset.order_by(f'-{campo}', '-id')
+        else:
+            valor, pk, reverso = cursor
+            if reverso:
+                queryset = queryset.filter(
+                    Q(**{f'{campo}__gt': valor}) | Q(**{campo: valor, 'id__gt': pk})
+                ).order_by(campo, 'id')
+            else:
+                queryset = queryset.filter(
+                    Q(**{f'{campo}__lt': valor}) | Q(**{campo: valor, 'id__lt': pk})
+                ).order_by(f'-{campo}', '-id')
+        
+        resultados = list(queryset[:self.page_size + 1])
+        hay_mas = len(resultados) > self.page_size
+        resultados = resultados[:self.page_size]
+        
+        if cursor is not None and cursor[2]:
+            resultados.reverse()
+            self.has_next, self.has_previous = True, hay_mas
+        else:
+            self.has_next, self.has_previous = hay_mas, cursor is not None
+        
+        self.page = resultados
+        return resultados
+    
+    def get_page_size(self, request):
+        try:
+            tamaño = int(request.query_params.get(self.page_size_query_param, self.page_size))
+        except ValueError:
+            return self.page_size
+        return max(1, min(tamaño, self.max_page_size))
+    
+    def decode_cursor(self, request):
+        codificado = request.query_params.get(self.cursor_query_param)
+        if not codificado:
+            return None
+        # Un cursor alterado es un error del cliente (400), nunca un 500
+        try:
+            valor, pk, reverso = json.loads(base64.urlsafe_b64decode(codificado.encode('ascii')))
+            valor = parse_datetime(valor)
+            pk = int(pk)
+            if valor is None or not 0 <= pk <= ID_MAXIMO:
+                raise ValueError(codificado)
+            return valor, pk, bool(reverso)
+        except (TypeError, ValueError, OverflowError, UnicodeError):
+            raise ParseError(self.invalid_cursor_message)
+    
+    @classmethod
+    def cursor_para(cls, instancia, reverso=False):
+        """Cursor opaco que apunta justo después (o antes, si ``reverso``) de ``instancia``."""
+        valor = getattr(instancia, cls.campo).isoformat()
+        codificado = base64.urlsafe_b64encode(json.dumps([valor, instancia.id, reverso]).encode('ascii'))
+        return codificado.decode('ascii')
+    
+    def encode_cursor(self, instancia, reverso):
+        return replace_query_param(
+            self.base_url, self.cursor_query_param, self.cursor_para(instancia, reverso)
+        )
+    
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return self.encode_cursor(self.page[-1], reverso=False)
+    
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        if not self.page:
+            return remove_query_param(self.base_url, self.cursor_query_param)
+        return self.encode_cursor(self.page[0], reverso=True)
+    
+    def get_paginated_response(self, data):
+        respuesta = {
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data
+        }
+        if self.total is not None:
+            respuesta = {'count': self.total, **respuesta}
+        return Response(respuesta)
+
+
+class SesionPagination(KeysetPagination):
+    """Listado de sesiones, de la más reciente a la más antigua."""
+    campo = 'fecha_inicio'
+
+
+class RetroalimentacionPagination(KeysetPagination):
+    """Listado de retroalimentaciones, de la más reciente a la más antigua."""
+    campo = 'created_at'
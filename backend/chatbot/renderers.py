@@ -0,0 +1,20 @@
+"""
+Renderers de la app Chatbot.
+"""
+from rest_framework.renderers import BaseRenderer
+
+from .interacciones import formato_sse
+
+
+class EventStreamRenderer(BaseRenderer):
+    """
+    Permite negociar ``Accept: text/event-stream``. Las respuestas exitosas
+    son ``StreamingHttpResponse``; este renderer solo formatea los errores
+    (validación, 404...) como un evento ``error``.
+    """
+    media_type = 'text/event-stream'
+    format = 'sse'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        return formato_sse('error', data).encode(self.charset)
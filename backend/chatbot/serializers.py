@@ -1,11 +1,49 @@
 """
 Serializers para la app Chatbot (AVI).
 """
+from django.conf import settings
+from django.urls import reverse
 from rest_framework import serializers
-from .models import AgenteVirtual, SesionPractica, Retroalimentacion, ConfiguracionServicio
+from rest_framework.utils.urls import replace_query_param
+
+from .models import (
+    AgenteVirtual, SesionPractica, Retroalimentacion, TurnoConversacion, ConfiguracionServicio
+)
+from .pagination import RetroalimentacionPagination
 from users.serializers import EstudianteSerializer
 
 
+class CamposDinamicosMixin:
+    """
+    Permite al cliente elegir la forma de la respuesta:
+    - ``?fields=id,titulo``: devuelve solo esos campos.
+    - ``?expand=retroalimentaciones``: incluye campos pesados (``Meta.campos_expandibles``).
+    
+    Los campos expandibles se omiten salvo que se pidan; la vista puede
+    expandir algunos por defecto con ``context['expandir']``.
+    """
+    
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        request = self.context.get('request')
+        params = request.query_params if request is not None else {}
+        
+        expandir = set(self.context.get('expandir', ()))
+        if 'expand' in params:
+            expandir = {campo.strip() for campo in params['expand'].split(',')}
+        campos = None
+        if params.get('fields'):
+            campos = {campo.strip() for campo in params['fields'].split(',')}
+            expandir |= campos
+        
+        expandibles = set(getattr(self.Meta, 'campos_expandibles', ()))
+        for nombre in list(self.fields):
+            if campos is not None and nombre not in campos:
+                self.fields.pop(nombre)
+            elif nombre in expandibles and nombre not in expandir:
+                self.fields.pop(nombre)
+
+
 class AgenteVirtualSerializer(serializers.ModelSerializer):
     """Serializer para el modelo AgenteVirtual."""
     
@@ -47,11 +85,29 @@ class RetroalimentacionCreateSerializer(serializers.ModelSerializer):
         fields = ['sesion', 'texto_original', 'texto_esperado', 'audio_estudiante']
 
 
-class SesionPracticaSerializer(serializers.ModelSerializer):
-    """Serializer para el modelo SesionPractica."""
+class TurnoConversacionSerializer(serializers.ModelSerializer):
+    """Serializer para un turno del historial de conversación."""
+    
+    class Meta:
+        model = TurnoConversacion
+        fields = ['id', 'tipo', 'texto', 'timestamp']
+
+
+class SesionPracticaSerializer(CamposDinamicosMixin, serializers.ModelSerializer):
+    """
+    Serializer para el modelo SesionPractica.
+    Embebe solo las últimas retroalimentaciones; el resto se pagina desde
+    ``retroalimentaciones_siguiente``, presente solo junto a ``retroalimentaciones``. El historial completo se pagina desde
+    ``historial_url``; ``?expand=historial_conversacion`` embebe sus últimos turnos.
+    """
     agente = AgenteVirtualSerializer(read_only=True)
-    retroalimentaciones = RetroalimentacionSerializer(many=True, read_only=True)
-    total_retroalimentaciones = serializers.SerializerMethodField()
+    retroalimentaciones = serializers.SerializerMethodField()
+    retroalimentaciones_siguiente = serializers.SerializerMethodField()
+    historial_conversacion = serializers.SerializerMethodField()
+    historial_url = serializers.SerializerMethodField()
+    
+    limite_retroalimentaciones = 10
+    limite_historial = 50
     
     class Meta:
         model = SesionPractica
@@ -60,12 +116,52 @@ class SesionPracticaSerializer(serializers.ModelSerializer):
             'nivel_dificultad', 'duracion_minutos', 'palabras_practicadas',
             'frases_correctas', 'frases_incorrectas', 'puntuacion_sesion',
             'estado', 'fecha_inicio', 'fecha_fin',
-            'historial_conversacion', 'retroalimentaciones', 'total_retroalimentaciones'
+            'historial_conversacion', 'historial_url', 'retroalimentaciones', 'retroalimentaciones_siguiente',
+            'total_retroalimentaciones'
+        ]
+        # Estado y métricas cambian solo con las interacciones y al finalizar, que
+        # también actualizan EstadisticasEstudiante: editarlos aquí las desviaría
+        read_only_fields = [
+            'id', 'estudiante', 'fecha_inicio', 'fecha_fin', 'estado', 'duracion_minutos',
+            'palabras_practicadas', 'frases_correctas', 'frases_incorrectas',
+            'puntuacion_sesion', 'total_retroalimentaciones'
         ]
-        read_only_fields = ['id', 'estudiante', 'fecha_inicio', 'puntuacion_sesion']
+        campos_expandibles = ['historial_conversacion', 'retroalimentaciones']
+    
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # El cursor continúa la parte embebida: sin ella no se calcula (ni su consulta)
+        if 'retroalimentaciones' not in self.fields:
+            self.fields.pop('retroalimentaciones_siguiente', None)
+    
+    def _ultimas_retroalimentaciones(self, obj):
+        if not hasattr(obj, '_ultimas_retroalimentaciones'):
+            obj._ultimas_retroalimentaciones = list(
+                obj.retroalimentaciones.order_by('-created_at', '-id')[:self.limite_retroalimentaciones]
+            )
+        return obj._ultimas_retroalimentaciones
+    
+    def get_retroalimentaciones(self, obj):
+        return RetroalimentacionSerializer(self._ultimas_retroalimentaciones(obj), many=True).data
     
-    def get_total_retroalimentaciones(self, obj):
-        return obj.retroalimentaciones.count()
+    def get_retroalimentaciones_siguiente(self, obj):
+        # El contador evita consultar cuando todo cabe en la parte embebida
+        if obj.total_retroalimentaciones <= self.limite_retroalimentaciones:
+            return None
+        ultimas = self._ultimas_retroalimentaciones(obj)
+        url = self._url(f"{reverse('retroalimentacion_list')}?sesion_id={obj.id}")
+        return replace_query_param(url, 'cursor', RetroalimentacionPagination.cursor_para(ultimas[-1]))
+    
+    def _url(self, url):
+        request = self.context.get('request')
+        return request.build_absolute_uri(url) if request is not None else url
+    
+    def get_historial_conversacion(self, obj):
+        ultimos = list(obj.turnos.order_by('-id')[:self.limite_historial])
+        return [turno.como_dict() for turno in reversed(ultimos)]
+    
+    def get_historial_url(self, obj):
+        return self._url(reverse('sesion_historial', args=[obj.id]))
 
 
 class SesionPracticaCreateSerializer(serializers.ModelSerializer):
@@ -89,25 +185,45 @@ class SesionPracticaListSerializer(serializers.ModelSerializer):
         ]
 
 
-class InteraccionRequestSerializer(serializers.Serializer):
+class InteraccionItemSerializer(serializers.Serializer):
     """
-    Serializer para solicitud de interacción con el agente virtual.
-    El estudiante envía su audio/texto y recibe respuesta del agente.
+    Una frase del estudiante: texto y/o audio, y el texto esperado.
     """
-    sesion_id = serializers.IntegerField()
     texto_estudiante = serializers.CharField(required=False, allow_blank=True)
+    audio = serializers.FileField(required=False, allow_empty_file=False)
     audio_base64 = serializers.CharField(required=False, allow_blank=True)
     texto_esperado = serializers.CharField(required=False, allow_blank=True)
     
     def validate(self, attrs):
         """Validar que se envíe texto o audio."""
-        if not attrs.get('texto_estudiante') and not attrs.get('audio_base64'):
+        if not attrs.get('texto_estudiante') and not attrs.get('audio') and not attrs.get('audio_base64'):
             raise serializers.ValidationError(
                 'Debe enviar texto o audio del estudiante.'
             )
         return attrs
 
 
+class InteraccionRequestSerializer(InteraccionItemSerializer):
+    """
+    Serializer para solicitud de interacción con el agente virtual.
+    El estudiante envía su audio/texto y recibe respuesta del agente.
+    """
+    sesion_id = serializers.IntegerField()
+
+
+class InteraccionLoteRequestSerializer(serializers.Serializer):
+    """
+    Lote ordenado de frases de una sesión (ej. grabadas sin conexión).
+    El audio de cada frase va en ``audio_base64``.
+    """
+    sesion_id = serializers.IntegerField()
+    interacciones = serializers.ListField(
+        child=InteraccionItemSerializer(),
+        min_length=1,
+        max_length=settings.INTERACCION_LOTE_MAX
+    )
+
+
 class InteraccionResponseSerializer(serializers.Serializer):
     """
     Serializer de respuesta de la interacción con el agente virtual.
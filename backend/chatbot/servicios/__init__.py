@@ -0,0 +1,10 @@
+"""
+Servicios del agente virtual: pipeline ASR -> NLP -> TTS.
+"""
+from .base import ContextoInteraccion, Etapa, ErrorEtapa, registrar_backend
+from .motor import ETAPAS, MotorPipeline
+
+__all__ = [
+    'ContextoInteraccion', 'Etapa', 'ErrorEtapa', 'registrar_backend',
+    'ETAPAS', 'MotorPipeline',
+]
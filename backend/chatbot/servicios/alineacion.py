@@ -0,0 +1,190 @@
+"""
+Alineación entre lo que dijo el estudiante y el texto esperado.
+
+Se normalizan ambos textos (mayúsculas, puntuación, contracciones) y se
+calcula la alineación de distancia de edición mínima entre las secuencias de
+palabras. Una palabra insertada ya no desplaza a las siguientes: se reporta
+como inserción y el resto sigue alineado.
+
+Para que los párrafos largos sigan por debajo del milisegundo:
+- se recortan el prefijo y el sufijo comunes (el caso habitual es casi correcto);
+- la matriz de distancias se calcula en paralelo por bits (Myers/Hyyrö): una
+  columna son unas pocas operaciones sobre enteros, y la reconstrucción del
+  camino lee cada celda con un conteo de bits;
+- normalización, tokenización y alineación están en cachés LRU, así que las
+  etapas de pronunciación y gramática comparten el mismo cálculo.
+"""
+import re
+import unicodedata
+from collections import namedtuple
+from functools import lru_cache
+
+CORRECTA = 'correcta'
+SUSTITUCION = 'sustitucion'
+OMISION = 'omision'
+INSERCION = 'insercion'
+
+CONTRACCIONES = {
+    "won't": 'will not', "can't": 'cannot', "shan't": 'shall not', "ain't": 'is not',
+    "let's": 'let us', "i'm": 'i am', "y'all": 'you all',
+}
+_SUFIJOS_CONTRACCION = (
+    ("n't", ' not'), ("'re", ' are'), ("'ve", ' have'), ("'ll", ' will'), ("'d", ' would'),
+)
+_APOSTROFOS = str.maketrans({'’': "'", '‘': "'", '`': "'", '´': "'"})
+_PALABRA = re.compile(r"\w+(?:'\w+)*")
+
+Operacion = namedtuple('Operacion', 'tipo posicion palabra palabra_esperada')
+Alineacion = namedtuple('Alineacion', 'operaciones correctas sustituciones omisiones inserciones')
+
+
+def _expandir(palabra):
+    if palabra in CONTRACCIONES:
+        return CONTRACCIONES[palabra]
+    for sufijo, expansion in _SUFIJOS_CONTRACCION:
+        if palabra.endswith(sufijo) and len(palabra) > len(sufijo):
+            return palabra[:-len(sufijo)] + expansion
+    return palabra
+
+
+@lru_cache(maxsize=4096)
+def normalizar(texto):
+    """Minúsculas, apóstrofos unificados, sin puntuación y con contracciones expandidas."""
+    texto = unicodedata.normalize('NFKC', texto).lower().translate(_APOSTROFOS)
+    return ' '.join(
+        _expandir(palabra) if "'" in palabra else palabra
+        for palabra in _PALABRA.findall(texto)
+    )
+
+
+@lru_cache(maxsize=4096)
+def tokenizar(texto):
+    """Tupla de palabras normalizadas de ``texto``."""
+    return tuple(normalizar(texto).replace("'", '').split())
+
+
+def _columnas(a, b):
+    """
+    Recorre ``b`` columna a columna con el algoritmo de bits de Myers/Hyyrö:
+    cada columna de la matriz de distancias se guarda como dos enteros con los
+    incrementos (+1/-1) verticales, sin importar cuántas palabras tenga ``a``.
+    """
+    mascara = (1 << len(a)) - 1
+    posiciones = {}
+    for i, palabra in enumerate(a):
+        posiciones[palabra] = posiciones.get(palabra, 0) | (1 << i)
+    positivos, negativos = mascara, 0
+    columnas = [(positivos, negativos)]
+    for palabra in b:
+        x = posiciones.get(palabra, 0) | negativos
+        d0 = (((x & positivos) + positivos) ^ positivos) | x
+        horizontales_pos = negativos | ~(d0 | positivos)
+        horizontales_neg = d0 & positivos
+        horizontales_pos = (horizontales_pos << 1) | 1
+        horizontales_neg <<= 1
+        positivos = (horizontales_neg | ~(d0 | horizontales_pos)) & mascara
+        negativos = horizontales_pos & d0 & mascara
+        columnas.append((positivos, negativos))
+    return columnas
+
+
+def _alinear_medio(a, b, inicio):
+    """Operaciones que alinean ``a`` (estudiante) con ``b`` (esperado); posiciones desde ``inicio``."""
+    n, m = len(a), len(b)
+    if not n:
+        return [Operacion(OMISION, inicio + j, None, b[j]) for j in range(m)]
+    if not m:
+        return [Operacion(INSERCION, inicio, a[i], None) for i in range(n)]
+
+    columnas = _columnas(a, b)
+
+    def distancia(i, j):
+        positivos, negativos = columnas[j]
+        filas = (1 << i) - 1
+        return j + (positivos & filas).bit_count() - (negativos & filas).bit_count()
+
+    operaciones = []
+    i, j = n, m
+    valor = distancia(i, j)
+    while i or j:
+        if i and j:
+            diagonal = distancia(i - 1, j - 1)
+            if diagonal + (a[i - 1] != b[j - 1]) == valor:
+                tipo = CORRECTA if a[i - 1] == b[j - 1] else SUSTITUCION
+                operaciones.append(Operacion(tipo, inicio + j - 1, a[i - 1], b[j - 1]))
+                i -= 1
+                j -= 1
+                valor = diagonal
+                continue
+        if j:
+            izquierda = distancia(i, j - 1)
+            if izquierda + 1 == valor:
+                operaciones.append(Operacion(OMISION, inicio + j - 1, None, b[j - 1]))
+                j -= 1
+                valor = izquierda
+                continue
+        operaciones.append(Operacion(INSERCION, inicio + j, a[i - 1], None))
+        i -= 1
+        valor -= 1
+    operaciones.reverse()
+    return operaciones
+
+
+@lru_cache(maxsize=1024)
+def alinear(texto_estudiante, texto_esperado):
+    """
+    Alinea los dos textos y devuelve una ``Alineacion``. Cada ``Operacion``
+    lleva la posición en el texto esperado (para inserciones, la posición
+    antes de la cual se insertó la palabra).
+    """
+    a = tokenizar(texto_estudiante)
+    b = tokenizar(texto_esperado)
+
+    prefijo = 0
+    limite = min(len(a), len(b))
+    while prefijo < limite and a[prefijo] == b[prefijo]:
+        prefijo += 1
+    sufijo = 0
+    limite -= prefijo
+    while sufijo < limite and a[-1 - sufijo] == b[-1 - sufijo]:
+        sufijo += 1
+
+    operaciones = [Operacion(CORRECTA, j, b[j], b[j]) for j in range(prefijo)]
+    operaciones += _alinear_medio(a[prefijo:len(a) - sufijo], b[prefijo:len(b) - sufijo], prefijo)
+    operaciones += [Operacion(CORRECTA, j, b[j], b[j]) for j in range(len(b) - sufijo, len(b))]
+
+    conteo = {CORRECTA: 0, SUSTITUCION: 0, OMISION: 0, INSERCION: 0}
+    for operacion in operaciones:
+        conteo[operacion.tipo] += 1
+    return Alineacion(
+        tuple(operaciones), conteo[CORRECTA], conteo[SUSTITUCION], conteo[OMISION], conteo[INSERCION]
+    )
+
+
+def puntuacion(alineacion):
+    """Porcentaje de palabras correctas sobre las esperadas más las insertadas."""
+    total = alineacion.correctas + alineacion.sustituciones + alineacion.omisiones + alineacion.inserciones
+    if not total:
+        return 0.0
+    return 100.0 * alineacion.correctas / total
+
+
+def errores(alineacion):
+    """Errores en el formato de ``Retroalimentacion.errores_gramaticales`` y sugerencias."""
+    lista = []
+    sugerencias = []
+    for operacion in alineacion.operaciones:
+        if operacion.tipo == SUSTITUCION:
+            lista.append({
+                'tipo': SUSTITUCION,
+                'palabra_incorrecta': operacion.palabra,
+                'palabra_correcta': operacion.palabra_esperada,
+                'posicion': operacion.posicion,
+            })
+            sugerencias.append(f"Pronuncia '{operacion.palabra_esperada}' en lugar de '{operacion.palabra}'")
+        elif operacion.tipo == OMISION:
+            lista.append({'tipo': OMISION, 'palabra': operacion.palabra_esperada, 'posicion': operacion.posicion})
+            sugerencias.append(f"Te faltó la palabra '{operacion.palabra_esperada}'")
+        elif operacion.tipo == INSERCION:
+            lista.append({'tipo': INSERCION, 'palabra': operacion.palabra, 'posicion': operacion.posicion})
+    return lista, sugerencias
@@ -0,0 +1,555 @@
+"""
+Reconocimiento de voz (ASR) con servidor de modelo compartido.
+
+Los modelos ASR (Vosk/Whisper) ocupan cientos de MB. En lugar de cargarlos en
+cada worker de gunicorn, ``manage.py servidor_asr`` mantiene una sola copia y
+atiende a todos los workers por un socket Unix. Si el servidor no está
+disponible, la etapa carga el modelo en el propio proceso. En ambos casos las
+transcripciones concurrentes pasan por un ``PlanificadorLotes`` por modelo,
+que las agrupa en micro-lotes (ver ``servicios/lotes.py``).
+
+Protocolo (por conexión, una petición):
+    petición:  <4 bytes longitud><JSON cabecera><audio crudo de ``bytes`` bytes>
+    respuesta: <4 bytes longitud><JSON {"texto": ...} o {"error": ...}>
+
+Modo incremental (cabecera con ``"stream": true`` y ``"frecuencia"``): el
+cliente envía bloques PCM16 como <4 bytes longitud><pcm> y recibe
+``{"parcial": ...}`` por bloque; un bloque de longitud 0 cierra el audio y
+la respuesta es ``{"texto": ...}`` con la transcripción final.
+
+Con la cabecera ``{"estadisticas": true}`` el servidor responde
+``{"estadisticas": ...}`` con las de sus planificadores de lotes.
+"""
+import io
+import json
+import logging
+import os
+import socket
+import socketserver
+import struct
+import threading
+import time
+import wave
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+
+from ..models import TipoServicio
+from .base import Etapa, ErrorEtapa, registrar_backend
+from .lotes import PlanificadorLotes
+
+logger = logging.getLogger(__name__)
+
+TAMAÑO_BLOQUE = 64 * 1024
+_CABECERA = struct.Struct('!I')
+
+
+# Tipos MIME del PCM16 mono crudo (sin cabecera, 16 kHz)
+TIPOS_PCM = {'audio/l16', 'audio/pcm'}
+
+# Máximo de la cabecera JSON de una petición al servidor ASR
+CABECERA_MAX_BYTES = 64 * 1024
+
+
+def es_wav(datos):
+    return datos[:4] == b'RIFF' and datos[8:12] == b'WAVE'
+
+
+def leer_pcm(audio, tipo=None):
+    """
+    Devuelve ``(pcm16_mono, frecuencia)`` de un WAV PCM16 mono o, si ``tipo``
+    es uno de ``TIPOS_PCM``, de PCM16 crudo a 16 kHz. Los demás formatos
+    (webm, mp3, ogg...) los modelos no los decodifican: lanza ``ErrorEtapa``.
+    """
+    if not es_wav(audio):
+        if (tipo or '').lower() in TIPOS_PCM:
+            return bytes(audio), 16000
+        raise ErrorEtapa(
+            f'Formato de audio no soportado por el ASR ({tipo or "desconocido"}): se espera WAV PCM16 o audio/L16'
+        )
+    try:
+        with wave.open(io.BytesIO(audio), 'rb') as entrada:
+            if entrada.getsampwidth() != 2 or entrada.getnchannels() != 1:
+                raise ErrorEtapa('El ASR necesita WAV PCM de 16 bits y un canal')
+            return entrada.readframes(entrada.getnframes()), entrada.getframerate()
+    except (wave.Error, EOFError) as exc:
+        raise ErrorEtapa(f'WAV no soportado por el ASR: {exc}')
+
+
+def pcm_a_wav(pcm, frecuencia):
+    """Empaqueta PCM16 mono en un WAV en memoria."""
+    buffer = io.BytesIO()
+    with wave.open(buffer, 'wb') as salida:
+        salida.setnchannels(1)
+        salida.setsampwidth(2)
+        salida.setframerate(frecuencia)
+        salida.writeframes(pcm)
+    buffer.seek(0)
+    return buffer
+
+
+# ==================== MODELOS ====================
+
+class ModeloASR:
+    """Interfaz de un modelo ASR cargado en memoria."""
+
+    def __init__(self, opciones):
+        self.opciones = opciones
+
+    def transcribir(self, audio, tipo=None):
+        """Transcribe los bytes de audio (ver ``leer_pcm``) y devuelve el texto."""
+        return self.transcribir_pcm(*leer_pcm(audio, tipo))
+
+    def transcribir_pcm(self, pcm, frecuencia):
+        raise NotImplementedError
+
+    def transcribir_lote(self, clips):
+        """
+        Transcribe una lista de ``(pcm, frecuencia)``. Por defecto uno a uno;
+        los modelos vectorizados la sobrescriben con una sola inferencia.
+        """
+        return [self.transcribir_pcm(pcm, frecuencia) for pcm, frecuencia in clips]
+
+    def crear_reconocedor(self, frecuencia, lock):
+        """Reconocedor incremental; por defecto re-transcribe el audio acumulado."""
+        return ReconocedorAcumulado(self, frecuencia, lock)
+
+
+class ModeloSimulado(ModeloASR):
+    """
+    Modelo de prueba: devuelve la transcripción configurada. Con
+    ``palabras_por_segundo`` la transcripción crece con la duración del audio,
+    lo que permite probar los resultados parciales. ``latencia_ms`` y
+    ``latencia_item_ms`` simulan el costo de una inferencia por lote (fijo y
+    por clip).
+    """
+
+    def transcribir_pcm(self, pcm, frecuencia):
+        return self.transcribir_lote([(pcm, frecuencia)])[0]
+
+    def transcribir_lote(self, clips):
+        latencia_ms = self.opciones.get('latencia_ms', 0) + self.opciones.get('latencia_item_ms', 0) * len(clips)
+        if latencia_ms:
+            time.sleep(latencia_ms / 1000)
+        textos = []
+        for pcm, frecuencia in clips:
+            palabras = self.opciones.get('transcripcion', '').split()
+            por_segundo = self.opciones.get('palabras_por_segundo')
+            if por_segundo:
+                segundos = len(pcm) / (2 * frecuencia)
+                palabras = palabras[:int(segundos * por_segundo)]
+            textos.append(' '.join(palabras))
+        return textos
+
+
+class ModeloVosk(ModeloASR):
+    """Modelo Vosk (Kaldi). Requiere el paquete ``vosk`` y ``ruta_modelo``."""
+
+    def __init__(self, opciones):
+        super().__init__(opciones)
+        try:
+            import vosk
+        except ImportError:
+            raise ImproperlyConfigured('El modelo ASR "vosk" requiere instalar el paquete vosk.')
+        self.vosk = vosk
+        self.modelo = vosk.Model(opciones['ruta_modelo'])
+
+    def transcribir_pcm(self, pcm, frecuencia):
+        reconocedor = self.vosk.KaldiRecognizer(self.modelo, frecuencia)
+        reconocedor.AcceptWaveform(pcm)
+        return json.loads(reconocedor.FinalResult()).get('text', '')
+
+    def crear_reconocedor(self, frecuencia, lock):
+        return ReconocedorVosk(self.vosk.KaldiRecognizer(self.modelo, frecuencia))
+
+
+class ModeloWhisper(ModeloASR):
+    """Modelo Whisper. Requiere ``openai-whisper`` y ``numpy``; espera audio a 16 kHz."""
+
+    def __init__(self, opciones):
+        super().__init__(opciones)
+        try:
+            import numpy
+            import whisper
+        except ImportError:
+            raise ImproperlyConfigured('El modelo ASR "whisper" requiere instalar openai-whisper y numpy.')
+        self.numpy = numpy
+        self.whisper = whisper
+        self.modelo = whisper.load_model(opciones.get('nombre', 'base'))
+
+    def _muestras(self, pcm):
+        return self.numpy.frombuffer(pcm, dtype=self.numpy.int16).astype(self.numpy.float32) / 32768
+
+    def transcribir_pcm(self, pcm, frecuencia):
+        resultado = self.modelo.transcribe(
+            self._muestras(pcm), language=self.opciones.get('idioma', 'en'), fp16=False
+        )
+        return resultado['text'].strip()
+
+    def transcribir_lote(self, clips):
+        """
+        Los clips de hasta 30 s (una ventana de Whisper) se decodifican juntos
+        en un solo paso del modelo; los más largos, con ``transcribe``.
+        """
+        import torch
+
+        textos = [None] * len(clips)
+        cortos = [
+            indice for indice, (pcm, _) in enumerate(clips)
+            if len(pcm) // 2 <= self.whisper.audio.N_SAMPLES
+        ]
+        if cortos:
+            espectrogramas = torch.stack([
+                self.whisper.log_mel_spectrogram(
+                    self.whisper.pad_or_trim(self._muestras(clips[indice][0])), self.modelo.dims.n_mels
+                )
+                for indice in cortos
+            ]).to(self.modelo.device)
+            resultados = self.whisper.decode(
+                self.modelo, espectrogramas,
+                self.whisper.DecodingOptions(language=self.opciones.get('idioma', 'en'), fp16=False)
+            )
+            for indice, resultado in zip(cortos, resultados):
+                textos[indice] = resultado.text.strip()
+        return [
+            texto if texto is not None else self.transcribir_pcm(*clips[indice])
+            for indice, texto in enumerate(textos)
+        ]
+
+
+# ==================== RECONOCIMIENTO INCREMENTAL ====================
+
+class ReconocedorAcumulado:
+    """
+    Reconocimiento incremental para modelos sin modo streaming: acumula el
+    audio y, cada ``intervalo_ms`` de audio nuevo, re-transcribe lo acumulado
+    para dar una hipótesis parcial.
+    """
+
+    def __init__(self, modelo, frecuencia, lock, intervalo_ms=500):
+        self.modelo = modelo
+        self.frecuencia = frecuencia
+        self.lock = lock
+        self.intervalo_bytes = frecuencia * 2 * intervalo_ms // 1000
+        self.pcm = bytearray()
+        self.parcial = ''
+        self._pendientes = 0
+
+    def aceptar(self, pcm):
+        """Agrega un bloque PCM16 y devuelve la hipótesis parcial actual."""
+        self.pcm += pcm
+        self._pendientes += len(pcm)
+        if self._pendientes >= self.intervalo_bytes:
+            self._pendientes = 0
+            with self.lock:
+                self.parcial = self.modelo.transcribir_pcm(bytes(self.pcm), self.frecuencia)
+        return self.parcial
+
+    def finalizar(self):
+        """Transcripción final del audio completo."""
+        with self.lock:
+            return self.modelo.transcribir_pcm(bytes(self.pcm), self.frecuencia)
+
+    def cerrar(self):
+        pass
+
+
+class ReconocedorVosk:
+    """Reconocimiento incremental nativo de Vosk: confirma frases y da parciales."""
+
+    def __init__(self, reconocedor):
+        self.reconocedor = reconocedor
+        self.confirmado = []
+
+    def _texto(self, *extra):
+        return ' '.join(parte for parte in (*self.confirmado, *extra) if parte)
+
+    def aceptar(self, pcm):
+        if self.reconocedor.AcceptWaveform(bytes(pcm)):
+            self.confirmado.append(json.loads(self.reconocedor.Result()).get('text', ''))
+            return self._texto()
+        return self._texto(json.loads(self.reconocedor.PartialResult()).get('partial', ''))
+
+    def finalizar(self):
+        return self._texto(json.loads(self.reconocedor.FinalResult()).get('text', ''))
+
+    def cerrar(self):
+        pass
+
+
+MODELOS = {
+    'simulado': ModeloSimulado,
+    'vosk': ModeloVosk,
+    'whisper': ModeloWhisper,
+}
+
+_modelos = {}
+_planificadores = {}
+_modelos_lock = threading.Lock()
+
+
+def obtener_modelo(nombre, opciones):
+    """
+    Carga (una vez por proceso) el modelo ``nombre`` con ``opciones``.
+    Devuelve ``(modelo, lock)``: la inferencia se serializa por modelo.
+    """
+    clave = (nombre, json.dumps(opciones, sort_keys=True))
+    with _modelos_lock:
+        if clave not in _modelos:
+            try:
+                clase = MODELOS[nombre]
+            except KeyError:
+                raise ErrorEtapa(f"Modelo ASR '{nombre}' desconocido")
+            logger.info('Cargando modelo ASR %s', nombre)
+            _modelos[clave] = (clase(opciones), threading.Lock())
+        return _modelos[clave]
+
+
+def obtener_planificador(nombre, opciones):
+    """Planificador de micro-lotes del modelo ``nombre`` (uno por modelo y proceso)."""
+    clave = (nombre, json.dumps(opciones, sort_keys=True))
+    modelo, lock = obtener_modelo(nombre, opciones)
+    with _modelos_lock:
+        if clave not in _planificadores:
+            def transcribir_lote(clips):
+                with lock:
+                    return modelo.transcribir_lote(clips)
+            _planificadores[clave] = PlanificadorLotes(transcribir_lote, nombre=f'asr:{nombre}')
+        return _planificadores[clave]
+
+
+def estadisticas_lotes():
+    """Estadísticas de los planificadores de lotes de este proceso."""
+    with _modelos_lock:
+        planificadores = list(_planificadores.values())
+    return {planificador.nombre: planificador.estadisticas() for planificador in planificadores}
+
+
+def transcribir_en_proceso(nombre, opciones, audio, tipo=None):
+    return obtener_planificador(nombre, opciones).enviar(leer_pcm(audio, tipo))
+
+
+def reconocedor_en_proceso(nombre, opciones, frecuencia):
+    modelo, lock = obtener_modelo(nombre, opciones)
+    return modelo.crear_reconocedor(frecuencia, lock)
+
+
+# ==================== PROTOCOLO ====================
+
+def _recibir_exacto(conexion, tamaño):
+    datos = bytearray(tamaño)
+    vista = memoryview(datos)
+    recibidos = 0
+    while recibidos < tamaño:
+        leidos = conexion.recv_into(vista[recibidos:], min(TAMAÑO_BLOQUE, tamaño - recibidos))
+        if not leidos:
+            raise ConnectionError('Conexión cerrada antes de recibir el mensaje completo')
+        recibidos += leidos
+    return datos
+
+
+def _recibir_longitud(conexion, maximo):
+    (longitud,) = _CABECERA.unpack(_recibir_exacto(conexion, _CABECERA.size))
+    if longitud > maximo:
+        raise ErrorEtapa(f'Mensaje de {longitud} bytes; el máximo es {maximo}')
+    return longitud
+
+
+def _recibir_json(conexion):
+    longitud = _recibir_longitud(conexion, CABECERA_MAX_BYTES)
+    return json.loads(_recibir_exacto(conexion, longitud))
+
+
+def _enviar_json(conexion, datos):
+    contenido = json.dumps(datos).encode('utf-8')
+    conexion.sendall(_CABECERA.pack(len(contenido)) + contenido)
+
+
+class ServidorNoDisponible(Exception):
+    """No hay servidor ASR escuchando en el socket."""
+
+
+class ClienteASR:
+    """Cliente del servidor ASR compartido."""
+
+    def __init__(self, ruta_socket=None, timeout=None):
+        self.ruta_socket = ruta_socket or settings.ASR_SOCKET_PATH
+        self.timeout = timeout
+
+    def _conectar(self):
+        conexion = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        conexion.settimeout(self.timeout)
+        try:
+            conexion.connect(self.ruta_socket)
+        except (FileNotFoundError, ConnectionRefusedError) as exc:
+            conexion.close()
+            raise ServidorNoDisponible(str(exc))
+        return conexion
+
+    def reconocedor(self, modelo, opciones, frecuencia):
+        """Abre un reconocimiento incremental en el servidor."""
+        conexion = self._conectar()
+        _enviar_json(conexion, {'modelo': modelo, 'opciones': opciones, 'stream': True, 'frecuencia': frecuencia})
+        return ReconocedorRemoto(conexion)
+
+    def estadisticas(self):
+        """Estadísticas de lotes del servidor."""
+        with self._conectar() as conexion:
+            _enviar_json(conexion, {'estadisticas': True})
+            return _recibir_json(conexion)['estadisticas']
+
+    def transcribir(self, audio, modelo, opciones, tipo=None):
+        """
+        Envía el audio (archivo binario) por bloques y devuelve la transcripción.
+        ``tipo`` es el tipo MIME del audio, para el PCM crudo (ver ``leer_pcm``).
+        """
+        conexion = self._conectar()
+        with conexion:
+            audio.seek(0, os.SEEK_END)
+            tamaño = audio.tell()
+            audio.seek(0)
+            _enviar_json(conexion, {'modelo': modelo, 'opciones': opciones, 'bytes': tamaño, 'tipo': tipo})
+            while True:
+                bloque = audio.read(TAMAÑO_BLOQUE)
+                if not bloque:
+                    break
+                conexion.sendall(bloque)
+            respuesta = _recibir_json(conexion)
+
+        if 'error' in respuesta:
+            raise ErrorEtapa(f"Servidor ASR: {respuesta['error']}")
+        return respuesta['texto']
+
+
+class ReconocedorRemoto:
+    """Reconocimiento incremental que se ejecuta en el servidor ASR."""
+
+    def __init__(self, conexion):
+        self.conexion = conexion
+
+    def _enviar(self, pcm):
+        self.conexion.sendall(_CABECERA.pack(len(pcm)) + bytes(pcm))
+        respuesta = _recibir_json(self.conexion)
+        if 'error' in respuesta:
+            raise ErrorEtapa(f"Servidor ASR: {respuesta['error']}")
+        return respuesta
+
+    def aceptar(self, pcm):
+        if not pcm:
+            return ''
+        return self._enviar(pcm)['parcial']
+
+    def finalizar(self):
+        try:
+            return self._enviar(b'')['texto']
+        finally:
+            self.cerrar()
+
+    def cerrar(self):
+        self.conexion.close()
+
+
+class _ManejadorASR(socketserver.BaseRequestHandler):
+
+    def _incremental(self, peticion):
+        reconocedor = reconocedor_en_proceso(
+            peticion['modelo'], peticion.get('opciones') or {}, peticion.get('frecuencia', 16000)
+        )
+        recibidos = 0
+        while True:
+            longitud = _recibir_longitud(self.request, settings.AUDIO_MAX_BYTES - recibidos)
+            if not longitud:
+                _enviar_json(self.request, {'texto': reconocedor.finalizar()})
+                return
+            recibidos += longitud
+            parcial = reconocedor.aceptar(_recibir_exacto(self.request, longitud))
+            _enviar_json(self.request, {'parcial': parcial})
+
+    def handle(self):
+        try:
+            peticion = _recibir_json(self.request)
+            if peticion.get('estadisticas'):
+                return _enviar_json(self.request, {'estadisticas': estadisticas_lotes()})
+            if peticion.get('stream'):
+                return self._incremental(peticion)
+            tamaño = peticion.get('bytes')
+            # El tamaño lo declara el cliente: se valida antes de reservar memoria para el audio
+            if not isinstance(tamaño, int) or not 0 < tamaño <= settings.AUDIO_MAX_BYTES:
+                raise ErrorEtapa(f'Tamaño de audio inválido: {tamaño!r} (máximo {settings.AUDIO_MAX_BYTES} bytes)')
+            audio = _recibir_exacto(self.request, tamaño)
+            texto = transcribir_en_proceso(
+                peticion['modelo'], peticion.get('opciones') or {}, audio, peticion.get('tipo')
+            )
+            _enviar_json(self.request, {'texto': texto})
+        except Exception as exc:
+            if isinstance(exc, ErrorEtapa):
+                # Petición inválida (formato, tamaño): sin traza
+                logger.warning('Petición ASR rechazada: %s', exc)
+            else:
+                logger.exception('Error atendiendo petición ASR')
+            try:
+                _enviar_json(self.request, {'error': str(exc)})
+            except OSError:
+                pass
+
+
+class ServidorASR(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """Servidor de inferencia ASR: una copia de cada modelo para todos los workers."""
+    daemon_threads = True
+    # Con el backlog por defecto (5) las ráfagas de los workers reciben EAGAIN al conectar
+    request_queue_size = 128
+
+    def __init__(self, ruta_socket):
+        if os.path.exists(ruta_socket):
+            os.unlink(ruta_socket)
+        super().__init__(ruta_socket, _ManejadorASR)
+        os.chmod(ruta_socket, 0o660)
+
+    def server_close(self):
+        super().server_close()
+        if os.path.exists(self.server_address):
+            os.unlink(self.server_address)
+
+
+# ==================== ETAPA ====================
+
+@registrar_backend('asr', 'modelo')
+class ASRModelo(Etapa):
+    """
+    Etapa ASR con un modelo real. Configuración:
+    ``{"backend": "modelo", "modelo": "vosk", "opciones": {"ruta_modelo": "..."}}``.
+    Usa el servidor compartido y, si no está levantado, el modelo en el proceso.
+    """
+    nombre = 'asr'
+    tipo = TipoServicio.ASR
+    depende_de = ('preprocesamiento',)
+    timeout_ms = 10000
+
+    def debe_ejecutarse(self, contexto):
+        return contexto.audio is not None and not contexto.texto_estudiante
+
+    def ejecutar(self, contexto):
+        modelo = self.configuracion.get('modelo', 'simulado')
+        opciones = self.configuracion.get('opciones', {})
+        cliente = ClienteASR(self.configuracion.get('socket'), timeout=self.timeout_ms / 1000)
+        # El audio preprocesado es WAV; el original puede ser PCM crudo declarado por su tipo
+        tipo = None if contexto.audio_procesado is not None else getattr(contexto.audio, 'content_type', None)
+        try:
+            return {'texto': cliente.transcribir(contexto.audio_asr, modelo, opciones, tipo)}
+        except ServidorNoDisponible:
+            logger.info('Servidor ASR no disponible, usando el modelo en el proceso')
+        return {'texto': transcribir_en_proceso(modelo, opciones, contexto.audio_asr.read(), tipo)}
+
+    def reconocedor(self, frecuencia):
+        """Reconocedor incremental: en el servidor compartido o, si no está, en el proceso."""
+        modelo = self.configuracion.get('modelo', 'simulado')
+        opciones = self.configuracion.get('opciones', {})
+        try:
+            return ClienteASR(self.configuracion.get('socket'), timeout=self.timeout_ms / 1000).reconocedor(
+                modelo, opciones, frecuencia
+            )
+        except ServidorNoDisponible:
+            return reconocedor_en_proceso(modelo, opciones, frecuencia)
+
+    def por_defecto(self, contexto):
+        return {'texto': ''}
@@ -0,0 +1,136 @@
+"""
+Interfaces base del pipeline de servicios del agente virtual (ASR, NLP, TTS).
+
+Cada etapa del pipeline es una subclase de ``Etapa`` que declara su nombre,
+el tipo de servicio que la configura y las etapas de las que depende.
+Los backends concretos se registran con ``registrar_backend``.
+"""
+import copy
+
+from ..models import TipoServicio
+
+
+class ErrorEtapa(Exception):
+    """Error controlado producido por una etapa del pipeline."""
+
+
+class ContextoInteraccion:
+    """
+    Datos de entrada de una interacción y resultados acumulados por etapa.
+    Las etapas leen de aquí y devuelven un diccionario con su resultado.
+    ``audio`` es un archivo binario (file-like) posicionado al inicio, o ``None``.
+
+    El preprocesamiento deja en ``muestras``/``frecuencia`` el audio decodificado
+    y recortado (float32 mono) y en ``audio_procesado`` el mismo audio como WAV.
+    Una etapa puede llamar a ``cancelar`` para que no se ejecuten las siguientes.
+
+    El motor ejecuta cada etapa sobre su propia copia (``para_etapa``) y pasa sus
+    cambios a este contexto solo si termina a tiempo (``incorporar``): una etapa
+    que excede su timeout sigue corriendo en su hilo, pero ya no lo modifica.
+    """
+    # Se copian por etapa; el motor los completa en el contexto original
+    CAMPOS_MOTOR = ('resultados', 'errores', 'tiempos_ms')
+
+    def __init__(self, texto_estudiante='', texto_esperado='', audio=None, agente=None):
+        self.texto_estudiante = texto_estudiante or ''
+        self.texto_esperado = texto_esperado or ''
+        self.audio = audio
+        self.agente = agente
+        self.muestras = None
+        self.frecuencia = None
+        self.audio_procesado = None
+        self.cancelacion = None
+        self.resultados = {}
+        self.errores = {}
+        self.tiempos_ms = {}
+
+    @property
+    def audio_asr(self):
+        """Audio que recibe el ASR: el preprocesado si existe, si no el original."""
+        audio = self.audio_procesado if self.audio_procesado is not None else self.audio
+        if audio is not None:
+            audio.seek(0)
+        return audio
+
+    def para_etapa(self):
+        """Copia del contexto sobre la que trabaja una etapa."""
+        copia = copy.copy(self)
+        for campo in self.CAMPOS_MOTOR:
+            setattr(copia, campo, dict(getattr(self, campo)))
+        return copia
+
+    def incorporar(self, copia, base):
+        """
+        Pasa a este contexto los atributos que la etapa cambió en ``copia``
+        respecto de ``base`` (``vars`` del contexto al crear la copia).
+        """
+        for campo, valor in vars(copia).items():
+            if campo not in self.CAMPOS_MOTOR and valor is not base.get(campo):
+                setattr(self, campo, valor)
+
+    def cancelar(self, motivo):
+        """Detiene el pipeline al terminar el grupo de etapas actual."""
+        self.cancelacion = motivo
+
+    @property
+    def texto(self):
+        """Texto del estudiante: el enviado o, si no hay, la transcripción ASR."""
+        if self.texto_estudiante:
+            return self.texto_estudiante
+        return self.resultados.get('asr', {}).get('texto', '')
+
+    def resultado(self, etapa, clave, default=None):
+        return self.resultados.get(etapa, {}).get(clave, default)
+
+
+class Etapa:
+    """
+    Interfaz de una etapa del pipeline.
+
+    - ``nombre``: identificador de la etapa (clave en ``contexto.resultados``).
+    - ``tipo``: tipo de ``ConfiguracionServicio`` que la configura.
+    - ``depende_de``: etapas que deben terminar antes de ejecutar esta.
+    - ``timeout_ms``: tiempo máximo por defecto, sobrescribible desde la configuración.
+    """
+    nombre = ''
+    tipo = TipoServicio.NLP
+    depende_de = ()
+    timeout_ms = 2000
+
+    def __init__(self, configuracion=None):
+        self.configuracion = configuracion or {}
+        self.timeout_ms = int(self.configuracion.get('timeout_ms', self.timeout_ms))
+
+    def debe_ejecutarse(self, contexto):
+        """Permite omitir la etapa según la entrada (ej. ASR sin audio)."""
+        return True
+
+    def ejecutar(self, contexto):
+        """Procesa el contexto y devuelve un diccionario con el resultado."""
+        raise NotImplementedError
+
+    def por_defecto(self, contexto):
+        """Resultado usado cuando la etapa falla, se omite o excede su timeout."""
+        return {}
+
+
+_BACKENDS = {}
+
+
+def registrar_backend(etapa, nombre):
+    """Decorador que registra una implementación de ``etapa`` bajo ``nombre``."""
+    def decorador(clase):
+        _BACKENDS[(etapa, nombre)] = clase
+        return clase
+    return decorador
+
+
+def existe_backend(etapa, nombre):
+    return (etapa, nombre) in _BACKENDS
+
+
+def obtener_backend(etapa, nombre):
+    try:
+        return _BACKENDS[(etapa, nombre)]
+    except KeyError:
+        raise ErrorEtapa(f"Backend '{nombre}' no registrado para la etapa '{etapa}'")
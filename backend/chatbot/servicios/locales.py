@@ -0,0 +1,203 @@
+"""
+Backends locales (simulados) de cada etapa del pipeline.
+
+Se usan por defecto cuando no hay un ``ConfiguracionServicio`` activo para la
+etapa y sirven como backends falsos en pruebas. La opción ``latencia_ms`` de la
+configuración simula la latencia de un servicio real.
+"""
+import array
+import io
+import math
+import random
+import threading
+import time
+import wave
+
+from ..models import TipoServicio
+from . import prosodia
+from .alineacion import alinear, errores, puntuacion, tokenizar
+from .asr import ModeloSimulado
+from .base import Etapa, registrar_backend
+from .tts import EtapaTTS
+
+
+class EtapaLocal(Etapa):
+    """Etapa local con latencia simulada configurable."""
+
+    def _simular_latencia(self):
+        latencia_ms = self.configuracion.get('latencia_ms', 0)
+        if latencia_ms:
+            time.sleep(latencia_ms / 1000)
+
+
+@registrar_backend('asr', 'local')
+class ASRLocal(EtapaLocal):
+    """
+    ASR simulado: devuelve la transcripción configurada.
+    Para Vosk/Whisper, ver el backend ``modelo`` en ``servicios/asr.py``.
+    """
+    nombre = 'asr'
+    tipo = TipoServicio.ASR
+    depende_de = ('preprocesamiento',)
+    timeout_ms = 5000
+
+    def debe_ejecutarse(self, contexto):
+        return contexto.audio is not None and not contexto.texto_estudiante
+
+    def ejecutar(self, contexto):
+        self._simular_latencia()
+        return {'texto': self.configuracion.get('transcripcion', '')}
+
+    def reconocedor(self, frecuencia):
+        """Reconocedor incremental simulado (ver ``ModeloSimulado``)."""
+        return ModeloSimulado(self.configuracion).crear_reconocedor(frecuencia, threading.Lock())
+
+    def por_defecto(self, contexto):
+        return {'texto': ''}
+
+
+@registrar_backend('pronunciacion', 'local')
+class PronunciacionLocal(EtapaLocal):
+    """
+    Puntúa la pronunciación con la alineación entre el texto del estudiante y el esperado.
+    TODO: Integrar análisis fonético real con servicios ASR.
+    """
+    nombre = 'pronunciacion'
+    depende_de = ('asr',)
+
+    def ejecutar(self, contexto):
+        self._simular_latencia()
+        if not contexto.texto or not tokenizar(contexto.texto_esperado):
+            return self.por_defecto(contexto)
+        return {'puntuacion_pronunciacion': puntuacion(alinear(contexto.texto, contexto.texto_esperado))}
+
+    def por_defecto(self, contexto):
+        return {'puntuacion_pronunciacion': 50.0}
+
+
+@registrar_backend('gramatica', 'local')
+class GramaticaLocal(EtapaLocal):
+    """
+    Detecta palabras sustituidas, omitidas e insertadas a partir de la alineación.
+    TODO: Integrar análisis NLP real.
+    """
+    nombre = 'gramatica'
+    depende_de = ('asr',)
+
+    def ejecutar(self, contexto):
+        self._simular_latencia()
+        if not contexto.texto or not contexto.texto_esperado:
+            return self.por_defecto(contexto)
+        errores_detectados, sugerencias = errores(alinear(contexto.texto, contexto.texto_esperado))
+        return {'errores': errores_detectados, 'sugerencias': sugerencias}
+
+    def por_defecto(self, contexto):
+        return {'errores': [], 'sugerencias': []}
+
+
+@registrar_backend('prosodia', 'local')
+class ProsodiaLocal(EtapaLocal):
+    """
+    Métricas de fluidez, entonación y ritmo calculadas del audio preprocesado
+    (ver ``servicios/prosodia.py``). Sin audio con voz, o sin métricas
+    suficientes para una puntuación, se usa el valor neutro.
+    """
+    nombre = 'prosodia'
+    depende_de = ('asr',)
+
+    def ejecutar(self, contexto):
+        self._simular_latencia()
+        if contexto.muestras is None:
+            return self.por_defecto(contexto)
+        metricas = prosodia.analizar(contexto.muestras, contexto.frecuencia, len(tokenizar(contexto.texto)))
+        resultado = self.por_defecto(contexto)
+        resultado.update({
+            clave: valor for clave, valor in prosodia.puntuaciones(metricas).items() if valor is not None
+        })
+        resultado['metricas'] = metricas
+        return resultado
+
+    def por_defecto(self, contexto):
+        # Valor neutro: el umbral de aprobación, no penaliza ni premia
+        return {
+            'puntuacion_fluidez': 70.0,
+            'puntuacion_entonacion': 70.0,
+            'puntuacion_ritmo': 70.0,
+        }
+
+
+RESPUESTAS = {
+    'excelente': [
+        "¡Excelente pronunciación! 🌟 You did great!",
+        "¡Muy bien! Tu pronunciación es casi perfecta. Keep it up!",
+        "¡Fantástico! You're making amazing progress!"
+    ],
+    'bueno': [
+        "¡Buen trabajo! Hay algunos detalles que podemos mejorar.",
+        "Good effort! Let's practice a bit more.",
+        "¡Vas por buen camino! Practiquemos un poco más."
+    ],
+    'regular': [
+        "Let's try again. Focus on pronouncing each word clearly.",
+        "No te preocupes, ¡la práctica hace al maestro! Try again.",
+        "Good attempt! Let me help you with the pronunciation."
+    ],
+    'bajo': [
+        "Don't give up! Let's break it down and practice word by word.",
+        "It's okay to make mistakes. That's how we learn! Try again.",
+        "¡Vamos a intentarlo de nuevo! Escucha con atención y repite conmigo."
+    ],
+}
+
+
+@registrar_backend('respuesta', 'local')
+class RespuestaLocal(EtapaLocal):
+    """
+    Genera la respuesta del agente virtual desde un banco de frases.
+    TODO: Integrar generación de lenguaje natural.
+    """
+    nombre = 'respuesta'
+    depende_de = ('pronunciacion',)
+
+    def ejecutar(self, contexto):
+        self._simular_latencia()
+        puntuacion = contexto.resultado('pronunciacion', 'puntuacion_pronunciacion', 50.0)
+        if puntuacion >= 90:
+            respuestas = RESPUESTAS['excelente']
+        elif puntuacion >= 70:
+            respuestas = RESPUESTAS['bueno']
+        elif puntuacion >= 50:
+            respuestas = RESPUESTAS['regular']
+        else:
+            respuestas = RESPUESTAS['bajo']
+        return {'texto': random.choice(respuestas)}
+
+    def por_defecto(self, contexto):
+        return {'texto': RESPUESTAS['regular'][0]}
+
+
+@registrar_backend('tts', 'local')
+class TTSLocal(EtapaLocal, EtapaTTS):
+    """
+    TTS simulado. Devuelve el audio que ya esté en caché y, solo con
+    ``simular_audio`` activo, sintetiza un tono de prueba.
+    TODO: Integrar Coqui TTS para síntesis de voz.
+    """
+    frecuencia_muestreo = 16000
+
+    def sintetizar(self, texto, voz):
+        self._simular_latencia()
+        if not self.configuracion.get('simular_audio'):
+            return None
+        duracion = min(5.0, 0.06 * len(texto))
+        muestras = array.array('h', (
+            int(8000 * math.sin(2 * math.pi * 440 * n / self.frecuencia_muestreo))
+            for n in range(int(duracion * self.frecuencia_muestreo))
+        ))
+        buffer = io.BytesIO()
+        with wave.open(buffer, 'wb') as salida:
+            salida.setnchannels(1)
+            salida.setsampwidth(2)
+            salida.setframerate(self.frecuencia_muestreo)
+            salida.writeframes(muestras.tobytes())
+        return buffer.getvalue()
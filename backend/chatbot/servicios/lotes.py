@@ -0,0 +1,138 @@
+"""
+Planificador de micro-lotes para la inferencia de modelos.
+
+Los modelos vectorizados (Whisper en GPU o CPU) procesan un lote de N clips
+en bastante menos que N veces lo que tarda uno. ``PlanificadorLotes`` junta
+las peticiones concurrentes de varios hilos (los de los workers o los del
+servidor ASR) en lotes pequeños, ejecuta una sola llamada por lote y devuelve
+a cada petición su resultado.
+
+Sin carga no agrega latencia: la espera solo se aplica si hubo peticiones
+simultáneas en el último ``VENTANA_CARGA_S``; una petición aislada sale en
+cuanto llega. Con carga, el lote se cierra al llenarse o a los ``espera_ms``
+de la llegada de su primera petición; mientras un lote se ejecuta, las nuevas
+peticiones se acumulan para el siguiente.
+"""
+import logging
+import queue
+import threading
+import time
+from collections import Counter
+from concurrent.futures import Future
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+VENTANA_CARGA_S = 1.0
+
+
+class PlanificadorLotes:
+    """
+    Agrupa llamadas a ``funcion_lote(items) -> resultados`` (listas del mismo
+    largo, en el mismo orden). Un hilo propio arma y ejecuta los lotes.
+    """
+
+    def __init__(self, funcion_lote, nombre='', espera_ms=None, maximo=None):
+        self.funcion_lote = funcion_lote
+        self.nombre = nombre
+        self.espera = (settings.INFERENCIA_LOTE_ESPERA_MS if espera_ms is None else espera_ms) / 1000
+        self.maximo = max(1, settings.INFERENCIA_LOTE_MAX if maximo is None else maximo)
+        self._cola = queue.SimpleQueue()
+        self._lock = threading.Lock()
+        self._hilo = None
+        self._en_vuelo = 0
+        self._ultima_concurrencia = float('-inf')
+        self._tamaños = Counter()
+        self._espera_total = 0.0
+        self._espera_max = 0.0
+        self._inferencia_total = 0.0
+        self._errores = 0
+
+    def enviar(self, item):
+        """Encola ``item``, espera a que su lote termine y devuelve su resultado."""
+        futuro = Future()
+        with self._lock:
+            self._en_vuelo += 1
+            if self._en_vuelo > 1:
+                self._ultima_concurrencia = time.monotonic()
+            if self._hilo is None:
+                self._hilo = threading.Thread(
+                    target=self._atender, name=f'lotes-{self.nombre}', daemon=True
+                )
+                self._hilo.start()
+        self._cola.put((item, futuro, time.monotonic()))
+        try:
+            return futuro.result()
+        finally:
+            with self._lock:
+                self._en_vuelo -= 1
+
+    def _armar_lote(self):
+        primero = self._cola.get()
+        lote = [primero]
+        with self._lock:
+            con_carga = time.monotonic() - self._ultima_concurrencia < VENTANA_CARGA_S
+        limite = primero[2] + self.espera
+        while len(lote) < self.maximo:
+            try:
+                lote.append(self._cola.get_nowait())
+                continue
+            except queue.Empty:
+                pass
+            restante = limite - time.monotonic()
+            if not con_carga or restante <= 0:
+                break
+            try:
+                lote.append(self._cola.get(timeout=restante))
+            except queue.Empty:
+                break
+        return lote
+
+    def _atender(self):
+        while True:
+            lote = self._armar_lote()
+            inicio = time.monotonic()
+            items = [item for item, _, _ in lote]
+            try:
+                resultados = self.funcion_lote(items)
+                if len(resultados) != len(items):
+                    raise RuntimeError(f'El lote devolvió {len(resultados)} resultados para {len(items)} items')
+            except Exception as exc:
+                logger.exception('Error en el lote de inferencia %s', self.nombre)
+                resultados = None
+                error = exc
+            fin = time.monotonic()
+
+            with self._lock:
+                self._tamaños[len(lote)] += 1
+                self._inferencia_total += fin - inicio
+                for _, _, llegada in lote:
+                    self._espera_total += inicio - llegada
+                    self._espera_max = max(self._espera_max, inicio - llegada)
+                if resultados is None:
+                    self._errores += 1
+            for indice, (_, futuro, _) in enumerate(lote):
+                if resultados is None:
+                    futuro.set_exception(error)
+                else:
+                    futuro.set_result(resultados[indice])
+
+    def estadisticas(self):
+        """Contadores acumulados desde que arrancó el proceso."""
+        with self._lock:
+            lotes = sum(self._tamaños.values())
+            peticiones = sum(tamaño * cantidad for tamaño, cantidad in self._tamaños.items())
+            return {
+                'espera_ms': round(self.espera * 1000),
+                'maximo': self.maximo,
+                'peticiones': peticiones,
+                'lotes': lotes,
+                'tamaño_medio': round(peticiones / lotes, 2) if lotes else 0,
+                'tamaños': dict(sorted(self._tamaños.items())),
+                'espera_media_ms': round(1000 * self._espera_total / peticiones, 2) if peticiones else 0,
+                'espera_max_ms': round(1000 * self._espera_max, 2),
+                'inferencia_media_ms': round(1000 * self._inferencia_total / lotes, 2) if lotes else 0,
+                'errores': self._errores,
+                'en_vuelo': self._en_vuelo,
+            }
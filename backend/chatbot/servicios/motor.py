@@ -0,0 +1,198 @@
+"""
+Motor del pipeline de interacción (preprocesamiento -> ASR -> NLP -> TTS).
+
+Las etapas se agrupan por dependencias: las que no dependen entre sí
+(pronunciación, gramática, prosodia) se ejecutan en paralelo en un pool de
+hilos compartido, de modo que la latencia de cada grupo es la de su etapa más
+lenta y no la suma de todas. Cada etapa tiene su propio timeout, contado desde
+que un hilo la toma; si lo excede o falla se usa su resultado por defecto, se
+anota en ``contexto.errores`` y la interacción continúa. Cada etapa trabaja
+sobre su copia del contexto, así que una que excedió su timeout no modifica el
+de la interacción aunque su hilo siga corriendo.
+"""
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FuturesTimeoutError
+
+from django.conf import settings
+
+from .. import catalogo
+from ..models import ConfiguracionServicio
+from . import asr, locales, preprocesamiento  # noqa: F401  (registran los backends)
+from .base import ErrorEtapa, existe_backend, obtener_backend
+
+logger = logging.getLogger(__name__)
+
+# Orden de declaración de las etapas del pipeline
+ETAPAS = ('preprocesamiento', 'asr', 'pronunciacion', 'gramatica', 'prosodia', 'respuesta', 'tts')
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def obtener_pool():
+    """Pool de hilos compartido por todas las interacciones del proceso."""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ThreadPoolExecutor(
+                    max_workers=settings.PIPELINE_MAX_WORKERS,
+                    thread_name_prefix='avi-pipeline'
+                )
+    return _pool
+
+
+def cargar_configuraciones():
+    """
+    Lee los ``ConfiguracionServicio`` activos y devuelve ``{etapa: configuracion}``.
+
+    La clave ``etapas`` del JSON indica a qué etapas aplica la configuración;
+    si se omite, aplica a las etapas del mismo tipo de servicio que tengan
+    registrado el ``backend`` indicado. Un backend que la etapa no tiene
+    registrado (guardado sin pasar por ``clean``) se reemplaza por ``local``
+    con una advertencia, en vez de hacer fallar cada interacción.
+    """
+    configuraciones = {}
+    servicios = ConfiguracionServicio.objects.filter(is_active=True).order_by('updated_at')
+    for servicio in servicios:
+        configuracion = servicio.configuracion or {}
+        backend = configuracion.get('backend', 'local')
+        etapas = configuracion.get('etapas') or [
+            etapa for etapa in ETAPAS
+            if obtener_backend(etapa, 'local').tipo == servicio.tipo and existe_backend(etapa, backend)
+        ]
+        for etapa in etapas:
+            if etapa not in ETAPAS:
+                logger.warning("Configuración '%s': etapa '%s' desconocida", servicio.nombre_servicio, etapa)
+            elif existe_backend(etapa, backend):
+                configuraciones[etapa] = configuracion
+            else:
+                logger.warning(
+                    "Configuración '%s': backend '%s' no registrado para la etapa '%s', se usa 'local'",
+                    servicio.nombre_servicio, backend, etapa
+                )
+                configuraciones[etapa] = {**configuracion, 'backend': 'local'}
+    return configuraciones
+
+
+class MotorPipeline:
+    """Ejecuta un conjunto de etapas respetando sus dependencias."""
+
+    def __init__(self, etapas):
+        self.etapas = list(etapas)
+
+    @classmethod
+    def desde_configuracion(cls, configuraciones=None):
+        """
+        Construye el pipeline con el backend configurado para cada etapa. Sin
+        ``configuraciones``, usa las del catálogo en memoria (sin consultas).
+        """
+        if configuraciones is None:
+            configuraciones = catalogo.configuraciones_servicio()
+        etapas = []
+        for nombre in ETAPAS:
+            configuracion = configuraciones.get(nombre, {})
+            clase = obtener_backend(nombre, configuracion.get('backend', 'local'))
+            etapas.append(clase(configuracion))
+        return cls(etapas)
+
+    def etapa(self, nombre):
+        """Devuelve la etapa ``nombre`` del pipeline."""
+        for etapa in self.etapas:
+            if etapa.nombre == nombre:
+                return etapa
+        raise ErrorEtapa(f"El pipeline no tiene la etapa '{nombre}'")
+
+    def ejecutar(self, contexto, al_completar=None):
+        """
+        Ejecuta todas las etapas y devuelve el contexto con sus resultados.
+        ``al_completar(nombre_etapa, contexto)`` se llama en cuanto cada etapa
+        tiene resultado (incluidas las omitidas o con valor por defecto).
+        """
+        nombres = {etapa.nombre for etapa in self.etapas}
+        pendientes = list(self.etapas)
+        completadas = set()
+
+        while pendientes:
+            grupo = [
+                etapa for etapa in pendientes
+                if all(d in completadas or d not in nombres for d in etapa.depende_de)
+            ]
+            if not grupo:
+                raise ErrorEtapa('Dependencias circulares entre etapas del pipeline')
+
+            self._ejecutar_grupo(grupo, contexto, al_completar)
+            if contexto.cancelacion:
+                break
+            completadas.update(etapa.nombre for etapa in grupo)
+            pendientes = [etapa for etapa in pendientes if etapa.nombre not in completadas]
+
+        return contexto
+
+    def _ejecutar_grupo(self, grupo, contexto, al_completar=None):
+        """Lanza en paralelo las etapas independientes y espera cada una con su timeout."""
+        pool = obtener_pool()
+        base = dict(vars(contexto))
+        ejecuciones = []
+        for etapa in grupo:
+            if not etapa.debe_ejecutarse(contexto):
+                contexto.resultados[etapa.nombre] = etapa.por_defecto(contexto)
+                if al_completar:
+                    al_completar(etapa.nombre, contexto)
+                continue
+            ejecucion = _Ejecucion(etapa, contexto.para_etapa())
+            ejecuciones.append((ejecucion, pool.submit(ejecucion)))
+
+        for ejecucion, futuro in ejecuciones:
+            etapa = ejecucion.etapa
+            try:
+                resultado = futuro.result(timeout=ejecucion.restante())
+            except FuturesTimeoutError:
+                futuro.cancel()
+                if ejecucion.inicio is None:
+                    logger.warning('Etapa %s sin hilo libre en %s ms', etapa.nombre, settings.PIPELINE_ESPERA_COLA_MS)
+                else:
+                    logger.warning('Etapa %s excedió su timeout de %s ms', etapa.nombre, etapa.timeout_ms)
+                contexto.errores[etapa.nombre] = 'timeout'
+                resultado = etapa.por_defecto(contexto)
+            except Exception as exc:
+                logger.exception('Error en la etapa %s', etapa.nombre)
+                contexto.errores[etapa.nombre] = str(exc)
+                resultado = etapa.por_defecto(contexto)
+            else:
+                contexto.incorporar(ejecucion.contexto, base)
+            contexto.resultados[etapa.nombre] = resultado
+            contexto.tiempos_ms[etapa.nombre] = ejecucion.duracion_ms()
+            if al_completar:
+                al_completar(etapa.nombre, contexto)
+
+
+class _Ejecucion:
+    """Una etapa sobre su copia del contexto; anota cuándo la toma un hilo del pool."""
+
+    def __init__(self, etapa, contexto):
+        self.etapa = etapa
+        self.contexto = contexto
+        self.encolada = time.monotonic()
+        self.inicio = None
+        self.iniciada = threading.Event()
+
+    def __call__(self):
+        self.inicio = time.monotonic()
+        self.iniciada.set()
+        return self.etapa.ejecutar(self.contexto)
+
+    def restante(self):
+        """
+        Segundos que quedan para el resultado. Espera primero a que la etapa
+        arranque (hasta ``PIPELINE_ESPERA_COLA_MS``): su timeout corre desde ahí.
+        """
+        espera = settings.PIPELINE_ESPERA_COLA_MS / 1000 - (time.monotonic() - self.encolada)
+        if not self.iniciada.wait(max(espera, 0)):
+            return 0
+        return max(self.etapa.timeout_ms / 1000 - (time.monotonic() - self.inicio), 0)
+
+    def duracion_ms(self):
+        return int((time.monotonic() - (self.inicio or self.encolada)) * 1000)
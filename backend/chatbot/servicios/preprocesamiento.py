@@ -0,0 +1,154 @@
+"""
+Preprocesamiento del audio antes del ASR (NumPy).
+
+Las grabaciones de los estudiantes traen silencio largo al principio y al
+final, y el ASR cobra ese silencio como tiempo de inferencia. Esta etapa
+decodifica el audio (WAV o PCM16 crudo), lo remuestrea a la frecuencia del modelo, detecta la voz
+por energía de tramas y recorta el silencio de los extremos. Si no hay voz,
+cancela el pipeline antes de llamar a ningún modelo.
+"""
+import io
+import wave
+
+import numpy as np
+
+from ..models import TipoServicio
+from .asr import TIPOS_PCM, es_wav, pcm_a_wav
+from .base import Etapa, registrar_backend
+
+_FORMATOS_PCM = {1: np.uint8, 2: np.dtype('<i2'), 4: np.dtype('<i4')}
+
+
+def decodificar(datos, tipo=None):
+    """
+    Devuelve ``(muestras float32 mono en [-1, 1], frecuencia)`` de un WAV PCM,
+    o de PCM16 a 16 kHz si ``tipo`` es uno de ``TIPOS_PCM``. ``None`` si el
+    audio está en otro formato (webm, mp3, ogg...): el ASR recibe el original.
+    """
+    if not es_wav(datos):
+        if (tipo or '').lower() not in TIPOS_PCM:
+            return None
+        return np.frombuffer(datos[:len(datos) - len(datos) % 2], dtype='<i2').astype(np.float32) / 32768, 16000
+    try:
+        with wave.open(io.BytesIO(datos), 'rb') as entrada:
+            canales = entrada.getnchannels()
+            ancho = entrada.getsampwidth()
+            frecuencia = entrada.getframerate()
+            crudo = entrada.readframes(entrada.getnframes())
+    except (wave.Error, EOFError):
+        # WAV comprimido o en coma flotante: lo decodifica el ASR
+        return None
+    if ancho not in _FORMATOS_PCM:
+        return None
+    muestras = np.frombuffer(crudo[:len(crudo) - len(crudo) % (ancho * canales)], dtype=_FORMATOS_PCM[ancho])
+    muestras = muestras.astype(np.float32)
+    if ancho == 1:
+        muestras = (muestras - 128) / 128
+    else:
+        muestras /= float(2 ** (8 * ancho - 1))
+    if canales > 1:
+        muestras = muestras.reshape(-1, canales).mean(axis=1)
+    return muestras, frecuencia
+
+
+def remuestrear(muestras, origen, destino):
+    """Remuestreo lineal; al bajar la frecuencia aplica antes una media móvil como paso bajo."""
+    if origen == destino or not len(muestras):
+        return muestras
+    factor = int(round(origen / destino))
+    if factor > 1:
+        muestras = np.convolve(muestras, np.full(factor, 1 / factor, dtype=np.float32), mode='same')
+    total = int(round(len(muestras) * destino / origen))
+    posiciones = np.arange(total, dtype=np.float64) * (origen / destino)
+    return np.interp(posiciones, np.arange(len(muestras)), muestras).astype(np.float32)
+
+
+def energia_tramas(muestras, frecuencia, trama_ms=30):
+    """Energía en dBFS de tramas consecutivas de ``trama_ms``."""
+    ancho = frecuencia * trama_ms // 1000
+    cantidad = len(muestras) // ancho
+    tramas = muestras[:cantidad * ancho].reshape(cantidad, ancho)
+    return 10 * np.log10(np.einsum('ij,ij->i', tramas, tramas) / ancho + 1e-10)
+
+
+def detectar_voz(muestras, frecuencia, trama_ms=30, margen_db=12.0, minimo_db=-45.0,
+                 voz_minima_ms=120, relleno_ms=150):
+    """
+    Devuelve ``(inicio, fin)`` en muestras del tramo con voz, o ``None``.
+
+    Una trama es voz si supera en ``margen_db`` al ruido de fondo (percentil 10
+    de la energía) y el mínimo absoluto ``minimo_db``. Si el clip casi no tiene
+    rango dinámico (todo voz o todo ruido) solo cuenta el mínimo absoluto.
+    """
+    energia = energia_tramas(muestras, frecuencia, trama_ms)
+    if not len(energia):
+        return None
+    ruido = np.percentile(energia, 10)
+    if energia.max() - ruido < margen_db:
+        voz = energia > minimo_db
+    else:
+        voz = energia > max(ruido + margen_db, minimo_db)
+    if voz.sum() * trama_ms < voz_minima_ms:
+        return None
+    indices = np.flatnonzero(voz)
+    ancho = frecuencia * trama_ms // 1000
+    relleno = frecuencia * relleno_ms // 1000
+    inicio = max(0, indices[0] * ancho - relleno)
+    fin = min(len(muestras), (indices[-1] + 1) * ancho + relleno)
+    return int(inicio), int(fin)
+
+
+def a_pcm16(muestras):
+    return (np.clip(muestras, -1, 1) * 32767).astype('<i2').tobytes()
+
+
+@registrar_backend('preprocesamiento', 'local')
+class PreprocesamientoAudio(Etapa):
+    """
+    Decodifica, remuestrea a ``frecuencia`` (16 kHz por defecto), detecta la
+    voz y recorta el silencio. El audio que no es WAV ni PCM16 declarado
+    (``TIPOS_PCM``) pasa sin tocar al ASR. Las opciones de ``detectar_voz`` se pueden
+    ajustar en la configuración (``margen_db``, ``minimo_db``...).
+    """
+    nombre = 'preprocesamiento'
+    tipo = TipoServicio.ASR
+    timeout_ms = 2000
+    opciones_vad = ('trama_ms', 'margen_db', 'minimo_db', 'voz_minima_ms', 'relleno_ms')
+
+    def debe_ejecutarse(self, contexto):
+        return contexto.audio is not None
+
+    def ejecutar(self, contexto):
+        contexto.audio.seek(0)
+        datos = contexto.audio.read()
+        contexto.audio.seek(0)
+
+        decodificado = decodificar(datos, getattr(contexto.audio, 'content_type', None))
+        if decodificado is None:
+            # Sin audio_procesado ni muestras: el ASR recibe el original
+            return {'voz': None, 'decodificado': False}
+        muestras, origen = decodificado
+        frecuencia = int(self.configuracion.get('frecuencia', 16000))
+        muestras = remuestrear(muestras, origen, frecuencia)
+        duracion_ms = int(len(muestras) * 1000 / frecuencia)
+
+        opciones = {clave: self.configuracion[clave] for clave in self.opciones_vad if clave in self.configuracion}
+        tramo = detectar_voz(muestras, frecuencia, **opciones)
+        if tramo is None:
+            if not contexto.texto_estudiante:
+                contexto.cancelar('No se detectó voz en el audio.')
+            return {'voz': False, 'decodificado': True, 'duracion_ms': duracion_ms, 'voz_ms': 0}
+
+        inicio, fin = tramo
+        contexto.muestras = muestras[inicio:fin]
+        contexto.frecuencia = frecuencia
+        contexto.audio_procesado = pcm_a_wav(a_pcm16(contexto.muestras), frecuencia)
+        return {
+            'voz': True,
+            'decodificado': True,
+            'duracion_ms': duracion_ms,
+            'voz_ms': int((fin - inicio) * 1000 / frecuencia),
+        }
+
+    def por_defecto(self, contexto):
+        return {}
@@ -0,0 +1,253 @@
+"""
+Métricas de prosodia calculadas del audio (NumPy).
+
+Se trabaja sobre tramas de 40 ms cada 10 ms del audio ya recortado por el
+preprocesamiento, todas a la vez como una vista de ventanas deslizantes:
+- energía por trama: separa voz y pausas, y su envolvente da los núcleos
+  silábicos (máximos locales con un valle previo de al menos ``CAIDA_DB``);
+- velocidad de habla: palabras por minuto (si hay texto) y sílabas por
+  segundo de fonación;
+- pausas: silencios internos de ``PAUSA_MINIMA_MS`` o más;
+- contorno de F0 por autocorrelación (con FFT) de las tramas con voz;
+- ritmo: variabilidad entre duraciones silábicas consecutivas (nPVI).
+
+``puntuaciones`` convierte las métricas en las puntuaciones 0-100 de
+``Retroalimentacion`` comparándolas con rangos de referencia para inglés.
+"""
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+VENTANA_MS = 40
+PASO_MS = 10
+F0_MINIMA = 75
+F0_MAXIMA = 400
+FRECUENCIA_F0 = 8000
+CLARIDAD_MINIMA = 0.5
+TOLERANCIA_OCTAVA = 0.9
+PAUSA_MINIMA_MS = 250
+PAUSA_LARGA_MS = 1000
+CAIDA_DB = 3.0
+MARGEN_DB = 12.0
+RANGO_VOZ_DB = 30.0
+MINIMO_DB = -45.0
+
+# (mínimo, máximo, tolerancia): 100 puntos dentro del rango y 0 a ``tolerancia`` de él
+REFERENCIAS = {
+    'palabras_por_minuto': (100, 170, 70),
+    'tasa_articulacion': (3.0, 5.5, 2.5),
+    'proporcion_pausas': (0.0, 0.2, 0.4),
+    'rango_semitonos': (4.0, 12.0, 4.0),
+    'npvi': (35.0, 70.0, 30.0),
+}
+
+
+def tramas(muestras, frecuencia, ventana_ms=VENTANA_MS, paso_ms=PASO_MS):
+    """Matriz (tramas x muestras) de ventanas solapadas; es una vista, no copia el audio."""
+    ventana = frecuencia * ventana_ms // 1000
+    if len(muestras) < ventana:
+        return np.empty((0, ventana), dtype=np.float32)
+    return sliding_window_view(muestras, ventana)[::frecuencia * paso_ms // 1000]
+
+
+def energia_db(bloque):
+    """Energía en dBFS de cada trama."""
+    return 10 * np.log10(np.einsum('ij,ij->i', bloque, bloque) / bloque.shape[1] + 1e-10)
+
+
+def mascara_voz(energia):
+    """
+    Tramas con voz. El umbral es el ruido de fondo (percentil 10) más
+    ``MARGEN_DB``, sin pasar de ``RANGO_VOZ_DB`` por debajo del pico: en un
+    clip ya recortado y sin pausas el percentil 10 cae dentro de la voz.
+    """
+    ruido, pico = np.percentile(energia, [10, 95])
+    return energia > max(min(ruido + MARGEN_DB, pico - RANGO_VOZ_DB), MINIMO_DB)
+
+
+def rachas(mascara):
+    """``(inicios, finales)`` de las rachas de ``True`` (finales exclusivos)."""
+    bordes = np.diff(np.concatenate(([0], mascara.astype(np.int8), [0])))
+    return np.flatnonzero(bordes == 1), np.flatnonzero(bordes == -1)
+
+
+def contorno_f0(muestras, frecuencia, voz):
+    """
+    F0 en Hz de cada trama (``NaN`` si no es sonora). Se calcula a
+    ``FRECUENCIA_F0``, suficiente para el rango de la voz; la autocorrelación
+    de todas las tramas con voz sale de una sola FFT y se normaliza por la de
+    la ventana de Hann para no favorecer los retardos cortos.
+    """
+    factor = max(1, frecuencia // FRECUENCIA_F0)
+    if factor > 1:
+        muestras = np.convolve(muestras, np.full(factor, 1 / factor, dtype=np.float32), mode='same')[::factor]
+        frecuencia //= factor
+    bloque = tramas(muestras, frecuencia)[:len(voz)]
+    voz = voz[:len(bloque)]
+    f0 = np.full(len(voz), np.nan)
+    seleccion = bloque[voz]
+    ancho = bloque.shape[1]
+    retardo_min = int(frecuencia / F0_MAXIMA)
+    retardo_max = min(ancho - 2, int(frecuencia / F0_MINIMA))
+    if not len(seleccion) or retardo_max <= retardo_min:
+        return f0
+
+    hann = np.hanning(ancho).astype(np.float32)
+    senal = (seleccion - seleccion.mean(axis=1, keepdims=True)) * hann
+    espectro = np.fft.rfft(senal, n=2 * ancho)
+    autocorrelacion = np.fft.irfft(espectro.real ** 2 + espectro.imag ** 2)[:, :retardo_max + 2]
+    ventana = np.fft.irfft(np.abs(np.fft.rfft(hann, n=2 * ancho)) ** 2)[:retardo_max + 2]
+    normalizada = autocorrelacion / (autocorrelacion[:, :1] + 1e-12) / (ventana / ventana[0])
+
+    # Los múltiplos del periodo puntúan casi igual que el periodo: se toma el
+    # primer máximo local que llega a ``TOLERANCIA_OCTAVA`` del mejor
+    rango = normalizada[:, retardo_min - 1:retardo_max + 2]
+    centro = rango[:, 1:-1]
+    maximos = (centro >= rango[:, :-2]) & (centro >= rango[:, 2:])
+    candidatos = maximos & (centro >= TOLERANCIA_OCTAVA * np.where(maximos, centro, -1).max(axis=1, keepdims=True))
+    indice = candidatos.argmax(axis=1)
+    filas = np.arange(len(centro))
+    claridad = centro[filas, indice]
+    # Interpolación parabólica alrededor del máximo
+    retardo = indice + retardo_min
+    izquierda = normalizada[filas, retardo - 1]
+    derecha = normalizada[filas, retardo + 1]
+    pico = candidatos[filas, indice] & (claridad >= CLARIDAD_MINIMA)
+    curvatura = np.where(pico, izquierda - 2 * claridad + derecha, -1)
+    ajuste = np.clip(0.5 * (izquierda - derecha) / np.minimum(curvatura, -1e-12), -0.5, 0.5)
+    f0[voz] = np.where(pico, frecuencia / (retardo + ajuste), np.nan)
+    return f0
+
+
+def nucleos_silabicos(energia, voz):
+    """
+    Índices de trama de los núcleos silábicos dentro de las tramas con voz y
+    de los valles entre núcleos consecutivos, sobre la energía suavizada.
+    """
+    suavizada = np.convolve(energia, np.full(5, 0.2), mode='same')
+    maximos = np.flatnonzero(
+        (suavizada[1:-1] > suavizada[:-2]) & (suavizada[1:-1] >= suavizada[2:]) & voz[1:-1]
+    ) + 1
+    nucleos = []
+    valles = []
+    for indice in maximos:
+        if nucleos:
+            valle = nucleos[-1] + int(suavizada[nucleos[-1]:indice + 1].argmin())
+            if suavizada[valle] > min(suavizada[nucleos[-1]], suavizada[indice]) - CAIDA_DB:
+                # Sin valle suficiente entre ambos: es la misma sílaba, se queda el mayor
+                if suavizada[indice] > suavizada[nucleos[-1]]:
+                    nucleos[-1] = indice
+                continue
+            valles.append(valle)
+        nucleos.append(indice)
+    return np.array(nucleos, dtype=int), np.array(valles, dtype=int)
+
+
+def npvi(duraciones):
+    """
+    Índice normalizado de variabilidad por pares (0 = isócrono) de las
+    duraciones consecutivas de cada tramo; no se comparan sílabas separadas
+    por una pausa.
+    """
+    pares = np.concatenate([
+        np.abs(np.diff(tramo)) / ((tramo[:-1] + tramo[1:]) / 2) for tramo in duraciones if len(tramo) > 1
+    ] or [np.empty(0)])
+    if not len(pares):
+        return None
+    return float(100 * pares.mean())
+
+
+def analizar(muestras, frecuencia, palabras=0):
+    """
+    Métricas acústicas de ``muestras`` (float32 mono). ``palabras`` es el
+    número de palabras dichas, si se conoce. Las métricas que no se pueden
+    calcular (muy poca voz o tono) quedan en ``None``.
+    """
+    bloque = tramas(muestras, frecuencia)
+    duracion_s = len(muestras) / frecuencia
+    if len(bloque) < 3:
+        return {'duracion_s': round(duracion_s, 3)}
+    paso_s = PASO_MS / 1000
+    energia = energia_db(bloque)
+    voz = mascara_voz(energia)
+
+    # Pausas: silencios entre el primer y el último tramo de voz
+    inicios, finales = rachas(voz)
+    silencios_ms = (inicios[1:] - finales[:-1]) * PASO_MS
+    largas = silencios_ms >= PAUSA_MINIMA_MS
+    pausas_ms = silencios_ms[largas]
+    habla_s = float(finales[-1] - inicios[0]) * paso_s if len(inicios) else 0.0
+    fonacion_s = habla_s - float(pausas_ms.sum()) / 1000
+
+    # Duración de cada sílaba: de valle a valle, o hasta el borde del tramo de
+    # habla sin pausas en el que está
+    nucleos, valles = nucleos_silabicos(energia, voz)
+    bordes_inicio = np.concatenate((inicios[:1], inicios[1:][largas]))
+    bordes_fin = np.concatenate((finales[:-1][largas], finales[-1:]))
+    tramo = np.searchsorted(bordes_fin, nucleos, side='right')
+    duraciones = []
+    for numero in np.unique(tramo):
+        en_tramo = np.flatnonzero(tramo == numero)
+        limites = np.concatenate((
+            bordes_inicio[numero:numero + 1], valles[en_tramo[:-1]], bordes_fin[numero:numero + 1]
+        ))
+        duraciones.append(np.diff(limites) * paso_s)
+
+    f0 = contorno_f0(muestras, frecuencia, voz)
+    f0 = f0[~np.isnan(f0)]
+    rango_semitonos = f0_mediana = None
+    if len(f0) >= 10:
+        semitonos = 12 * np.log2(f0 / np.median(f0))
+        p10, p90 = np.percentile(semitonos, [10, 90])
+        rango_semitonos = round(float(p90 - p10), 2)
+        f0_mediana = round(float(np.median(f0)), 1)
+
+    variabilidad = npvi(duraciones)
+    return {
+        'duracion_s': round(duracion_s, 3),
+        'fonacion_s': round(fonacion_s, 3),
+        'silabas': int(len(nucleos)),
+        'tasa_articulacion': round(len(nucleos) / fonacion_s, 2) if fonacion_s > 0 else None,
+        'palabras_por_minuto': round(60 * palabras / habla_s, 1) if palabras and habla_s > 0 else None,
+        'pausas': int(len(pausas_ms)),
+        'pausas_largas': int((pausas_ms >= PAUSA_LARGA_MS).sum()),
+        'pausa_media_ms': round(float(pausas_ms.mean()), 1) if len(pausas_ms) else 0.0,
+        'proporcion_pausas': round(float(pausas_ms.sum() / 1000 / habla_s), 3) if habla_s > 0 else None,
+        'f0_mediana': f0_mediana,
+        'rango_semitonos': rango_semitonos,
+        'npvi': round(variabilidad, 1) if variabilidad is not None else None,
+    }
+
+
+def _en_rango(valor, metrica):
+    minimo, maximo, tolerancia = REFERENCIAS[metrica]
+    distancia = max(minimo - valor, valor - maximo, 0)
+    return max(0.0, 100.0 * (1 - distancia / tolerancia))
+
+
+def puntuaciones(metricas):
+    """
+    Puntuaciones de fluidez, entonación y ritmo a partir de ``analizar``;
+    ``None`` en las que no tienen métricas suficientes.
+    """
+    fluidez = entonacion = ritmo = None
+    if metricas.get('proporcion_pausas') is not None:
+        if metricas.get('palabras_por_minuto') is not None:
+            velocidad = _en_rango(metricas['palabras_por_minuto'], 'palabras_por_minuto')
+        elif metricas.get('tasa_articulacion') is not None:
+            velocidad = _en_rango(metricas['tasa_articulacion'], 'tasa_articulacion')
+        else:
+            velocidad = 0.0
+        fluidez = (
+            0.5 * velocidad
+            + 0.3 * _en_rango(metricas['proporcion_pausas'], 'proporcion_pausas')
+            + 0.2 * max(0.0, 100.0 - 25 * metricas['pausas_largas'])
+        )
+    if metricas.get('rango_semitonos') is not None:
+        entonacion = _en_rango(metricas['rango_semitonos'], 'rango_semitonos')
+    if metricas.get('npvi') is not None:
+        ritmo = _en_rango(metricas['npvi'], 'npvi')
+    return {
+        'puntuacion_fluidez': round(fluidez, 1) if fluidez is not None else None,
+        'puntuacion_entonacion': round(entonacion, 1) if entonacion is not None else None,
+        'puntuacion_ritmo': round(ritmo, 1) if ritmo is not None else None,
+    }
@@ -0,0 +1,159 @@
+"""
+Síntesis de voz (TTS) con caché direccionada por contenido.
+
+Las respuestas del agente se repiten mucho (banco de frases), así que el audio
+se guarda bajo ``MEDIA_ROOT`` con una clave derivada de (texto, voz, versión
+del motor). Delante del disco hay un LRU en memoria limitado por bytes.
+Un acierto devuelve la URL del audio sin volver a sintetizar.
+"""
+import hashlib
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.files.storage import FileSystemStorage
+
+from ..models import TipoServicio
+from .base import Etapa
+
+
+class CacheTTS:
+    """Caché de audio TTS: LRU en memoria (por bytes) sobre archivos en disco."""
+
+    extension = 'wav'
+
+    def __init__(self, directorio, max_bytes_memoria):
+        self.directorio = os.fspath(directorio)
+        self.max_bytes_memoria = max_bytes_memoria
+        self.storage = FileSystemStorage()
+        self._memoria = OrderedDict()
+        self._bytes_memoria = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def clave(texto, voz, version):
+        contenido = '\0'.join([version, voz, texto]).encode('utf-8')
+        return hashlib.sha256(contenido).hexdigest()
+
+    def _nombre(self, clave):
+        """Ruta relativa a MEDIA_ROOT, repartida en subdirectorios por prefijo."""
+        relativo = os.path.relpath(self.directorio, self.storage.location)
+        return os.path.join(relativo, clave[:2], f'{clave}.{self.extension}').replace(os.sep, '/')
+
+    def _ruta(self, clave):
+        return os.path.join(self.directorio, clave[:2], f'{clave}.{self.extension}')
+
+    def url(self, clave):
+        return self.storage.url(self._nombre(clave))
+
+    def contiene(self, clave):
+        with self._lock:
+            if clave in self._memoria:
+                self._memoria.move_to_end(clave)
+                return True
+        return os.path.exists(self._ruta(clave))
+
+    def obtener(self, clave):
+        """Devuelve los bytes del audio o ``None`` si no está en caché."""
+        with self._lock:
+            audio = self._memoria.get(clave)
+            if audio is not None:
+                self._memoria.move_to_end(clave)
+                return audio
+        try:
+            with open(self._ruta(clave), 'rb') as archivo:
+                audio = archivo.read()
+        except FileNotFoundError:
+            return None
+        self._recordar(clave, audio)
+        return audio
+
+    def guardar(self, clave, audio):
+        """Escribe el audio de forma atómica y devuelve su URL."""
+        ruta = self._ruta(clave)
+        os.makedirs(os.path.dirname(ruta), exist_ok=True)
+        descriptor, temporal = tempfile.mkstemp(dir=os.path.dirname(ruta), suffix='.tmp')
+        try:
+            with os.fdopen(descriptor, 'wb') as archivo:
+                archivo.write(audio)
+            os.replace(temporal, ruta)
+        except BaseException:
+            os.unlink(temporal)
+            raise
+        self._recordar(clave, audio)
+        return self.url(clave)
+
+    def _recordar(self, clave, audio):
+        if len(audio) > self.max_bytes_memoria:
+            return
+        with self._lock:
+            anterior = self._memoria.pop(clave, None)
+            if anterior is not None:
+                self._bytes_memoria -= len(anterior)
+            self._memoria[clave] = audio
+            self._bytes_memoria += len(audio)
+            while self._bytes_memoria > self.max_bytes_memoria:
+                _, expulsado = self._memoria.popitem(last=False)
+                self._bytes_memoria -= len(expulsado)
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def obtener_cache_tts():
+    """Caché TTS compartida por el proceso."""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = CacheTTS(settings.TTS_CACHE_DIR, settings.TTS_CACHE_MEMORIA_BYTES)
+    return _cache
+
+
+class EtapaTTS(Etapa):
+    """
+    Etapa base de TTS: consulta la caché y solo sintetiza en un fallo.
+    Las implementaciones definen ``sintetizar`` y ``version_motor``.
+    """
+    nombre = 'tts'
+    tipo = TipoServicio.TTS
+    depende_de = ('respuesta',)
+    timeout_ms = 5000
+    version_motor = '1'
+    voz_por_defecto = 'es-ES'
+
+    @property
+    def version(self):
+        return f"{type(self).__name__}:{self.configuracion.get('version', self.version_motor)}"
+
+    def voz(self, contexto):
+        if contexto.agente is not None:
+            return contexto.agente.voz_configurada
+        return self.voz_por_defecto
+
+    def sintetizar(self, texto, voz):
+        """Devuelve los bytes WAV del texto, o ``None`` si el motor no genera audio."""
+        raise NotImplementedError
+
+    def renderizar(self, texto, voz):
+        """Devuelve la URL del audio de ``texto``, sintetizándolo solo si no está en caché."""
+        cache = obtener_cache_tts()
+        clave = cache.clave(texto, voz, self.version)
+        if cache.contiene(clave):
+            return cache.url(clave)
+        audio = self.sintetizar(texto, voz)
+        if audio is None:
+            return None
+        return cache.guardar(clave, audio)
+
+    def ejecutar(self, contexto):
+        texto = contexto.resultado('respuesta', 'texto')
+        if not texto:
+            return {'audio_url': None}
+        return {'audio_url': self.renderizar(texto, self.voz(contexto))}
+
+    def por_defecto(self, contexto):
+        return {'audio_url': None}
@@ -1,3 +1,1228 @@
-from django.test import TestCase
+"""
+Tests de la app Chatbot.
+"""
+import base64
+import io
+import json
+import random
+import os
+import re
+import shutil
+import socket
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
 
-# Create your tests here.
+import numpy as np
+from asgiref.sync import async_to_sync
+from asgiref.testing import ApplicationCommunicator
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection, connections
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.request import Request
+from rest_framework.test import APIClient, APIRequestFactory, APITestCase, APITransactionTestCase
+
+from users.autenticacion import TokenRefresco
+from users.models import (
+    Usuario, Estudiante, Docente, AsignacionDocenteEstudiante, TipoUsuario
+)
+from . import catalogo
+from .audio import AudioDemasiadoGrande, recibir_audio_crudo
+from .interacciones import evaluar_interaccion
+from .models import (
+    AgenteVirtual, ConfiguracionServicio, SesionPractica, Retroalimentacion, TurnoConversacion,
+    EstadisticasEstudiante, EstadoSesion, TipoServicio, TipoTurno
+)
+from .serializers import SesionPracticaSerializer
+from .servicios.asr import (
+    ModeloSimulado, _ManejadorASR, _enviar_json, _recibir_json, leer_pcm, obtener_planificador, pcm_a_wav,
+    transcribir_en_proceso
+)
+from .servicios import alineacion, motor, prosodia, tts
+from .servicios.base import ErrorEtapa, Etapa
+from .servicios.base import ContextoInteraccion
+from .servicios.locales import ASRLocal, GramaticaLocal, TTSLocal
+from .servicios.preprocesamiento import PreprocesamientoAudio, a_pcm16
+from .websocket import CIERRE_DATOS_INVALIDOS, RUTA, interaccion_websocket
+
+
+# Hasher rápido: los tests crean muchos usuarios
+HASHER_RAPIDO = override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+
+
+def crear_estudiante(indice):
+    usuario = Usuario.objects.create_user(
+        email=f'estudiante{indice}@avi.test',
+        username=f'estudiante{indice}',
+        password='clave-segura',
+        nombre='Estudiante',
+        apellido=f'{indice:04d}'
+    )
+    return Estudiante.objects.create(usuario=usuario)
+
+
+@HASHER_RAPIDO
+class ReporteDocenteQueriesTest(APITestCase):
+    """El reporte de docentes debe usar un número constante de consultas."""
+
+    def setUp(self):
+        self.usuario_docente = Usuario.objects.create_user(
+            email='docente@avi.test', username='docente', password='clave-segura',
+            nombre='Docente', apellido='Prueba', tipo_usuario=TipoUsuario.DOCENTE
+        )
+        self.docente = Docente.objects.create(usuario=self.usuario_docente)
+        self.url = reverse('reporte_estudiantes')
+
+    def crear_estudiantes(self, cantidad, inicio=0):
+        for indice in range(inicio, inicio + cantidad):
+            estudiante = crear_estudiante(indice)
+            AsignacionDocenteEstudiante.objects.create(docente=self.docente, estudiante=estudiante)
+            for puntuacion in (60.0, 80.0):
+                SesionPractica.objects.create(
+                    estudiante=estudiante,
+                    estado=EstadoSesion.COMPLETADA,
+                    duracion_minutos=indice + 1,
+                    puntuacion_sesion=puntuacion
+                )
+            SesionPractica.objects.create(estudiante=estudiante, estado=EstadoSesion.EN_PROGRESO)
+
+    def obtener_reporte(self, consultas_esperadas):
+        # Usuario recién leído en cada petición: sin el perfil de docente en caché
+        self.client.force_authenticate(Usuario.objects.get(pk=self.usuario_docente.pk))
+        with self.assertNumQueries(consultas_esperadas):
+            return self.client.get(self.url)
+
+    def test_consultas_constantes(self):
+        # perfil del docente + COUNT de la paginación + página agregada
+        self.crear_estudiantes(3)
+        respuesta = self.obtener_reporte(3)
+        self.assertEqual(respuesta.data['total_estudiantes'], 3)
+
+        self.crear_estudiantes(30, inicio=3)
+        respuesta = self.obtener_reporte(3)
+        self.assertEqual(respuesta.data['total_estudiantes'], 33)
+
+    def test_metricas_y_ordenamiento(self):
+        self.client.force_authenticate(self.usuario_docente)
+        self.crear_estudiantes(3)
+
+        respuesta = self.client.get(self.url, {'ordenar': '-tiempo'})
+        reportes = respuesta.data['reportes']
+        self.assertEqual([r['tiempo_practica_total'] for r in reportes], [6, 4, 2])
+        self.assertEqual(reportes[0]['sesiones_totales'], 2)
+        self.assertEqual(reportes[0]['puntuacion_promedio'], 70.0)
+
+    def test_solo_estudiantes_asignados(self):
+        self.client.force_authenticate(self.usuario_docente)
+        self.crear_estudiantes(2)
+        crear_estudiante(99)
+
+        respuesta = self.client.get(self.url)
+        self.assertEqual(respuesta.data['total_estudiantes'], 2)
+
+
+@HASHER_RAPIDO
+class PlanesConsultaTest(APITestCase):
+    """
+    Auditoría de planes: ninguna consulta de los endpoints principales debe
+    recorrer secuencialmente las tablas calientes.
+
+    En PostgreSQL se desactiva ``enable_seqscan`` para que el planificador use
+    cualquier índice disponible: si aun así aparece un ``Seq Scan``, falta un índice.
+    """
+    TABLAS_AUDITADAS = (
+        'chatbot_sesionpractica', 'chatbot_retroalimentacion', 'chatbot_turnoconversacion',
+        'chatbot_estadisticasestudiante', 'users_asignaciondocenteestudiante',
+    )
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.usuario_docente = Usuario.objects.create_user(
+            email='docente@avi.test', username='docente', password='clave-segura',
+            nombre='Docente', apellido='Prueba', tipo_usuario=TipoUsuario.DOCENTE
+        )
+        docente = Docente.objects.create(usuario=cls.usuario_docente)
+        for indice in range(20):
+            estudiante = crear_estudiante(indice)
+            AsignacionDocenteEstudiante.objects.create(
+                docente=docente, estudiante=estudiante, activo=indice % 4 != 0
+            )
+            for numero in range(10):
+                sesion = SesionPractica.objects.create(
+                    estudiante=estudiante,
+                    estado=EstadoSesion.COMPLETADA if numero % 3 else EstadoSesion.EN_PROGRESO,
+                    duracion_minutos=numero,
+                    puntuacion_sesion=50.0 + numero
+                )
+                Retroalimentacion.objects.bulk_create([
+                    Retroalimentacion(sesion=sesion, texto_original=f'frase {n}') for n in range(5)
+                ])
+                TurnoConversacion.objects.bulk_create([
+                    TurnoConversacion(sesion=sesion, tipo=TipoTurno.ESTUDIANTE, texto=f'turno {n}')
+                    for n in range(4)
+                ])
+        EstadisticasEstudiante.recalcular_todos()
+        cls.estudiante = Estudiante.objects.order_by('id').first()
+        cls.sesion = cls.estudiante.sesiones.first()
+
+    def setUp(self):
+        if connection.vendor not in ('postgresql', 'sqlite'):
+            self.skipTest(f'Auditoría de planes no soportada para {connection.vendor}')
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute('SET enable_seqscan = off')
+
+    def tearDown(self):
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute('RESET enable_seqscan')
+
+    def explicar(self, sql, params):
+        with connection.cursor() as cursor:
+            if connection.vendor == 'postgresql':
+                cursor.execute(f'EXPLAIN {sql}', params)
+                return '\n'.join(fila[0] for fila in cursor.fetchall())
+            cursor.execute(f'EXPLAIN QUERY PLAN {sql}', params)
+            return '\n'.join(fila[-1] for fila in cursor.fetchall())
+
+    def escaneos_secuenciales(self, plan):
+        if connection.vendor == 'postgresql':
+            patron = r'Seq Scan on (\w+)'
+        else:
+            # "SCAN tabla" sin "USING ... INDEX" es un recorrido completo en SQLite
+            patron = r'^\s*SCAN (\w+)(?! USING)'
+        return [
+            tabla for tabla in re.findall(patron, plan, re.MULTILINE)
+            if tabla in self.TABLAS_AUDITADAS
+        ]
+
+    def auditar(self, usuario, url, params=None):
+        self.client.force_authenticate(Usuario.objects.get(pk=usuario.pk))
+        with CaptureQueriesContext(connection) as contexto:
+            respuesta = self.client.get(url, params)
+        self.assertEqual(respuesta.status_code, 200, url)
+
+        for consulta in contexto.captured_queries:
+            sql = consulta['sql']
+            if not sql.lstrip().upper().startswith('SELECT'):
+                continue
+            # captured_queries ya trae los parámetros interpolados
+            plan = self.explicar(sql, None)
+            self.assertEqual(
+                self.escaneos_secuenciales(plan), [],
+                f'Escaneo secuencial en {url}:\n{sql}\n{plan}'
+            )
+
+    def test_endpoints_estudiante(self):
+        usuario = self.estudiante.usuario
+        self.auditar(usuario, reverse('sesion_list'))
+        self.auditar(usuario, reverse('sesion_detail', args=[self.sesion.id]))
+        self.auditar(usuario, reverse('sesion_detail', args=[self.sesion.id]), {'expand': 'historial_conversacion'})
+        self.auditar(usuario, reverse('sesion_historial', args=[self.sesion.id]))
+        self.auditar(usuario, reverse('retroalimentacion_list'), {'sesion_id': self.sesion.id})
+        self.auditar(usuario, reverse('estadisticas'))
+
+    def test_endpoints_docente(self):
+        self.auditar(self.usuario_docente, reverse('reporte_estudiantes'))
+        self.auditar(self.usuario_docente, reverse('reporte_estudiantes'), {'ordenar': '-puntuacion'})
+        self.auditar(self.usuario_docente, reverse('estudiante_list'))
+
+
+@HASHER_RAPIDO
+class MetricasConcurrentesTest(APITransactionTestCase):
+    """
+    Peticiones simultáneas sobre la misma sesión: las métricas se suman con
+    UPDATE atómicos, sin perder incrementos, y una sesión se cuenta una sola vez.
+    """
+    HILOS = 8
+    INTERACCIONES_POR_HILO = 5
+
+    def setUp(self):
+        if connection.vendor == 'sqlite' and connection.is_in_memory_db():
+            # SQLite en memoria con caché compartida rechaza escrituras simultáneas
+            # ("database table is locked") en vez de esperar el bloqueo
+            self.skipTest('La prueba de concurrencia necesita una base en disco')
+        self.estudiante = crear_estudiante(0)
+        self.sesion = SesionPractica.objects.create(estudiante=self.estudiante)
+
+    def en_paralelo(self, peticion):
+        """Ejecuta ``peticion(cliente)`` en ``HILOS`` hilos a la vez y devuelve sus respuestas."""
+        barrera = threading.Barrier(self.HILOS)
+        respuestas = []
+        errores = []
+
+        def trabajar():
+            cliente = APIClient()
+            cliente.force_authenticate(self.estudiante.usuario)
+            try:
+                barrera.wait()
+                respuestas.extend(peticion(cliente))
+            except Exception as exc:
+                errores.append(exc)
+            finally:
+                connections.close_all()
+
+        hilos = [threading.Thread(target=trabajar) for _ in range(self.HILOS)]
+        for hilo in hilos:
+            hilo.start()
+        for hilo in hilos:
+            hilo.join()
+        self.assertEqual(errores, [])
+        return respuestas
+
+    def test_interacciones_paralelas(self):
+        url = reverse('interaccion')
+        datos = {'sesion_id': self.sesion.id, 'texto_estudiante': 'I like apples', 'texto_esperado': 'I like apples'}
+
+        respuestas = self.en_paralelo(lambda cliente: [
+            cliente.post(url, datos, format='json') for _ in range(self.INTERACCIONES_POR_HILO)
+        ])
+
+        total = self.HILOS * self.INTERACCIONES_POR_HILO
+        self.assertEqual([r.status_code for r in respuestas], [200] * total)
+        self.sesion.refresh_from_db()
+        self.assertEqual(self.sesion.total_retroalimentaciones, total)
+        self.assertEqual(self.sesion.frases_correctas + self.sesion.frases_incorrectas, total)
+        self.assertEqual(self.sesion.palabras_practicadas, 3 * total)
+        self.assertEqual(self.sesion.retroalimentaciones.count(), total)
+        self.assertEqual(self.sesion.turnos.count(), 2 * total)
+
+    def test_finalizar_doble_envio(self):
+        SesionPractica.objects.filter(pk=self.sesion.pk).update(frases_correctas=3, frases_incorrectas=1)
+        url = reverse('sesion_finalizar', args=[self.sesion.id])
+
+        respuestas = self.en_paralelo(lambda cliente: [cliente.post(url)])
+
+        self.assertEqual([r.status_code for r in respuestas], [200] * self.HILOS)
+        mensajes = sorted(r.data['mensaje'] for r in respuestas)
+        self.assertEqual(mensajes.count('Sesión finalizada'), 1)
+        self.sesion.refresh_from_db()
+        self.assertEqual(self.sesion.estado, EstadoSesion.COMPLETADA)
+        self.assertEqual(self.sesion.puntuacion_sesion, 75.0)
+        self.estudiante.refresh_from_db()
+        self.assertEqual(self.estudiante.sesiones_completadas, 1)
+        estadisticas = EstadisticasEstudiante.objects.get(pk=self.estudiante.pk)
+        self.assertEqual(estadisticas.sesiones_completadas, 1)
+        self.assertEqual(estadisticas.frases_correctas, 3)
+
+
+@HASHER_RAPIDO
+class EstadisticasSesionTest(APITestCase):
+    """Las estadísticas acumuladas coinciden con recalcularlas tras crear, finalizar y eliminar."""
+    CAMPOS = (
+        'sesiones_totales', 'sesiones_completadas', 'tiempo_total_minutos', 'palabras_practicadas',
+        'frases_correctas', 'frases_incorrectas', 'suma_puntuacion',
+    )
+
+    def setUp(self):
+        # El catálogo puede guardar agentes de tests anteriores (revertidos)
+        catalogo.invalidar()
+        self.estudiante = crear_estudiante(0)
+        self.client.force_authenticate(self.estudiante.usuario)
+
+    def estadisticas(self):
+        return {campo: getattr(EstadisticasEstudiante.objects.get(pk=self.estudiante.pk), campo)
+                for campo in self.CAMPOS}
+
+    def assertCoincidenConRecalcular(self):
+        acumuladas = self.estadisticas()
+        EstadisticasEstudiante.recalcular(self.estudiante.pk)
+        self.assertEqual(acumuladas, self.estadisticas())
+        return acumuladas
+
+    def crear_sesion(self):
+        respuesta = self.client.post(reverse('sesion_list'), {'titulo': 'Práctica'})
+        self.assertEqual(respuesta.status_code, 201)
+        return respuesta.data['id']
+
+    def test_crear_finalizar_y_eliminar(self):
+        completada, abierta = self.crear_sesion(), self.crear_sesion()
+        self.assertEqual(self.assertCoincidenConRecalcular()['sesiones_totales'], 2)
+
+        SesionPractica.objects.filter(pk=completada).update(
+            palabras_practicadas=12, frases_correctas=3, frases_incorrectas=1
+        )
+        self.client.post(reverse('sesion_finalizar', args=[completada]))
+        acumuladas = self.assertCoincidenConRecalcular()
+        self.assertEqual(acumuladas['sesiones_completadas'], 1)
+        self.assertEqual(acumuladas['suma_puntuacion'], 75.0)
+
+        self.client.delete(reverse('sesion_detail', args=[abierta]))
+        self.assertEqual(self.assertCoincidenConRecalcular()['sesiones_totales'], 1)
+
+        self.client.delete(reverse('sesion_detail', args=[completada]))
+        self.assertEqual(self.assertCoincidenConRecalcular(), dict.fromkeys(self.CAMPOS, 0))
+        self.estudiante.refresh_from_db()
+        self.assertEqual(self.estudiante.sesiones_completadas, 0)
+
+    def test_estado_y_metricas_no_se_editan(self):
+        sesion_id = self.crear_sesion()
+        self.client.post(reverse('sesion_finalizar', args=[sesion_id]))
+        respuesta = self.client.patch(reverse('sesion_detail', args=[sesion_id]), {
+            'titulo': 'Nuevo título', 'estado': EstadoSesion.EN_PROGRESO,
+            'duracion_minutos': 500, 'frases_correctas': 40,
+        })
+        self.assertEqual(respuesta.status_code, 200)
+        sesion = SesionPractica.objects.get(pk=sesion_id)
+        self.assertEqual(sesion.titulo, 'Nuevo título')
+        self.assertEqual(sesion.estado, EstadoSesion.COMPLETADA)
+        self.assertEqual((sesion.duracion_minutos, sesion.frases_correctas), (0, 0))
+        self.assertCoincidenConRecalcular()
+
+        # Volver a finalizar no la cuenta dos veces
+        self.client.post(reverse('sesion_finalizar', args=[sesion_id]))
+        self.assertEqual(self.assertCoincidenConRecalcular()['sesiones_completadas'], 1)
+
+
+@HASHER_RAPIDO
+class SesionDetalleTest(APITestCase):
+    """El detalle no embebe el historial salvo que se pida, y entonces solo sus últimos turnos."""
+
+    def setUp(self):
+        estudiante = crear_estudiante(0)
+        self.sesion = SesionPractica.objects.create(estudiante=estudiante)
+        TurnoConversacion.objects.bulk_create([
+            TurnoConversacion(sesion=self.sesion, tipo=TipoTurno.ESTUDIANTE, texto=f'turno {indice}')
+            for indice in range(60)
+        ])
+        self.client.force_authenticate(estudiante.usuario)
+        self.url = reverse('sesion_detail', args=[self.sesion.id])
+
+    def test_historial_no_se_expande_por_defecto(self):
+        respuesta = self.client.get(self.url)
+        self.assertNotIn('historial_conversacion', respuesta.data)
+        self.assertIn('retroalimentaciones', respuesta.data)
+        self.assertTrue(respuesta.data['historial_url'].endswith(
+            reverse('sesion_historial', args=[self.sesion.id])
+        ))
+
+    def test_cursor_solo_con_las_retroalimentaciones_embebidas(self):
+        Retroalimentacion.objects.bulk_create([
+            Retroalimentacion(sesion=self.sesion, texto_original=f'frase {n}') for n in range(12)
+        ])
+        SesionPractica.objects.filter(pk=self.sesion.pk).update(total_retroalimentaciones=12)
+        self.assertIn('cursor=', self.client.get(self.url).data['retroalimentaciones_siguiente'])
+
+        for url, parametros in ((self.url, {'fields': 'id,titulo'}), (reverse('sesion_list'), {})):
+            with CaptureQueriesContext(connection) as consultas:
+                respuesta = self.client.get(url, parametros)
+            self.assertEqual(respuesta.status_code, 200)
+            self.assertFalse(
+                any('chatbot_retroalimentacion' in consulta['sql'] for consulta in consultas.captured_queries)
+            )
+        datos = respuesta.data['results'][0]
+        self.assertNotIn('retroalimentaciones', datos)
+        self.assertNotIn('retroalimentaciones_siguiente', datos)
+
+    def test_historial_expandido_acotado(self):
+        historial = self.client.get(self.url, {'expand': 'historial_conversacion'}).data['historial_conversacion']
+        self.assertEqual(len(historial), SesionPracticaSerializer.limite_historial)
+        self.assertEqual(historial[0]['texto'], 'turno 10')
+        self.assertEqual(historial[-1]['texto'], 'turno 59')
+
+
+@HASHER_RAPIDO
+class InteraccionLoteTest(APITestCase):
+    """El lote guarda lo mismo que el endpoint individual y avisa de las frases fallidas."""
+    FRASES = [
+        {'texto_estudiante': 'I have a cat', 'texto_esperado': 'I have a cat'},
+        {'texto_estudiante': 'She go to school', 'texto_esperado': 'She goes to school'},
+        {'texto_estudiante': 'We are happy', 'texto_esperado': 'We are very happy'},
+    ]
+    CONTADORES = ('palabras_practicadas', 'frases_correctas', 'frases_incorrectas', 'total_retroalimentaciones')
+
+    def setUp(self):
+        catalogo.invalidar()
+        self.estudiante = crear_estudiante(0)
+        self.client.force_authenticate(self.estudiante.usuario)
+
+    def nueva_sesion(self):
+        return SesionPractica.objects.create(estudiante=self.estudiante, estado=EstadoSesion.EN_PROGRESO)
+
+    def guardado(self, sesion):
+        sesion.refresh_from_db()
+        retroalimentaciones = list(sesion.retroalimentaciones.order_by('id').values(
+            'texto_original', 'texto_esperado', 'texto_corregido', 'puntuacion_pronunciacion',
+            'puntuacion_fluidez', 'puntuacion_entonacion', 'puntuacion_ritmo',
+            'errores_gramaticales', 'sugerencias', 'respuesta_agente',
+        ))
+        turnos = list(sesion.turnos.values_list('tipo', 'texto'))
+        return retroalimentaciones, turnos, {campo: getattr(sesion, campo) for campo in self.CONTADORES}
+
+    # La respuesta local del agente se elige al azar entre varias
+    @mock.patch('chatbot.servicios.locales.random.choice', lambda opciones: opciones[0])
+    def test_lote_igual_a_individual(self):
+        individual = self.nueva_sesion()
+        for frase in self.FRASES:
+            respuesta = self.client.post(reverse('interaccion'), {'sesion_id': individual.id, **frase})
+            self.assertEqual(respuesta.status_code, 200)
+
+        lote = self.nueva_sesion()
+        respuesta = self.client.post(reverse('interaccion_lote'), {
+            'sesion_id': lote.id, 'interacciones': self.FRASES
+        }, format='json')
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertEqual((respuesta.data['success'], respuesta.data['fallidas']), (True, 0))
+
+        self.assertEqual(self.guardado(individual), self.guardado(lote))
+        self.assertEqual(self.guardado(lote)[2]['total_retroalimentaciones'], len(self.FRASES))
+
+    def test_lote_con_frase_fallida(self):
+        sesion = self.nueva_sesion()
+        silencio = base64.b64encode(pcm_a_wav(bytes(32000), 16000).read()).decode('ascii')
+        respuesta = self.client.post(reverse('interaccion_lote'), {
+            'sesion_id': sesion.id,
+            'interacciones': [self.FRASES[0], {'audio_base64': silencio}, self.FRASES[1]],
+        }, format='json')
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertFalse(respuesta.data['success'])
+        self.assertEqual((respuesta.data['procesadas'], respuesta.data['fallidas']), (2, 1))
+        self.assertEqual([resultado['success'] for resultado in respuesta.data['resultados']], [True, False, True])
+        self.assertEqual(self.guardado(sesion)[2]['total_retroalimentaciones'], 2)
+
+
+@HASHER_RAPIDO
+class KeysetPaginationTest(APITestCase):
+    """Los cursores recorren el listado en ambos sentidos sin saltos ni repetidos."""
+
+    def setUp(self):
+        estudiante = crear_estudiante(0)
+        sesiones = [SesionPractica.objects.create(estudiante=estudiante) for _ in range(7)]
+        # Empates en fecha_inicio: los desempata el id
+        empate = timezone.now()
+        SesionPractica.objects.filter(pk__in=[sesion.pk for sesion in sesiones[1:5]]).update(fecha_inicio=empate)
+        self.esperado = list(SesionPractica.objects.order_by('-fecha_inicio', '-id').values_list('id', flat=True))
+        self.client.force_authenticate(estudiante.usuario)
+        self.url = reverse('sesion_list')
+
+    def pagina(self, url, params=None):
+        respuesta = self.client.get(url, params)
+        self.assertEqual(respuesta.status_code, 200)
+        return respuesta.data, [sesion['id'] for sesion in respuesta.data['results']]
+
+    def test_recorrido_hacia_adelante_y_atras(self):
+        datos, ids = self.pagina(self.url, {'page_size': 2})
+        self.assertIsNone(datos['previous'])
+        paginas = [ids]
+        while datos['next']:
+            datos, ids = self.pagina(datos['next'])
+            paginas.append(ids)
+        self.assertEqual([pk for ids in paginas for pk in ids], self.esperado)
+        self.assertEqual([len(ids) for ids in paginas], [2, 2, 2, 1])
+
+        # De la última página hacia atrás se repiten las mismas páginas
+        atras = [paginas[-1]]
+        while datos['previous']:
+            datos, ids = self.pagina(datos['previous'])
+            atras.append(ids)
+        self.assertEqual(atras[::-1], paginas)
+
+    def test_total_opcional(self):
+        datos, _ = self.pagina(self.url, {'page_size': 2})
+        self.assertEqual(datos['count'], 7)
+        with self.assertNumQueries(1):
+            datos, ids = self.pagina(self.url, {'page_size': 2, 'total': 'false'})
+        self.assertNotIn('count', datos)
+        self.assertEqual(ids, self.esperado[:2])
+
+    def test_cursor_alterado_responde_400(self):
+        def cursor(valor):
+            return base64.urlsafe_b64encode(json.dumps(valor).encode()).decode()
+
+        fecha = timezone.now().isoformat()
+        for alterado in (
+            'no-es-base64!', cursor('texto'), cursor([fecha, 1]), cursor(['ayer', 1, False]),
+            cursor([fecha, 'uno', False]), cursor([fecha, 2 ** 70, False]), cursor([fecha, -1, False]),
+            cursor([5, 1, False]), base64.urlsafe_b64encode(b'[1e999, Infinity]').decode(),
+            base64.urlsafe_b64encode(f'["{fecha}", Infinity, false]'.encode()).decode(), 'ñ',
+        ):
+            respuesta = self.client.get(self.url, {'cursor': alterado})
+            self.assertEqual(respuesta.status_code, 400, alterado)
+            self.assertEqual(respuesta.data['detail'], 'Cursor inválido')
+
+
+@HASHER_RAPIDO
+class CatalogoTest(APITestCase):
+    """Agentes y configuraciones salen del catálogo en memoria y se invalidan al guardarlos."""
+    TABLAS = ('chatbot_agentevirtual', 'chatbot_configuracionservicio')
+
+    def setUp(self):
+        self.agente = AgenteVirtual.objects.create(nombre='AVI')
+        catalogo.invalidar()
+        self.estudiante = crear_estudiante(0)
+        self.client.force_authenticate(self.estudiante.usuario)
+
+    def consultas_catalogo(self, metodo, url, datos):
+        with CaptureQueriesContext(connection) as contexto:
+            respuesta = metodo(url, datos, format='json')
+        self.assertIn(respuesta.status_code, (200, 201), respuesta.data)
+        return respuesta, [
+            consulta['sql'] for consulta in contexto.captured_queries
+            if any(tabla in consulta['sql'] for tabla in self.TABLAS)
+        ]
+
+    def test_rutas_calientes_sin_consultas(self):
+        catalogo.agente_activo()  # primera carga del catálogo
+        respuesta, consultas = self.consultas_catalogo(self.client.post, reverse('sesion_list'), {})
+        self.assertEqual(consultas, [])
+        self.assertEqual(SesionPractica.objects.get(pk=respuesta.data['id']).agente, self.agente)
+
+        respuesta, consultas = self.consultas_catalogo(self.client.post, reverse('interaccion'), {
+            'sesion_id': respuesta.data['id'], 'texto_estudiante': 'I like apples', 'texto_esperado': 'I like apples'
+        })
+        self.assertEqual(consultas, [])
+
+    def test_guardar_invalida(self):
+        self.assertEqual(catalogo.agente_activo().nombre, 'AVI')
+        with self.captureOnCommitCallbacks(execute=True):
+            ConfiguracionServicio.objects.create(
+                nombre_servicio='ASR', tipo=TipoServicio.ASR, configuracion={'etapas': ['asr'], 'timeout_ms': 100}
+            )
+            self.agente.is_active = False
+            self.agente.save()
+        self.assertIsNone(catalogo.agente_activo())
+        self.assertEqual(catalogo.agente(self.agente.pk), self.agente)
+        self.assertEqual(catalogo.configuraciones_servicio()['asr']['timeout_ms'], 100)
+
+    def test_descartar_durante_lectura(self):
+        # Una señal de otro hilo descarta la copia justo después de cargarla
+        cargar = catalogo._catalogo._cargar
+
+        def cargar_y_descartar(version):
+            datos = cargar(version)
+            catalogo._catalogo.descartar()
+            return datos
+
+        for lectura in (catalogo.agente_activo, lambda: catalogo.agente(self.agente.pk)):
+            catalogo._catalogo.descartar()
+            with mock.patch.object(catalogo._catalogo, '_cargar', cargar_y_descartar):
+                self.assertEqual(lectura(), self.agente)
+
+    def test_otros_workers_ven_la_nueva_version(self):
+        otro_worker = catalogo.Catalogo()
+        self.assertEqual(otro_worker.agentes()[self.agente.pk].nombre, 'AVI')
+        with self.captureOnCommitCallbacks(execute=True):
+            AgenteVirtual.objects.filter(pk=self.agente.pk).update(nombre='Otro')
+            AgenteVirtual.objects.create(nombre='Nuevo')
+
+        # Dentro de CATALOGO_REFRESCO_S sigue con su copia; al revisar, la recarga
+        self.assertEqual(otro_worker.agentes()[self.agente.pk].nombre, 'AVI')
+        with override_settings(CATALOGO_REFRESCO_S=0):
+            self.assertEqual(otro_worker.agentes()[self.agente.pk].nombre, 'Otro')
+
+
+def clip_pcm16(silencio_s=1.0, voz_s=1.0, frecuencia=16000):
+    """PCM16 mono: ``silencio_s`` de silencio, un tono de ``voz_s`` y otro silencio igual."""
+    silencio = np.zeros(int(silencio_s * frecuencia), dtype=np.float32)
+    tiempo = np.arange(int(voz_s * frecuencia)) / frecuencia
+    tono = (0.5 * np.sin(2 * np.pi * 440 * tiempo)).astype(np.float32)
+    return a_pcm16(np.concatenate([silencio, tono, silencio]))
+
+
+@HASHER_RAPIDO
+class AudioCrudoTest(APITestCase):
+    """El cuerpo audio/* se copia por bloques, con Content-Length o chunked, hasta AUDIO_MAX_BYTES."""
+
+    def peticion(self, cuerpo, tipo='audio/wav', chunked=False):
+        peticion = APIRequestFactory().post('/', cuerpo, content_type=tipo)
+        if chunked:
+            # Como gunicorn con Transfer-Encoding: chunked: sin Content-Length y con el flujo terminado
+            del peticion.META['CONTENT_LENGTH']
+            peticion.META.update({
+                'HTTP_TRANSFER_ENCODING': 'chunked', 'wsgi.input_terminated': True, 'wsgi.input': io.BytesIO(cuerpo)
+            })
+        return Request(peticion)
+
+    def test_cuerpo_crudo(self):
+        wav = pcm_a_wav(clip_pcm16(0.1, 0.5), 16000).read()
+        audio = recibir_audio_crudo(self.peticion(wav, 'audio/wav; codecs=1'))
+        self.assertEqual(audio.read(), wav)
+        self.assertEqual((audio.size, audio.content_type), (len(wav), 'audio/wav'))
+
+    def test_cuerpo_chunked(self):
+        # Más de un bloque de lectura
+        cuerpo = bytes(range(256)) * 1024
+        audio = recibir_audio_crudo(self.peticion(cuerpo, 'audio/L16', chunked=True))
+        self.assertEqual(audio.read(), cuerpo)
+        self.assertEqual(audio.size, len(cuerpo))
+
+    @override_settings(AUDIO_MAX_BYTES=1024)
+    def test_cuerpo_demasiado_grande(self):
+        for chunked in (False, True):
+            with self.assertRaises(AudioDemasiadoGrande):
+                recibir_audio_crudo(self.peticion(bytes(1025), chunked=chunked))
+        self.assertEqual(recibir_audio_crudo(self.peticion(bytes(1024))).size, 1024)
+
+        estudiante = crear_estudiante(0)
+        sesion = SesionPractica.objects.create(estudiante=estudiante, estado=EstadoSesion.EN_PROGRESO)
+        self.client.force_authenticate(estudiante.usuario)
+        respuesta = self.client.post(
+            f"{reverse('interaccion')}?sesion_id={sesion.id}", bytes(4096), content_type='audio/L16'
+        )
+        self.assertEqual(respuesta.status_code, 413)
+        self.assertEqual(respuesta.data['detail'].code, 'audio_demasiado_grande')
+        self.assertEqual(sesion.retroalimentaciones.count(), 0)
+
+    def test_interaccion_con_cuerpo_crudo(self):
+        ConfiguracionServicio.objects.create(
+            nombre_servicio='ASR', tipo=TipoServicio.ASR,
+            configuracion={'etapas': ['asr'], 'transcripcion': 'I have a cat'}
+        )
+        catalogo.invalidar()
+        self.addCleanup(catalogo.invalidar)
+        estudiante = crear_estudiante(0)
+        sesion = SesionPractica.objects.create(estudiante=estudiante, estado=EstadoSesion.EN_PROGRESO)
+        self.client.force_authenticate(estudiante.usuario)
+        respuesta = self.client.post(
+            f"{reverse('interaccion')}?sesion_id={sesion.id}&texto_esperado=I+have+a+cat",
+            pcm_a_wav(clip_pcm16(0.2, 0.6), 16000).read(), content_type='audio/wav'
+        )
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertEqual(respuesta.data['retroalimentacion']['texto_original'], 'I have a cat')
+
+
+@HASHER_RAPIDO
+class PreprocesamientoAudioTest(APITestCase):
+    """El preprocesamiento recorta WAV y PCM16 declarado; los demás formatos llegan intactos al ASR."""
+
+    def preprocesar(self, datos, tipo=None):
+        audio = io.BytesIO(datos)
+        if tipo:
+            audio.content_type = tipo
+        contexto = ContextoInteraccion(audio=audio)
+        return PreprocesamientoAudio().ejecutar(contexto), contexto
+
+    def test_wav_recorta_silencio(self):
+        resultado, contexto = self.preprocesar(pcm_a_wav(clip_pcm16(), 16000).read())
+        self.assertTrue(resultado['voz'])
+        self.assertEqual(resultado['duracion_ms'], 3000)
+        self.assertGreaterEqual(resultado['voz_ms'], 1000)
+        self.assertLess(resultado['voz_ms'], 1500)
+        self.assertIsNotNone(contexto.audio_procesado)
+        self.assertEqual(len(contexto.muestras), resultado['voz_ms'] * 16)
+
+    def test_pcm_declarado(self):
+        resultado, contexto = self.preprocesar(clip_pcm16(), 'audio/L16')
+        self.assertTrue(resultado['voz'])
+        self.assertLess(resultado['voz_ms'], 1500)
+
+    def test_formato_comprimido_pasa_sin_tocar(self):
+        # Cabecera EBML de webm seguida de bytes que, leídos como PCM, parecen ruido fuerte
+        datos = b'\x1aE\xdf\xa3' + bytes(range(256)) * 200
+        for tipo in ('audio/webm', None):
+            resultado, contexto = self.preprocesar(datos, tipo)
+            self.assertEqual(resultado, {'voz': None, 'decodificado': False})
+            self.assertIsNone(contexto.audio_procesado)
+            self.assertIsNone(contexto.muestras)
+            self.assertIsNone(contexto.cancelacion)
+            self.assertEqual(contexto.audio_asr.read(), datos)
+
+    def test_clip_sin_voz(self):
+        estudiante = crear_estudiante(0)
+        sesion = SesionPractica.objects.create(estudiante=estudiante)
+        self.client.force_authenticate(estudiante.usuario)
+        silencio = pcm_a_wav(clip_pcm16(silencio_s=1.0, voz_s=0), 16000).read()
+
+        respuesta = self.client.post(reverse('interaccion'), {
+            'sesion_id': sesion.id,
+            'audio': SimpleUploadedFile('clip.wav', silencio, content_type='audio/wav'),
+        }, format='multipart')
+        self.assertEqual(respuesta.status_code, 400)
+        self.assertEqual(respuesta.data['detail'].code, 'audio_sin_voz')
+        self.assertEqual(sesion.retroalimentaciones.count(), 0)
+
+
+class ServidorASRTest(APITestCase):
+    """El ASR rechaza formatos que no puede decodificar y tamaños fuera de límite."""
+
+    def test_leer_pcm(self):
+        pcm = clip_pcm16(silencio_s=0, voz_s=0.1)
+        self.assertEqual(leer_pcm(pcm_a_wav(pcm, 8000).read()), (pcm, 8000))
+        self.assertEqual(leer_pcm(pcm, 'audio/L16'), (pcm, 16000))
+        with self.assertRaisesMessage(ErrorEtapa, 'audio/webm'):
+            leer_pcm(b'\x1aE\xdf\xa3' + pcm, 'audio/webm')
+        with self.assertRaises(ErrorEtapa):
+            leer_pcm(pcm)
+
+    def atender(self, peticion):
+        cliente, servidor = socket.socketpair()
+        with cliente, servidor:
+            _enviar_json(cliente, peticion)
+            _ManejadorASR(servidor, None, None)
+            return _recibir_json(cliente)
+
+    @override_settings(AUDIO_MAX_BYTES=1024)
+    def test_rechaza_tamaño_declarado_excesivo(self):
+        for tamaño in (1025, 2 ** 40, -1, 'mucho'):
+            respuesta = self.atender({'modelo': 'simulado', 'bytes': tamaño})
+            self.assertIn('Tamaño de audio inválido', respuesta['error'])
+
+
+class AlineacionTest(APITestCase):
+    """Alineación por distancia de edición y puntuación de la transcripción."""
+
+    def evaluar(self, transcripcion, esperado):
+        resultado = alineacion.alinear(transcripcion, esperado)
+        return resultado, alineacion.puntuacion(resultado), alineacion.errores(resultado)
+
+    def test_coincidencia_exacta(self):
+        # Mayúsculas, puntuación y contracciones no cuentan como errores
+        resultado, puntos, (errores, sugerencias) = self.evaluar("I'm here, Hello World!", 'I am here hello world')
+        self.assertEqual(resultado.correctas, 5)
+        self.assertEqual(puntos, 100.0)
+        self.assertEqual((errores, sugerencias), ([], []))
+
+    def test_sustitucion(self):
+        resultado, puntos, (errores, sugerencias) = self.evaluar('I has a cat', 'I have a cat')
+        self.assertEqual((resultado.correctas, resultado.sustituciones), (3, 1))
+        self.assertEqual(puntos, 75.0)
+        self.assertEqual(errores, [
+            {'tipo': 'sustitucion', 'palabra_incorrecta': 'has', 'palabra_correcta': 'have', 'posicion': 1}
+        ])
+        self.assertEqual(sugerencias, ["Pronuncia 'have' en lugar de 'has'"])
+
+    def test_insercion_no_desplaza_las_siguientes(self):
+        resultado, puntos, (errores, sugerencias) = self.evaluar('I have a big black cat', 'I have a cat')
+        self.assertEqual((resultado.correctas, resultado.inserciones, resultado.sustituciones), (4, 2, 0))
+        self.assertAlmostEqual(puntos, 100 * 4 / 6)
+        self.assertEqual(errores, [
+            {'tipo': 'insercion', 'palabra': 'big', 'posicion': 3},
+            {'tipo': 'insercion', 'palabra': 'black', 'posicion': 3},
+        ])
+        self.assertEqual(sugerencias, [])
+
+    def test_omision(self):
+        resultado, puntos, (errores, sugerencias) = self.evaluar('I have cat', 'I have a cat')
+        self.assertEqual((resultado.correctas, resultado.omisiones), (3, 1))
+        self.assertEqual(puntos, 75.0)
+        self.assertEqual(errores, [{'tipo': 'omision', 'palabra': 'a', 'posicion': 2}])
+        self.assertEqual(sugerencias, ["Te faltó la palabra 'a'"])
+
+    def test_transcripcion_vacia(self):
+        resultado, puntos, (errores, _) = self.evaluar('', 'I have a cat')
+        self.assertEqual((resultado.correctas, resultado.omisiones), (0, 4))
+        self.assertEqual(puntos, 0.0)
+        self.assertEqual([error['posicion'] for error in errores], [0, 1, 2, 3])
+        self.assertEqual(alineacion.puntuacion(alineacion.alinear('', '')), 0.0)
+
+    def test_distancia_igual_a_la_de_programacion_dinamica(self):
+        def distancia(a, b):
+            fila = list(range(len(b) + 1))
+            for i, palabra in enumerate(a, 1):
+                anterior, fila[0] = fila[0], i
+                for j, esperada in enumerate(b, 1):
+                    anterior, fila[j] = fila[j], min(fila[j] + 1, fila[j - 1] + 1, anterior + (palabra != esperada))
+            return fila[-1]
+
+        azar = random.Random(0)
+        vocabulario = ['the', 'cat', 'a', 'dog', 'runs', 'fast', 'is']
+        for _ in range(200):
+            a = [azar.choice(vocabulario) for _ in range(azar.randint(0, 12))]
+            b = [azar.choice(vocabulario) for _ in range(azar.randint(0, 12))]
+            resultado = alineacion.alinear(' '.join(a), ' '.join(b))
+            self.assertEqual(resultado.sustituciones + resultado.omisiones + resultado.inserciones, distancia(a, b))
+            # La alineación recorre todo el texto esperado y toda la transcripción
+            operaciones = resultado.operaciones
+            self.assertEqual([operacion.palabra_esperada for operacion in operaciones if operacion.tipo != 'insercion'], b)
+            self.assertEqual([operacion.palabra for operacion in operaciones if operacion.tipo != 'omision'], a)
+
+
+class ProsodiaTest(APITestCase):
+    """Métricas de prosodia sobre señales sintéticas; todas son tipos nativos (se guardan en JSON)."""
+    FRECUENCIA = 16000
+
+    def silencio(self, segundos):
+        return np.zeros(int(segundos * self.FRECUENCIA), dtype=np.float32)
+
+    def tono(self, segundos, f0=200):
+        tiempo = np.arange(int(segundos * self.FRECUENCIA)) / self.FRECUENCIA
+        return (0.5 * np.sin(2 * np.pi * f0 * tiempo)).astype(np.float32)
+
+    def silaba(self, segundos):
+        # Tono con envolvente de Hann: un núcleo de energía por sílaba
+        return self.tono(segundos) * np.hanning(int(segundos * self.FRECUENCIA)).astype(np.float32)
+
+    def analizar(self, muestras, palabras=0):
+        metricas = prosodia.analizar(muestras, self.FRECUENCIA, palabras)
+        puntuaciones = prosodia.puntuaciones(metricas)
+        for nombre, valor in {**metricas, **puntuaciones}.items():
+            if valor is not None:
+                self.assertIn(type(valor), (float, int), nombre)
+        self.assertIs(type(metricas['duracion_s']), float)
+        json.dumps([metricas, puntuaciones])
+        return metricas, puntuaciones
+
+    def test_silencio(self):
+        metricas, puntuaciones = self.analizar(self.silencio(1), palabras=3)
+        self.assertEqual(metricas['silabas'], 0)
+        self.assertEqual(metricas['pausas'], 0)
+        for nombre in ('tasa_articulacion', 'palabras_por_minuto', 'proporcion_pausas', 'f0_mediana', 'npvi'):
+            self.assertIsNone(metricas[nombre], nombre)
+        self.assertEqual(set(puntuaciones.values()), {None})
+
+    def test_tono_constante(self):
+        metricas, puntuaciones = self.analizar(self.tono(1), palabras=3)
+        self.assertIs(type(metricas['f0_mediana']), float)
+        self.assertAlmostEqual(metricas['f0_mediana'], 200, delta=2)
+        self.assertLess(metricas['rango_semitonos'], 0.5)
+        self.assertEqual((metricas['pausas'], metricas['proporcion_pausas']), (0, 0.0))
+        self.assertAlmostEqual(metricas['fonacion_s'], 1, delta=0.05)
+        # Sin variación de tono la entonación puntúa 0
+        self.assertEqual(puntuaciones['puntuacion_entonacion'], 0.0)
+
+    def test_silabas_con_pausa(self):
+        # Sílabas cortas y largas alternadas, con una pausa de 500 ms
+        cortas_largas = [self.silaba(0.15), self.silaba(0.3)]
+        muestras = np.concatenate(2 * cortas_largas + [self.silencio(0.5)] + cortas_largas + [self.silaba(0.15)])
+        metricas, puntuaciones = self.analizar(muestras, palabras=3)
+        self.assertEqual(metricas['silabas'], 7)
+        self.assertEqual((metricas['pausas'], metricas['pausas_largas']), (1, 0))
+        self.assertAlmostEqual(metricas['pausa_media_ms'], 500, delta=30)
+        self.assertAlmostEqual(metricas['proporcion_pausas'], 0.25, delta=0.03)
+        # nPVI de duraciones 1:2 alternadas: 100 * |0.15 - 0.3| / 0.225 ≈ 67
+        self.assertIs(type(metricas['npvi']), float)
+        self.assertTrue(40 < metricas['npvi'] < 80, metricas['npvi'])
+        self.assertEqual(puntuaciones['puntuacion_ritmo'], 100.0)
+        self.assertIs(type(puntuaciones['puntuacion_fluidez']), float)
+
+
+@HASHER_RAPIDO
+class CacheTTSTest(APITestCase):
+    """El audio TTS se sintetiza una vez por texto y voz; la memoria respeta su límite de bytes."""
+
+    def setUp(self):
+        directorio = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directorio)
+        ajustes = override_settings(MEDIA_ROOT=directorio, TTS_CACHE_DIR=os.path.join(directorio, 'tts_cache'))
+        ajustes.enable()
+        self.addCleanup(ajustes.disable)
+        # Caché del proceso nueva, sobre el directorio temporal
+        parche = mock.patch.object(tts, '_cache', None)
+        parche.start()
+        self.addCleanup(parche.stop)
+
+    def test_acierto_con_el_mismo_texto_y_voz(self):
+        etapa = TTSLocal({'simular_audio': True})
+        with mock.patch.object(etapa, 'sintetizar', wraps=etapa.sintetizar) as sintetizar:
+            url = etapa.renderizar('Hello there', 'en-US')
+            self.assertTrue(url.endswith('.wav'))
+            self.assertEqual(etapa.renderizar('Hello there', 'en-US'), url)
+            self.assertEqual(sintetizar.call_count, 1)
+            self.assertNotEqual(etapa.renderizar('Hello there', 'en-GB'), url)
+            self.assertNotEqual(etapa.renderizar('Hello again', 'en-US'), url)
+            self.assertEqual(sintetizar.call_count, 3)
+
+        # Otro worker (caché en memoria vacía) encuentra el archivo en disco
+        with mock.patch.object(tts, '_cache', None), mock.patch.object(etapa, 'sintetizar') as sintetizar:
+            self.assertEqual(etapa.renderizar('Hello there', 'en-US'), url)
+            sintetizar.assert_not_called()
+        # Otra versión del motor no reutiliza el audio
+        self.assertNotEqual(TTSLocal({'simular_audio': True, 'version': '2'}).renderizar('Hello there', 'en-US'), url)
+        # Sin audio sintetizado no hay URL ni nada en caché
+        self.assertIsNone(TTSLocal({}).renderizar('Sin audio', 'en-US'))
+
+    def test_lru_limitado_por_bytes(self):
+        cache = tts.CacheTTS(settings.TTS_CACHE_DIR, max_bytes_memoria=10)
+        for clave in ('a', 'b'):
+            cache.guardar(clave * 64, clave.encode() * 4)
+        # Leer la primera la vuelve la más reciente: al guardar la tercera sale la segunda
+        self.assertEqual(cache.obtener('a' * 64), b'aaaa')
+        cache.guardar('c' * 64, b'cccc')
+        self.assertEqual(list(cache._memoria), ['a' * 64, 'c' * 64])
+        self.assertEqual(cache._bytes_memoria, 8)
+        # Un audio mayor que el límite no entra en memoria, pero queda en disco
+        cache.guardar('d' * 64, b'd' * 11)
+        self.assertNotIn('d' * 64, cache._memoria)
+        self.assertLessEqual(cache._bytes_memoria, 10)
+        # Lo expulsado de memoria se vuelve a leer del disco
+        self.assertEqual(cache.obtener('b' * 64), b'bbbb')
+        self.assertEqual(cache.obtener('d' * 64), b'd' * 11)
+        self.assertIsNone(cache.obtener('e' * 64))
+
+    def test_respuesta_con_url_del_audio(self):
+        ConfiguracionServicio.objects.create(
+            nombre_servicio='TTS', tipo=TipoServicio.TTS, configuracion={'simular_audio': True}
+        )
+        # La invalidación del catálogo espera al commit, que en el test no llega
+        catalogo.invalidar()
+        self.addCleanup(catalogo.invalidar)
+        estudiante = crear_estudiante(0)
+        sesion = SesionPractica.objects.create(estudiante=estudiante, estado=EstadoSesion.EN_PROGRESO)
+        self.client.force_authenticate(estudiante.usuario)
+
+        respuesta = self.client.post(reverse('interaccion'), {
+            'sesion_id': sesion.id, 'texto_estudiante': 'I have a cat', 'texto_esperado': 'I have a cat'
+        })
+        self.assertEqual(respuesta.status_code, 200)
+        url = respuesta.data['respuesta_audio_url']
+        self.assertRegex(url, r'/tts_cache/[0-9a-f]{2}/[0-9a-f]{64}\.wav$')
+        self.assertNotIn('tts', respuesta.data.get('etapas_por_defecto', []))
+
+
+@override_settings(INFERENCIA_LOTE_ESPERA_MS=5000, INFERENCIA_LOTE_MAX=4)
+class PlanificadorLotesTest(APITestCase):
+    """Las transcripciones concurrentes salen en un solo lote y cada una recibe lo suyo."""
+
+    def transcribir_concurrente(self, segundos):
+        # Opciones propias del test: un planificador nuevo, creado con los settings de arriba
+        opciones = {'transcripcion': 'one two three four', 'palabras_por_segundo': 1, 'prueba': self.id()}
+        planificador = obtener_planificador('simulado', opciones)
+        # Con carga reciente el lote espera a llenarse en vez de salir con la primera petición
+        planificador._ultima_concurrencia = time.monotonic()
+
+        def transcribir(duracion):
+            try:
+                return transcribir_en_proceso('simulado', opciones, bytes(2 * 16000 * duracion), 'audio/L16')
+            except Exception as exc:
+                return exc
+
+        with ThreadPoolExecutor(max_workers=len(segundos)) as pool:
+            return list(pool.map(transcribir, segundos)), planificador
+
+    def test_un_lote_con_el_resultado_de_cada_peticion(self):
+        with mock.patch.object(
+            ModeloSimulado, 'transcribir_lote', autospec=True, side_effect=ModeloSimulado.transcribir_lote
+        ) as transcribir_lote:
+            textos, planificador = self.transcribir_concurrente([3, 1, 4, 2])
+        self.assertEqual(transcribir_lote.call_count, 1)
+        self.assertEqual(len(transcribir_lote.call_args.args[1]), 4)
+        self.assertEqual(textos, ['one two three', 'one', 'one two three four', 'one two'])
+        self.assertEqual(planificador.estadisticas()['tamaños'], {4: 1})
+
+    def test_error_del_lote_llega_a_cada_peticion(self):
+        error = RuntimeError('modelo caído')
+        with mock.patch.object(ModeloSimulado, 'transcribir_lote', side_effect=error) as transcribir_lote, \
+                self.assertLogs('chatbot.servicios.lotes', 'ERROR'):
+            errores, planificador = self.transcribir_concurrente([1, 2, 3, 4])
+        self.assertEqual(transcribir_lote.call_count, 1)
+        self.assertEqual(errores, [error] * 4)
+        self.assertEqual(planificador.estadisticas()['errores'], 1)
+
+        # El hilo del planificador sigue atendiendo
+        textos, _ = self.transcribir_concurrente([4, 3, 2, 1])
+        self.assertEqual(textos, ['one two three four', 'one two three', 'one two', 'one'])
+
+
+class EtapaLenta(Etapa):
+    """Etapa simulada: espera ``demora`` segundos y modifica el contexto."""
+
+    def __init__(self, nombre, demora, timeout_ms=2000, depende_de=()):
+        super().__init__({'timeout_ms': timeout_ms})
+        self.nombre = nombre
+        self.demora = demora
+        self.depende_de = depende_de
+        self.terminada = threading.Event()
+
+    def ejecutar(self, contexto):
+        time.sleep(self.demora)
+        contexto.texto_estudiante = self.nombre
+        self.terminada.set()
+        return {'valor': self.nombre}
+
+    def por_defecto(self, contexto):
+        return {'valor': 'por defecto'}
+
+
+class MotorPipelineTest(APITestCase):
+    """Las etapas independientes corren en paralelo, cada una con su timeout."""
+
+    def test_grupo_en_paralelo(self):
+        etapas = [EtapaLenta(nombre, 0.2) for nombre in ('a', 'b', 'c')]
+        inicio = time.monotonic()
+        contexto = motor.MotorPipeline(etapas).ejecutar(ContextoInteraccion())
+        self.assertLess(time.monotonic() - inicio, 0.5)
+        self.assertEqual({nombre: resultado['valor'] for nombre, resultado in contexto.resultados.items()},
+                         {'a': 'a', 'b': 'b', 'c': 'c'})
+        self.assertEqual(contexto.errores, {})
+
+    def test_timeout_usa_por_defecto_sin_tocar_el_contexto(self):
+        lenta = EtapaLenta('lenta', 0.3, timeout_ms=50)
+        siguiente = EtapaLenta('siguiente', 0, depende_de=('lenta',))
+        contexto = motor.MotorPipeline([lenta, siguiente]).ejecutar(ContextoInteraccion(texto_estudiante='hola'))
+        self.assertEqual(contexto.resultados['lenta'], {'valor': 'por defecto'})
+        self.assertEqual(contexto.errores, {'lenta': 'timeout'})
+        self.assertEqual(contexto.resultados['siguiente'], {'valor': 'siguiente'})
+        self.assertEqual(contexto.texto_estudiante, 'siguiente')
+        # El hilo de la etapa lenta termina después, sobre su propia copia
+        self.assertTrue(lenta.terminada.wait(1))
+        self.assertEqual(contexto.texto_estudiante, 'siguiente')
+
+    def test_timeout_cuenta_desde_que_la_etapa_arranca(self):
+        # Con un solo hilo la segunda etapa espera a la primera: 2 x 150 ms > 200 ms
+        etapas = [EtapaLenta(nombre, 0.15, timeout_ms=200) for nombre in ('a', 'b')]
+        with ThreadPoolExecutor(max_workers=1) as pool, mock.patch.object(motor, 'obtener_pool', return_value=pool):
+            contexto = motor.MotorPipeline(etapas).ejecutar(ContextoInteraccion())
+        self.assertEqual(contexto.errores, {})
+        self.assertEqual(contexto.resultados['b'], {'valor': 'b'})
+
+    def test_backend_desconocido(self):
+        def configuracion(**datos):
+            return ConfiguracionServicio(nombre_servicio='ASR', tipo=TipoServicio.ASR, configuracion=datos)
+
+        configuracion(backend='modelo').full_clean()
+        configuracion(backend='modelo', etapas=['asr']).full_clean()
+        for datos in ({'backend': 'modleo'}, {'backend': 'modleo', 'etapas': ['asr']}, {'etapas': ['asrr']}):
+            with self.assertRaises(ValidationError, msg=datos):
+                configuracion(**datos).full_clean()
+
+        # Guardado sin validar: la etapa usa el backend local en vez de fallar
+        configuracion(backend='modleo', etapas=['asr'], transcripcion='I have a cat').save()
+        with self.assertLogs('chatbot.servicios.motor', 'WARNING'):
+            configuraciones = motor.cargar_configuraciones()
+        self.assertEqual(configuraciones['asr']['backend'], 'local')
+        etapa = motor.MotorPipeline.desde_configuracion(configuraciones).etapa('asr')
+        self.assertIsInstance(etapa, ASRLocal)
+        self.assertEqual(etapa.configuracion['transcripcion'], 'I have a cat')
+
+    def test_respuesta_marca_etapas_por_defecto(self):
+        pipeline = motor.MotorPipeline.desde_configuracion({})
+        gramatica = pipeline.etapa('gramatica')
+        gramatica.timeout_ms = 10
+        with mock.patch.object(gramatica, 'ejecutar', side_effect=lambda contexto: time.sleep(0.2)):
+            resultado = evaluar_interaccion(pipeline, SesionPractica(), 'I has a cat', 'I have a cat')
+        self.assertEqual(resultado.etapas_por_defecto, ['gramatica'])
+        self.assertEqual(resultado.como_respuesta()['etapas_por_defecto'], ['gramatica'])
+        self.assertEqual(resultado.retroalimentacion.errores_gramaticales, [])
+
+
+@HASHER_RAPIDO
+class InteraccionStreamTest(APITransactionTestCase):
+    """El stream publica un evento por etapa en orden y cierra con el resultado guardado o un error."""
+
+    def setUp(self):
+        catalogo.invalidar()
+        self.estudiante = crear_estudiante(0)
+        self.sesion = SesionPractica.objects.create(estudiante=self.estudiante, estado=EstadoSesion.EN_PROGRESO)
+        self.client.force_authenticate(self.estudiante.usuario)
+
+    @staticmethod
+    @async_to_sync
+    async def leer(respuesta):
+        # El generador es asíncrono, como bajo ASGI
+        return b''.join([parte async for parte in respuesta.streaming_content])
+
+    def eventos(self, **datos):
+        respuesta = self.client.post(reverse('interaccion_stream'), {'sesion_id': self.sesion.id, **datos})
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertEqual(respuesta['Content-Type'], 'text/event-stream')
+        contenido = self.leer(respuesta).decode()
+        eventos = []
+        for bloque in contenido.strip().split('\n\n'):
+            evento, datos = bloque.split('\n')
+            eventos.append((evento.removeprefix('event: '), json.loads(datos.removeprefix('data: '))))
+        return eventos
+
+    def test_eventos_en_orden(self):
+        eventos = self.eventos(texto_estudiante='I has a cat', texto_esperado='I have a cat')
+        self.assertEqual([evento for evento, _ in eventos], [
+            'preprocesamiento', 'asr', 'pronunciacion', 'gramatica', 'prosodia', 'respuesta', 'tts', 'resultado'
+        ])
+        datos = dict(eventos)
+        self.assertEqual(datos['asr'], {'texto': 'I has a cat'})
+        self.assertEqual(datos['gramatica']['errores'][0]['palabra_correcta'], 'have')
+
+        # El evento final lleva la retroalimentación ya guardada
+        final = datos['resultado']
+        self.assertTrue(final['success'])
+        self.assertEqual(final['etapas_por_defecto'], [])
+        retroalimentacion = Retroalimentacion.objects.get(sesion=self.sesion)
+        self.assertEqual(final['retroalimentacion']['id'], retroalimentacion.id)
+        self.assertEqual(final['respuesta_texto'], datos['respuesta']['texto'])
+        self.assertEqual(retroalimentacion.respuesta_agente, datos['respuesta']['texto'])
+        self.sesion.refresh_from_db()
+        self.assertEqual(self.sesion.total_retroalimentaciones, 1)
+
+    def test_etapa_fallida_usa_su_valor_por_defecto(self):
+        with mock.patch.object(GramaticaLocal, 'ejecutar', side_effect=RuntimeError('caída')), \
+                self.assertLogs('chatbot.servicios.motor', 'ERROR'):
+            eventos = self.eventos(texto_estudiante='I has a cat', texto_esperado='I have a cat')
+        datos = dict(eventos)
+        self.assertEqual(datos['gramatica'], {'errores': [], 'sugerencias': []})
+        self.assertEqual(eventos[-1][0], 'resultado')
+        self.assertEqual(datos['resultado']['etapas_por_defecto'], ['gramatica'])
+
+    def test_error_cierra_el_stream(self):
+        # Audio sin voz: el preprocesamiento cancela la interacción
+        silencio = SimpleUploadedFile('silencio.wav', pcm_a_wav(bytes(32000), 16000).read(), 'audio/wav')
+        eventos = self.eventos(audio=silencio, texto_esperado='I have a cat')
+        self.assertEqual([evento for evento, _ in eventos], ['preprocesamiento', 'error'])
+        self.assertEqual(eventos[-1][1], {'error': 'No se detectó voz en el audio.'})
+
+        with mock.patch('chatbot.interacciones.guardar_interacciones', side_effect=RuntimeError('sin base')), \
+                self.assertLogs('chatbot.interacciones', 'ERROR'):
+            eventos = self.eventos(texto_estudiante='I have a cat', texto_esperado='I have a cat')
+        self.assertEqual(eventos[-2][0], 'tts')
+        self.assertEqual(eventos[-1], ('error', {'error': 'No se pudo procesar la interacción'}))
+        self.assertFalse(Retroalimentacion.objects.filter(sesion=self.sesion).exists())
+
+
+@HASHER_RAPIDO
+class InteraccionWebSocketTest(APITransactionTestCase):
+    """El WebSocket evalúa el audio recibido y rechaza inicios inválidos con 1003."""
+
+    def setUp(self):
+        ConfiguracionServicio.objects.create(
+            nombre_servicio='ASR', tipo=TipoServicio.ASR,
+            configuracion={'etapas': ['asr'], 'transcripcion': 'I have a cat'}
+        )
+        catalogo.invalidar()
+        self.estudiante = crear_estudiante(0)
+        self.sesion = SesionPractica.objects.create(estudiante=self.estudiante, estado=EstadoSesion.EN_PROGRESO)
+        self.token = str(TokenRefresco.for_user(self.estudiante.usuario).access_token)
+
+    def inicio(self, **campos):
+        return {'tipo': 'inicio', 'token': self.token, 'sesion_id': self.sesion.id,
+                'texto_esperado': 'I have a cat', **campos}
+
+    @async_to_sync
+    async def conversar(self, *mensajes):
+        """Envía ``mensajes`` (dict como JSON, bytes como audio); devuelve ``(recibidos, código de cierre)``."""
+        comunicador = ApplicationCommunicator(interaccion_websocket, {'type': 'websocket', 'path': RUTA})
+        await comunicador.send_input({'type': 'websocket.connect'})
+        self.assertEqual(await comunicador.receive_output(5), {'type': 'websocket.accept'})
+        for mensaje in mensajes:
+            if isinstance(mensaje, bytes):
+                await comunicador.send_input({'type': 'websocket.receive', 'bytes': mensaje})
+            else:
+                texto = mensaje if isinstance(mensaje, str) else json.dumps(mensaje)
+                await comunicador.send_input({'type': 'websocket.receive', 'text': texto})
+        recibidos = []
+        while True:
+            salida = await comunicador.receive_output(5)
+            if salida['type'] == 'websocket.close':
+                await comunicador.wait(5)
+                return recibidos, salida['code']
+            recibidos.append(json.loads(salida['text']))
+
+    def test_interaccion_completa(self):
+        recibidos, codigo = self.conversar(self.inicio(), clip_pcm16(0.2, 0.6), {'tipo': 'fin'})
+        self.assertEqual(codigo, 1000)
+        final = next(mensaje for mensaje in recibidos if mensaje['tipo'] == 'final')
+        self.assertEqual(final['texto'], 'I have a cat')
+        resultado = recibidos[-1]
+        self.assertEqual(resultado['tipo'], 'resultado')
+        self.assertEqual(resultado['retroalimentacion']['texto_original'], 'I have a cat')
+        self.assertEqual(self.sesion.retroalimentaciones.count(), 1)
+
+    def test_rechaza_inicio_invalido(self):
+        for mensaje in (
+            self.inicio(frecuencia=0),
+            self.inicio(frecuencia=1_000_000),
+            self.inicio(frecuencia='rápida'),
+            self.inicio(sesion_id='abc'),
+            self.inicio(sesion_id=[1]),
+            self.inicio(texto_esperado={'frase': 'x'}),
+            '["inicio"]',
+            '42',
+        ):
+            recibidos, codigo = self.conversar(mensaje)
+            self.assertEqual(codigo, CIERRE_DATOS_INVALIDOS, mensaje)
+            self.assertEqual([respuesta['tipo'] for respuesta in recibidos], ['error'], mensaje)
+        self.assertEqual(self.sesion.retroalimentaciones.count(), 0)
@@ -6,7 +6,9 @@ from django.urls import path
 from .views import (
     AgenteVirtualListView, AgenteVirtualDetailView,
     SesionPracticaListView, SesionPracticaDetailView, FinalizarSesionView,
-    InteraccionAgenteView, RetroalimentacionListView,
+    HistorialConversacionView,
+    InteraccionAgenteView, InteraccionStreamView, InteraccionLoteView, EstadisticasInferenciaView,
+    RetroalimentacionListView,
     EstadisticasEstudianteView, ReporteDocenteView
 )
 
@@ -19,9 +21,13 @@ urlpatterns = [
     path('sesiones/', SesionPracticaListView.as_view(), name='sesion_list'),
     path('sesiones/<int:pk>/', SesionPracticaDetailView.as_view(), name='sesion_detail'),
     path('sesiones/<int:pk>/finalizar/', FinalizarSesionView.as_view(), name='sesion_finalizar'),
+    path('sesiones/<int:pk>/historial/', HistorialConversacionView.as_view(), name='sesion_historial'),
     
     # Interacción con el Agente
     path('interaccion/', InteraccionAgenteView.as_view(), name='interaccion'),
+    path('interaccion/stream/', InteraccionStreamView.as_view(), name='interaccion_stream'),
+    path('interaccion/lote/', InteraccionLoteView.as_view(), name='interaccion_lote'),
+    path('inferencia/estadisticas/', EstadisticasInferenciaView.as_view(), name='inferencia_estadisticas'),
     
     # Retroalimentación
     path('retroalimentaciones/', RetroalimentacionListView.as_view(), name='retroalimentacion_list'),
@@ -2,21 +2,38 @@
 Views para la app Chatbot - AVI (Agente Virtual Inteligente).
 """
 from rest_framework import generics, status, permissions
+from rest_framework.renderers import JSONRenderer
 from rest_framework.response import Response
 from rest_framework.views import APIView
+from django.http import StreamingHttpResponse
 from django.utils import timezone
-from django.db.models import Avg, Sum
-import random
+from django.db.models import Avg, Count, Q, Sum, Value
+from django.db.models.functions import Coalesce
 
-from .models import AgenteVirtual, SesionPractica, Retroalimentacion, EstadoSesion
+from . import catalogo
+from .models import (
+    AgenteVirtual, SesionPractica, Retroalimentacion, TurnoConversacion,
+    EstadisticasEstudiante, EstadoSesion
+)
 from .serializers import (
     AgenteVirtualSerializer, SesionPracticaSerializer,
-    SesionPracticaCreateSerializer, SesionPracticaListSerializer,
+    SesionPracticaCreateSerializer, SesionPracticaListSerializer, TurnoConversacionSerializer,
     RetroalimentacionSerializer, RetroalimentacionCreateSerializer,
-    InteraccionRequestSerializer, InteraccionResponseSerializer,
+    InteraccionRequestSerializer, InteraccionLoteRequestSerializer, InteraccionResponseSerializer,
     EstadisticasSesionSerializer, ReporteEstudianteSerializer
 )
-from users.models import Estudiante, TipoUsuario
+from .audio import AudioSinVoz, decodificar_audio_base64, es_audio_crudo, recibir_audio_crudo
+from .interacciones import (
+    ResultadoInteraccion, eventos_interaccion, evaluar_interaccion, guardar_interacciones
+)
+from .renderers import EventStreamRenderer
+from .pagination import (
+    HistorialPagination, ReportePagination, RetroalimentacionPagination, SesionPagination
+)
+from .servicios import MotorPipeline
+from .servicios.asr import ClienteASR, ServidorNoDisponible, estadisticas_lotes
+from .servicios.motor import cargar_configuraciones
+from users.models import Estudiante, Docente, TipoUsuario
 
 
 class AgenteVirtualListView(generics.ListCreateAPIView):
@@ -44,9 +61,10 @@ class AgenteVirtualDetailView(generics.RetrieveUpdateAPIView):
 class SesionPracticaListView(generics.ListCreateAPIView):
     """
     Listar/Crear sesiones de práctica del estudiante autenticado.
-    GET/POST /api/sesiones/
+    GET/POST /api/sesiones/?cursor=<cursor>&total=false
     """
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = SesionPagination
     
     def get_queryset(self):
         usuario = self.request.user
@@ -85,12 +103,8 @@ class SesionPracticaListView(generics.ListCreateAPIView):
         serializer = self.get_serializer(data=request.data)
         serializer.is_valid(raise_exception=True)
         
-        # Obtener agente virtual (usar el primero activo si no se especifica)
-        agente_id = request.data.get('agente')
-        if agente_id:
-            agente = AgenteVirtual.objects.filter(id=agente_id, is_active=True).first()
-        else:
-            agente = AgenteVirtual.objects.filter(is_active=True).first()
+        # Obtener agente virtual (usar el primero activo si no se especifica), desde el catálogo en memoria
+        agente = catalogo.agente_activo(request.data.get('agente'))
         
         if not agente:
             # Crear agente por defecto si no existe
@@ -107,9 +121,10 @@ class SesionPracticaListView(generics.ListCreateAPIView):
             nivel_dificultad=serializer.validated_data.get('nivel_dificultad', estudiante.nivel_ingles),
             estado=EstadoSesion.EN_PROGRESO
         )
+        EstadisticasEstudiante.registrar_sesion_iniciada(estudiante.id)
         
         return Response(
-            SesionPracticaSerializer(sesion).data,
+            SesionPracticaSerializer(sesion, context=self.get_serializer_context()).data,
             status=status.HTTP_201_CREATED
         )
 
@@ -117,7 +132,11 @@ class SesionPracticaListView(generics.ListCreateAPIView):
 class SesionPracticaDetailView(generics.RetrieveUpdateDestroyAPIView):
     """
     Obtener/Actualizar/Eliminar una sesión de práctica.
-    GET/PUT/DELETE /api/sesiones/<id>/
+    GET/PUT/DELETE /api/sesiones/<id>/?expand=historial_conversacion&fields=id,estado
+    
+    Por defecto embebe las últimas retroalimentaciones; el historial se pagina
+    en ``historial_url`` (``?expand=historial_conversacion`` embebe sus últimos
+    turnos). ``?expand=`` y ``?fields=`` permiten pedir solo las partes necesarias.
     """
     queryset = SesionPractica.objects.all()
     serializer_class = SesionPracticaSerializer
@@ -125,66 +144,47 @@ class SesionPracticaDetailView(generics.RetrieveUpdateDestroyAPIView):
     
     def get_queryset(self):
         usuario = self.request.user
+        sesiones = SesionPractica.objects.select_related('agente')
         if usuario.tipo_usuario == TipoUsuario.ESTUDIANTE:
             try:
-                return SesionPractica.objects.filter(estudiante=usuario.perfil_estudiante)
+                return sesiones.filter(estudiante=usuario.perfil_estudiante)
             except Estudiante.DoesNotExist:
                 return SesionPractica.objects.none()
-        return SesionPractica.objects.all()
+        return sesiones
+    
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        context['expandir'] = ['retroalimentaciones']
+        return context
 
 
 class FinalizarSesionView(APIView):
     """
-    Finalizar una sesión de práctica.
+    Finalizar una sesión de práctica. Finalizar una sesión ya completada no
+    cambia nada y devuelve la sesión como quedó.
     POST /api/sesiones/<id>/finalizar/
     """
     permission_classes = [permissions.IsAuthenticated]
     
     def post(self, request, pk):
         try:
-            sesion = SesionPractica.objects.get(pk=pk)
+            sesion = SesionPractica.objects.select_related('estudiante').get(pk=pk)
             
             # Verificar permisos
             usuario = request.user
             if usuario.tipo_usuario == TipoUsuario.ESTUDIANTE:
-                if sesion.estudiante.usuario != usuario:
+                if sesion.estudiante.usuario_id != usuario.id:
                     return Response(
                         {'error': 'No tienes permiso para esta sesión'},
                         status=status.HTTP_403_FORBIDDEN
                     )
             
-            # Calcular métricas finales
-            sesion.estado = EstadoSesion.COMPLETADA
-            sesion.fecha_fin = timezone.now()
-            
-            # Calcular duración
-            if sesion.fecha_inicio:
-                duracion = sesion.fecha_fin - sesion.fecha_inicio
-                sesion.duracion_minutos = int(duracion.total_seconds() / 60)
-            
-            # Calcular puntuación final
-            sesion.calcular_puntuacion()
-            
-            # Actualizar métricas del estudiante
-            estudiante = sesion.estudiante
-            estudiante.sesiones_completadas += 1
-            estudiante.horas_practica += sesion.duracion_minutos // 60
-            
-            # Recalcular puntuación promedio
-            avg_puntuacion = SesionPractica.objects.filter(
-                estudiante=estudiante,
-                estado=EstadoSesion.COMPLETADA
-            ).aggregate(Avg('puntuacion_sesion'))['puntuacion_sesion__avg']
-            
-            if avg_puntuacion:
-                estudiante.puntuacion_promedio = avg_puntuacion
-            
-            estudiante.save()
-            sesion.save()
+            # Completar la sesión y acumular sus métricas; idempotente ante un doble envío
+            finalizada = sesion.finalizar()
             
             return Response({
-                'mensaje': 'Sesión finalizada',
-                'sesion': SesionPracticaSerializer(sesion).data,
+                'mensaje': 'Sesión finalizada' if finalizada else 'La sesión ya estaba finalizada',
+                'sesion': SesionPracticaSerializer(sesion, context={'request': request}).data,
                 'estadisticas': {
                     'duracion_minutos': sesion.duracion_minutos,
                     'puntuacion_final': sesion.puntuacion_sesion,
@@ -200,222 +200,213 @@ class FinalizarSesionView(APIView):
             )
 
 
+class HistorialConversacionView(generics.ListAPIView):
+    """
+    Historial de conversación de una sesión, paginado por cursor.
+    GET /api/sesiones/<id>/historial/
+    """
+    serializer_class = TurnoConversacionSerializer
+    permission_classes = [permissions.IsAuthenticated]
+    pagination_class = HistorialPagination
+    
+    def get_queryset(self):
+        usuario = self.request.user
+        turnos = TurnoConversacion.objects.filter(sesion_id=self.kwargs['pk'])
+        if usuario.tipo_usuario == TipoUsuario.ESTUDIANTE:
+            return turnos.filter(sesion__estudiante__usuario=usuario)
+        return turnos
+
+
 # ==================== INTERACCIÓN CON EL AGENTE ====================
 
+def leer_interaccion(request):
+    """
+    Valida la petición de interacción y devuelve
+    ``(sesion_id, texto_estudiante, texto_esperado, audio)``.
+    """
+    # Audio crudo (audio/*): los demás campos van en la query string
+    if es_audio_crudo(request):
+        datos = {**request.query_params.dict(), 'audio': recibir_audio_crudo(request)}
+    else:
+        datos = request.data
+    
+    serializer = InteraccionRequestSerializer(data=datos)
+    serializer.is_valid(raise_exception=True)
+    
+    audio = serializer.validated_data.get('audio')
+    audio_base64 = serializer.validated_data.get('audio_base64', '')
+    if audio is None and audio_base64:
+        audio = decodificar_audio_base64(audio_base64)
+    return (
+        serializer.validated_data['sesion_id'],
+        serializer.validated_data.get('texto_estudiante', ''),
+        serializer.validated_data.get('texto_esperado', ''),
+        audio,
+    )
+
+
+def obtener_sesion_activa(sesion_id):
+    """Devuelve ``(sesion, None)`` o ``(None, Response de error)`` si no existe o no está activa."""
+    try:
+        sesion = catalogo.adjuntar_agente(SesionPractica.objects.get(pk=sesion_id))
+    except SesionPractica.DoesNotExist:
+        return None, Response(
+            {'error': 'Sesión no encontrada'},
+            status=status.HTTP_404_NOT_FOUND
+        )
+    
+    # Verificar que la sesión esté activa
+    if sesion.estado not in [EstadoSesion.INICIADA, EstadoSesion.EN_PROGRESO]:
+        return None, Response(
+            {'error': 'La sesión no está activa'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    return sesion, None
+
+
 class InteraccionAgenteView(APIView):
     """
     Endpoint principal para interactuar con el agente virtual.
     El estudiante envía texto/audio y recibe retroalimentación.
     POST /api/interaccion/
+    
+    El audio puede enviarse como archivo multipart (campo ``audio``) o como
+    cuerpo crudo ``audio/*`` con ``?sesion_id=&texto_esperado=`` en la URL;
+    ``audio_base64`` en JSON se mantiene por compatibilidad.
     """
     permission_classes = [permissions.IsAuthenticated]
     
     def post(self, request):
-        import time
-        start_time = time.time()
-        
-        serializer = InteraccionRequestSerializer(data=request.data)
-        serializer.is_valid(raise_exception=True)
-        
-        sesion_id = serializer.validated_data['sesion_id']
-        texto_estudiante = serializer.validated_data.get('texto_estudiante', '')
-        texto_esperado = serializer.validated_data.get('texto_esperado', '')
-        audio_base64 = serializer.validated_data.get('audio_base64', '')
-        
-        try:
-            sesion = SesionPractica.objects.get(pk=sesion_id)
-        except SesionPractica.DoesNotExist:
-            return Response(
-                {'error': 'Sesión no encontrada'},
-                status=status.HTTP_404_NOT_FOUND
-            )
+        sesion_id, texto_estudiante, texto_esperado, audio = leer_interaccion(request)
         
-        # Verificar que la sesión esté activa
-        if sesion.estado not in [EstadoSesion.INICIADA, EstadoSesion.EN_PROGRESO]:
-            return Response(
-                {'error': 'La sesión no está activa'},
-                status=status.HTTP_400_BAD_REQUEST
-            )
-        
-        # ========================================
-        # AQUÍ SE INTEGRARÁN LOS SERVICIOS:
-        # 1. ASR: Transcribir audio si se envía
-        # 2. NLP: Analizar pronunciación y gramática
-        # 3. TTS: Generar audio de respuesta
-        # ========================================
-        
-        # Por ahora, simulamos el procesamiento
-        # TODO: Integrar Vosk/Whisper para ASR
-        # TODO: Integrar análisis de pronunciación
-        # TODO: Integrar Coqui TTS para síntesis de voz
-        
-        # Simular análisis de pronunciación
-        puntuacion_pronunciacion = self._analizar_pronunciacion(texto_estudiante, texto_esperado)
-        puntuacion_fluidez = random.uniform(60, 100)
-        puntuacion_entonacion = random.uniform(60, 100)
-        puntuacion_ritmo = random.uniform(60, 100)
+        sesion, error = obtener_sesion_activa(sesion_id)
+        if error:
+            return error
         
-        # Detectar errores (simulado)
-        errores, sugerencias = self._detectar_errores(texto_estudiante, texto_esperado)
-        
-        # Generar respuesta del agente
-        respuesta_agente = self._generar_respuesta(
-            texto_estudiante, texto_esperado, puntuacion_pronunciacion
+        resultado = evaluar_interaccion(
+            MotorPipeline.desde_configuracion(), sesion, texto_estudiante, texto_esperado, audio
         )
+        guardar_interacciones(sesion, [resultado])
+        return Response(resultado.como_respuesta())
+
+
+class InteraccionStreamView(APIView):
+    """
+    Igual que /api/interaccion/, pero responde con Server-Sent Events a medida
+    que avanza el pipeline: ``asr`` (transcripción), ``pronunciacion``,
+    ``gramatica`` y ``prosodia`` (puntuaciones y errores), ``respuesta``
+    (texto del agente), ``tts`` (URL del audio) y ``resultado`` (respuesta
+    completa). El avatar puede reaccionar desde el primer evento.
+    POST /api/interaccion/stream/
+    
+    Los eventos salen de inmediato bajo ASGI (``uvicorn backend.asgi:application``);
+    bajo WSGI se envían todos juntos al final.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+    renderer_classes = [JSONRenderer, EventStreamRenderer]
+    
+    def post(self, request):
+        sesion_id, texto_estudiante, texto_esperado, audio = leer_interaccion(request)
         
-        # Determinar si necesita repetir
-        puntuacion_general = (
-            puntuacion_pronunciacion + puntuacion_fluidez + 
-            puntuacion_entonacion + puntuacion_ritmo
-        ) / 4
-        necesita_repetir = puntuacion_general < 70
-        
-        # Determinar emoción del avatar
-        if puntuacion_general >= 90:
-            emocion_avatar = 'feliz'
-        elif puntuacion_general >= 70:
-            emocion_avatar = 'neutral'
-        elif puntuacion_general >= 50:
-            emocion_avatar = 'pensativo'
-        else:
-            emocion_avatar = 'animando'
-        
-        # Calcular tiempo de respuesta
-        tiempo_respuesta_ms = int((time.time() - start_time) * 1000)
+        sesion, error = obtener_sesion_activa(sesion_id)
+        if error:
+            return error
         
-        # Crear retroalimentación
-        retroalimentacion = Retroalimentacion.objects.create(
-            sesion=sesion,
-            texto_original=texto_estudiante,
-            texto_esperado=texto_esperado,
-            texto_corregido=texto_esperado if errores else texto_estudiante,
-            puntuacion_pronunciacion=puntuacion_pronunciacion,
-            puntuacion_fluidez=puntuacion_fluidez,
-            puntuacion_entonacion=puntuacion_entonacion,
-            puntuacion_ritmo=puntuacion_ritmo,
-            errores_gramaticales=errores,
-            sugerencias=sugerencias,
-            respuesta_agente=respuesta_agente,
-            tiempo_respuesta_ms=tiempo_respuesta_ms
+        respuesta = StreamingHttpResponse(
+            eventos_interaccion(
+                MotorPipeline.desde_configuracion(), sesion, texto_estudiante, texto_esperado, audio
+            ),
+            content_type='text/event-stream'
         )
-        
-        # Actualizar métricas de la sesión
-        sesion.palabras_practicadas += len(texto_estudiante.split())
-        if puntuacion_general >= 70:
-            sesion.frases_correctas += 1
-        else:
-            sesion.frases_incorrectas += 1
-        
-        # Agregar al historial de conversación
-        if sesion.historial_conversacion is None:
-            sesion.historial_conversacion = []
-        
-        sesion.historial_conversacion.append({
-            'tipo': 'estudiante',
-            'texto': texto_estudiante,
-            'timestamp': timezone.now().isoformat()
-        })
-        sesion.historial_conversacion.append({
-            'tipo': 'agente',
-            'texto': respuesta_agente,
-            'timestamp': timezone.now().isoformat()
-        })
-        sesion.save()
-        
-        return Response({
-            'success': True,
-            'mensaje': 'Interacción procesada correctamente',
-            'retroalimentacion': RetroalimentacionSerializer(retroalimentacion).data,
-            'respuesta_texto': respuesta_agente,
-            'respuesta_audio_url': None,  # TODO: Implementar TTS
-            'puntuacion_general': puntuacion_general,
-            'necesita_repetir': necesita_repetir,
-            'emocion_avatar': emocion_avatar,
-            'animacion_avatar': 'hablar' if respuesta_agente else 'escuchar'
-        })
+        respuesta['Cache-Control'] = 'no-cache'
+        respuesta['X-Accel-Buffering'] = 'no'
+        return respuesta
+
+
+class InteraccionLoteView(APIView):
+    """
+    Procesa en orden un lote de frases de una sesión (tabletas que se
+    reconectan con frases en cola). Cada frase se evalúa igual que en
+    /api/interaccion/; las retroalimentaciones se insertan juntas y los
+    contadores de la sesión se actualizan con un solo UPDATE.
+    POST /api/interaccion/lote/
+    {"sesion_id": 1, "interacciones": [{"texto_estudiante": "...", "texto_esperado": "..."}, ...]}
     
-    def _analizar_pronunciacion(self, texto_estudiante: str, texto_esperado: str) -> float:
-        """
-        Analiza la pronunciación comparando el texto del estudiante con el esperado.
-        TODO: Integrar análisis fonético real con servicios ASR.
-        """
-        if not texto_estudiante or not texto_esperado:
-            return 50.0
-        
-        # Comparación simple de similitud
-        palabras_estudiante = texto_estudiante.lower().split()
-        palabras_esperado = texto_esperado.lower().split()
-        
-        if not palabras_esperado:
-            return 50.0
-        
-        coincidencias = sum(1 for p in palabras_estudiante if p in palabras_esperado)
-        similitud = (coincidencias / len(palabras_esperado)) * 100
-        
-        # Agregar algo de variabilidad
-        return min(100, max(0, similitud + random.uniform(-10, 10)))
+    Las frases que fallan (audio sin voz) se informan en su posición de
+    ``resultados`` y se cuentan en ``fallidas``; ``success`` es ``true`` solo si
+    no falló ninguna.
+    """
+    permission_classes = [permissions.IsAuthenticated]
     
-    def _detectar_errores(self, texto_estudiante: str, texto_esperado: str) -> tuple:
-        """
-        Detecta errores gramaticales y de pronunciación.
-        TODO: Integrar análisis NLP real.
-        """
-        errores = []
-        sugerencias = []
+    def post(self, request):
+        serializer = InteraccionLoteRequestSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
         
-        if texto_estudiante and texto_esperado:
-            palabras_estudiante = texto_estudiante.lower().split()
-            palabras_esperado = texto_esperado.lower().split()
-            
-            for i, palabra_esp in enumerate(palabras_esperado):
-                if i >= len(palabras_estudiante):
-                    errores.append({
-                        'tipo': 'omision',
-                        'palabra': palabra_esp,
-                        'posicion': i
-                    })
-                elif palabras_estudiante[i] != palabra_esp:
-                    errores.append({
-                        'tipo': 'sustitucion',
-                        'palabra_incorrecta': palabras_estudiante[i],
-                        'palabra_correcta': palabra_esp,
-                        'posicion': i
-                    })
-                    sugerencias.append(f"Pronuncia '{palabra_esp}' en lugar de '{palabras_estudiante[i]}'")
+        sesion, error = obtener_sesion_activa(serializer.validated_data['sesion_id'])
+        if error:
+            return error
         
-        return errores, sugerencias
-    
-    def _generar_respuesta(self, texto_estudiante: str, texto_esperado: str, puntuacion: float) -> str:
-        """
-        Genera la respuesta del agente virtual.
-        TODO: Integrar generación de lenguaje natural.
-        """
-        if puntuacion >= 90:
-            respuestas = [
-                "¡Excelente pronunciación! 🌟 You did great!",
-                "¡Muy bien! Tu pronunciación es casi perfecta. Keep it up!",
-                "¡Fantástico! You're making amazing progress!"
-            ]
-        elif puntuacion >= 70:
-            respuestas = [
-                "¡Buen trabajo! Hay algunos detalles que podemos mejorar.",
-                "Good effort! Let's practice a bit more.",
-                "¡Vas por buen camino! Practiquemos un poco más."
-            ]
-        elif puntuacion >= 50:
-            respuestas = [
-                "Let's try again. Focus on pronouncing each word clearly.",
-                "No te preocupes, ¡la práctica hace al maestro! Try again.",
-                "Good attempt! Let me help you with the pronunciation."
-            ]
-        else:
-            respuestas = [
-                "Don't give up! Let's break it down and practice word by word.",
-                "It's okay to make mistakes. That's how we learn! Try again.",
-                "¡Vamos a intentarlo de nuevo! Escucha con atención y repite conmigo."
+        motor = MotorPipeline.desde_configuracion()
+        resultados = []
+        respuestas = []
+        for item in serializer.validated_data['interacciones']:
+            audio_base64 = item.get('audio_base64', '')
+            try:
+                resultado = evaluar_interaccion(
+                    motor,
+                    sesion,
+                    item.get('texto_estudiante', ''),
+                    item.get('texto_esperado', ''),
+                    decodificar_audio_base64(audio_base64) if audio_base64 else None
+                )
+            except AudioSinVoz as exc:
+                # Un clip vacío no bloquea el resto de la cola
+                respuestas.append({'success': False, 'error': exc.detail})
+                continue
+            resultados.append(resultado)
+            respuestas.append(resultado)
+        guardar_interacciones(sesion, resultados)
+        fallidas = len(respuestas) - len(resultados)
+        
+        # Las frases fallidas no impiden guardar las demás: success indica si fueron todas
+        return Response({
+            'success': not fallidas,
+            'mensaje': f'{len(resultados)} interacciones procesadas correctamente, {fallidas} con error',
+            'procesadas': len(resultados),
+            'fallidas': fallidas,
+            'resultados': [
+                respuesta.como_respuesta() if isinstance(respuesta, ResultadoInteraccion) else respuesta
+                for respuesta in respuestas
             ]
+        })
+
+
+# ==================== INFERENCIA ====================
+
+class EstadisticasInferenciaView(APIView):
+    """
+    Estadísticas de los micro-lotes de inferencia (solo administradores):
+    las del servidor ASR compartido, si está levantado, y las de este worker.
+    GET /api/inferencia/estadisticas/
+    """
+    permission_classes = [permissions.IsAuthenticated]
+    
+    def get(self, request):
+        if request.user.tipo_usuario != TipoUsuario.ADMINISTRADOR:
+            return Response(
+                {'error': 'Solo disponible para administradores'},
+                status=status.HTTP_403_FORBIDDEN
+            )
         
-        return random.choice(respuestas)
+        socket = cargar_configuraciones().get('asr', {}).get('socket')
+        try:
+            servidor = ClienteASR(socket, timeout=2).estadisticas()
+        except (ServidorNoDisponible, OSError):
+            servidor = None
+        return Response({
+            'servidor_asr': servidor,
+            'proceso': estadisticas_lotes(),
+        })
 
 
 # ==================== RETROALIMENTACIÓN ====================
@@ -423,10 +414,11 @@ class InteraccionAgenteView(APIView):
 class RetroalimentacionListView(generics.ListAPIView):
     """
     Listar retroalimentaciones de una sesión.
-    GET /api/retroalimentaciones/?sesion_id=<id>
+    GET /api/retroalimentaciones/?sesion_id=<id>&cursor=<cursor>&total=false
     """
     serializer_class = RetroalimentacionSerializer
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = RetroalimentacionPagination
     
     def get_queryset(self):
         sesion_id = self.request.query_params.get('sesion_id')
@@ -453,25 +445,19 @@ class EstadisticasEstudianteView(APIView):
                 status=status.HTTP_403_FORBIDDEN
             )
         
+        # Perfil, nombre y estadísticas acumuladas en una sola consulta
         try:
-            estudiante = usuario.perfil_estudiante
+            estudiante = Estudiante.objects.select_related('usuario', 'estadisticas').get(usuario=usuario)
         except Estudiante.DoesNotExist:
             return Response(
                 {'error': 'Perfil de estudiante no encontrado'},
                 status=status.HTTP_404_NOT_FOUND
             )
         
-        # Obtener estadísticas
-        sesiones = SesionPractica.objects.filter(estudiante=estudiante)
-        sesiones_completadas = sesiones.filter(estado=EstadoSesion.COMPLETADA)
-        
-        stats = sesiones_completadas.aggregate(
-            total_minutos=Sum('duracion_minutos'),
-            total_palabras=Sum('palabras_practicadas'),
-            total_correctas=Sum('frases_correctas'),
-            total_incorrectas=Sum('frases_incorrectas'),
-            puntuacion_promedio=Avg('puntuacion_sesion')
-        )
+        try:
+            stats = estudiante.estadisticas
+        except EstadisticasEstudiante.DoesNotExist:
+            stats = EstadisticasEstudiante.recalcular(estudiante.id)
         
         return Response({
             'estudiante': {
@@ -482,32 +468,39 @@ class EstadisticasEstudianteView(APIView):
                 'puntuacion_promedio': estudiante.puntuacion_promedio
             },
             'estadisticas': {
-                'sesiones_totales': sesiones.count(),
-                'sesiones_completadas': sesiones_completadas.count(),
-                'tiempo_total_minutos': stats['total_minutos'] or 0,
-                'palabras_practicadas': stats['total_palabras'] or 0,
-                'frases_correctas': stats['total_correctas'] or 0,
-                'frases_incorrectas': stats['total_incorrectas'] or 0,
-                'puntuacion_promedio': round(stats['puntuacion_promedio'] or 0, 2)
+                'sesiones_totales': stats.sesiones_totales,
+                'sesiones_completadas': stats.sesiones_completadas,
+                'tiempo_total_minutos': stats.tiempo_total_minutos,
+                'palabras_practicadas': stats.palabras_practicadas,
+                'frases_correctas': stats.frases_correctas,
+                'frases_incorrectas': stats.frases_incorrectas,
+                'puntuacion_promedio': round(stats.puntuacion_promedio, 2)
             }
         })
 
 
-class ReporteDocenteView(APIView):
+class ReporteDocenteView(generics.GenericAPIView):
     """
     Obtener reportes de estudiantes para docentes.
-    GET /api/reportes/estudiantes/
+    GET /api/reportes/estudiantes/?ordenar=-puntuacion&page=2
+    
+    Las métricas se calculan con una sola consulta agrupada por estudiante
+    (más el COUNT de la paginación), sin importar cuántos estudiantes haya.
+    Ordenamiento: ``puntuacion``, ``tiempo``, ``sesiones`` o ``nombre`` (prefijo ``-`` para descendente).
     """
     permission_classes = [permissions.IsAuthenticated]
+    serializer_class = ReporteEstudianteSerializer
+    pagination_class = ReportePagination
     
-    def get(self, request):
-        usuario = request.user
-        
-        if usuario.tipo_usuario not in [TipoUsuario.DOCENTE, TipoUsuario.ADMINISTRADOR]:
-            return Response(
-                {'error': 'Solo disponible para docentes y administradores'},
-                status=status.HTTP_403_FORBIDDEN
-            )
+    ORDENAMIENTOS = {
+        'puntuacion': 'puntuacion_promedio_sesiones',
+        'tiempo': 'tiempo_practica_total',
+        'sesiones': 'sesiones_totales',
+        'nombre': 'usuario__apellido',
+    }
+    
+    def get_queryset(self):
+        usuario = self.request.user
         
         # Obtener estudiantes según permisos
         if usuario.tipo_usuario == TipoUsuario.DOCENTE:
@@ -517,36 +510,49 @@ class ReporteDocenteView(APIView):
                     docentes_asignados__docente=docente,
                     docentes_asignados__activo=True
                 )
-            except:
+            except Docente.DoesNotExist:
                 estudiantes = Estudiante.objects.none()
         else:
             estudiantes = Estudiante.objects.all()
         
-        reportes = []
-        for estudiante in estudiantes:
-            sesiones = SesionPractica.objects.filter(
-                estudiante=estudiante,
-                estado=EstadoSesion.COMPLETADA
-            )
-            
-            stats = sesiones.aggregate(
-                total_minutos=Sum('duracion_minutos'),
-                puntuacion_promedio=Avg('puntuacion_sesion')
+        completadas = Q(sesiones__estado=EstadoSesion.COMPLETADA)
+        estudiantes = estudiantes.select_related('usuario').annotate(
+            sesiones_totales=Count('sesiones', filter=completadas),
+            tiempo_practica_total=Coalesce(Sum('sesiones__duracion_minutos', filter=completadas), 0),
+            puntuacion_promedio_sesiones=Coalesce(
+                Avg('sesiones__puntuacion_sesion', filter=completadas), Value(0.0)
+            ),
+        )
+        
+        ordenar = self.request.query_params.get('ordenar', '')
+        campo = self.ORDENAMIENTOS.get(ordenar.lstrip('-'))
+        if campo:
+            prefijo = '-' if ordenar.startswith('-') else ''
+            return estudiantes.order_by(f'{prefijo}{campo}', 'id')
+        return estudiantes.order_by('id')
+    
+    def get(self, request):
+        usuario = request.user
+        
+        if usuario.tipo_usuario not in [TipoUsuario.DOCENTE, TipoUsuario.ADMINISTRADOR]:
+            return Response(
+                {'error': 'Solo disponible para docentes y administradores'},
+                status=status.HTTP_403_FORBIDDEN
             )
-            
-            reportes.append({
+        
+        pagina = self.paginate_queryset(self.get_queryset())
+        reportes = [
+            {
                 'estudiante_id': estudiante.id,
                 'nombre_estudiante': estudiante.usuario.get_full_name(),
                 'nivel_actual': estudiante.nivel_ingles,
-                'sesiones_totales': sesiones.count(),
-                'tiempo_practica_total': stats['total_minutos'] or 0,
-                'puntuacion_promedio': round(stats['puntuacion_promedio'] or 0, 2),
+                'sesiones_totales': estudiante.sesiones_totales,
+                'tiempo_practica_total': estudiante.tiempo_practica_total,
+                'puntuacion_promedio': round(estudiante.puntuacion_promedio_sesiones, 2),
                 'progreso': {},
                 'areas_mejora': [],
                 'recomendaciones': []
-            })
-        
-        return Response({
-            'total_estudiantes': len(reportes),
-            'reportes': reportes
-        })
+            }
+            for estudiante in pagina
+        ]
+        return self.get_paginated_response(self.get_serializer(reportes, many=True).data)
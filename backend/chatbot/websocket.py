@@ -0,0 +1,264 @@
+"""
+Interacción por voz en streaming sobre WebSocket (ASGI).
+
+El cliente envía el audio mientras el estudiante habla y recibe
+transcripciones parciales; al terminar de hablar (o al enviar ``fin``) se
+cierra la transcripción y pasa directamente por la misma evaluación que
+/api/interaccion/. Cada conexión tiene su propio reconocedor, así que no hace
+falta estado compartido entre workers ni broker.
+
+    ws://<host>/ws/interaccion/
+
+Cliente -> servidor (el token va en el primer mensaje y no en la URL, para
+que no quede en los logs de acceso):
+    {"tipo": "inicio", "token": "<access JWT>", "sesion_id": 1,
+     "texto_esperado": "...", "frecuencia": 16000}
+    (``frecuencia`` entre 8000 y 48000 Hz; un inicio inválido cierra con 1003)
+    <mensajes binarios: PCM16 mono little-endian a ``frecuencia`` Hz>
+    {"tipo": "fin"}   (opcional: el servidor detecta el final de la voz)
+
+Servidor -> cliente:
+    {"tipo": "parcial", "texto": "..."}
+    {"tipo": "final", "texto": "..."}
+    {"tipo": "resultado", ...misma respuesta que /api/interaccion/...}
+    {"tipo": "error", "error": "..."}
+"""
+import array
+import json
+import logging
+import math
+import sys
+
+from asgiref.sync import ThreadSensitiveContext, sync_to_async
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connections
+from rest_framework_simplejwt.exceptions import InvalidToken, TokenError
+
+from users.autenticacion import AutenticacionJWT
+
+from . import catalogo
+from .interacciones import evaluar_interaccion, guardar_interacciones
+from .models import EstadoSesion, SesionPractica
+from .servicios import MotorPipeline
+from .servicios.asr import pcm_a_wav
+
+logger = logging.getLogger(__name__)
+
+RUTA = '/ws/interaccion/'
+CIERRE_NORMAL = 1000
+CIERRE_DATOS_INVALIDOS = 1003
+CIERRE_DEMASIADO_GRANDE = 1009
+CIERRE_NO_AUTORIZADO = 4401
+
+FRECUENCIA_MIN = 8000
+FRECUENCIA_MAX = 48000
+
+
+class InicioInvalido(ValueError):
+    """Mensaje de inicio con campos fuera de formato o de rango."""
+
+
+def validar_inicio(datos):
+    """``(sesion_id, texto_esperado, frecuencia)`` del mensaje de inicio; lanza ``InicioInvalido``."""
+    try:
+        sesion_id = int(datos.get('sesion_id'))
+        frecuencia = int(datos.get('frecuencia', 16000))
+    except (TypeError, ValueError, OverflowError):
+        raise InicioInvalido('sesion_id y frecuencia deben ser números enteros')
+    if not FRECUENCIA_MIN <= frecuencia <= FRECUENCIA_MAX:
+        raise InicioInvalido(f'La frecuencia debe estar entre {FRECUENCIA_MIN} y {FRECUENCIA_MAX} Hz')
+    texto_esperado = datos.get('texto_esperado') or ''
+    if not isinstance(texto_esperado, str):
+        raise InicioInvalido('texto_esperado debe ser texto')
+    return sesion_id, texto_esperado, frecuencia
+
+
+class DetectorFinVoz:
+    """
+    Detecta el final de la voz: energía RMS por ventanas de 20 ms y, tras haber
+    oído voz, ``cola_ms`` seguidos de silencio.
+    """
+    ventana_ms = 20
+
+    def __init__(self, frecuencia, cola_ms=None, umbral=None):
+        self.muestras_ventana = frecuencia * self.ventana_ms // 1000
+        self.ventanas_cola = (cola_ms or settings.ASR_COLA_SILENCIO_MS) // self.ventana_ms
+        self.umbral = umbral or settings.ASR_UMBRAL_VOZ
+        self.hubo_voz = False
+        self.silencio = 0
+        self._resto = array.array('h')
+
+    def procesar(self, pcm):
+        """Procesa un bloque PCM16; devuelve ``True`` cuando la voz terminó."""
+        muestras = array.array('h', pcm)
+        if sys.byteorder == 'big':
+            muestras.byteswap()
+        muestras = self._resto + muestras
+        ancho = self.muestras_ventana
+        completas = len(muestras) - len(muestras) % ancho
+        for inicio in range(0, completas, ancho):
+            ventana = muestras[inicio:inicio + ancho]
+            rms = math.sqrt(sum(x * x for x in ventana) / ancho)
+            if rms >= self.umbral:
+                self.hubo_voz = True
+                self.silencio = 0
+            elif self.hubo_voz:
+                self.silencio += 1
+        self._resto = muestras[completas:]
+        return self.hubo_voz and self.silencio >= self.ventanas_cola
+
+
+class ConexionInteraccion:
+    """Estado de una conexión WebSocket de interacción."""
+
+    def __init__(self, scope, receive, send):
+        self.scope = scope
+        self.receive = receive
+        self.send = send
+        self.sesion = None
+        self.texto_esperado = ''
+        self.frecuencia = 16000
+        self.motor = None
+        self.reconocedor = None
+        self.detector = None
+        self.pcm = bytearray()
+        self._byte_pendiente = b''
+        self.parcial = ''
+
+    async def enviar(self, tipo, **datos):
+        await self.send({
+            'type': 'websocket.send',
+            'text': json.dumps({'tipo': tipo, **datos}, cls=DjangoJSONEncoder),
+        })
+
+    async def cerrar(self, codigo=CIERRE_NORMAL):
+        await self.send({'type': 'websocket.close', 'code': codigo})
+
+    def _autenticar(self, token):
+        if not token or not isinstance(token, str):
+            return None
+        autenticacion = AutenticacionJWT()
+        try:
+            return autenticacion.get_user(autenticacion.get_validated_token(token))
+        except (InvalidToken, TokenError):
+            return None
+
+    def _iniciar(self, usuario, sesion_id, texto_esperado, frecuencia):
+        self.sesion = SesionPractica.objects.filter(
+            pk=sesion_id,
+            estudiante__usuario=usuario,
+            estado__in=[EstadoSesion.INICIADA, EstadoSesion.EN_PROGRESO],
+        ).first()
+        if self.sesion is None:
+            return False
+        catalogo.adjuntar_agente(self.sesion)
+        self.texto_esperado = texto_esperado
+        self.frecuencia = frecuencia
+        self.motor = MotorPipeline.desde_configuracion()
+        self.reconocedor = self.motor.etapa('asr').reconocedor(self.frecuencia)
+        self.detector = DetectorFinVoz(self.frecuencia)
+        return True
+
+    def _aceptar(self, pcm):
+        """Entrega un bloque al reconocedor; devuelve ``(parcial, fin_de_voz)``."""
+        pcm = self._byte_pendiente + pcm
+        if len(pcm) % 2:
+            pcm, self._byte_pendiente = pcm[:-1], pcm[-1:]
+        else:
+            self._byte_pendiente = b''
+        self.pcm += pcm
+        return self.reconocedor.aceptar(pcm), self.detector.procesar(pcm)
+
+    def _evaluar(self, texto):
+        resultado = evaluar_interaccion(
+            self.motor, self.sesion, texto, self.texto_esperado, pcm_a_wav(bytes(self.pcm), self.frecuencia)
+        )
+        guardar_interacciones(self.sesion, [resultado])
+        return resultado.como_respuesta()
+
+    def _liberar(self):
+        if self.reconocedor is not None:
+            self.reconocedor.cerrar()
+        connections.close_all()
+
+    async def finalizar(self):
+        texto = await sync_to_async(self.reconocedor.finalizar)()
+        await self.enviar('final', texto=texto)
+        if not texto:
+            await self.enviar('error', error='No se reconoció voz en el audio')
+            return
+        await self.enviar('resultado', **await sync_to_async(self._evaluar)(texto))
+
+    async def atender(self):
+        mensaje = await self.receive()
+        if mensaje['type'] != 'websocket.connect':
+            return
+        await self.send({'type': 'websocket.accept'})
+
+        while True:
+            mensaje = await self.receive()
+            if mensaje['type'] == 'websocket.disconnect':
+                return
+            if mensaje.get('text') is not None:
+                try:
+                    datos = json.loads(mensaje['text'])
+                except ValueError:
+                    datos = {}
+                if not isinstance(datos, dict):
+                    datos = {}
+                if datos.get('tipo') == 'inicio' and self.sesion is None:
+                    usuario = await sync_to_async(self._autenticar)(datos.get('token'))
+                    if usuario is None:
+                        await self.enviar('error', error='Token inválido o ausente')
+                        await self.cerrar(CIERRE_NO_AUTORIZADO)
+                        return
+                    try:
+                        inicio = validar_inicio(datos)
+                    except InicioInvalido as exc:
+                        await self.enviar('error', error=str(exc))
+                        await self.cerrar(CIERRE_DATOS_INVALIDOS)
+                        return
+                    if not await sync_to_async(self._iniciar)(usuario, *inicio):
+                        await self.enviar('error', error='Sesión no encontrada o no activa')
+                        await self.cerrar(CIERRE_DATOS_INVALIDOS)
+                        return
+                elif datos.get('tipo') == 'fin' and self.sesion is not None:
+                    break
+                else:
+                    await self.enviar('error', error='Mensaje no válido')
+                    await self.cerrar(CIERRE_DATOS_INVALIDOS)
+                    return
+            elif mensaje.get('bytes') is not None:
+                if self.sesion is None:
+                    await self.enviar('error', error='Envía el mensaje de inicio antes del audio')
+                    await self.cerrar(CIERRE_DATOS_INVALIDOS)
+                    return
+                if len(self.pcm) + len(mensaje['bytes']) > settings.AUDIO_MAX_BYTES:
+                    await self.enviar('error', error='El audio excede el tamaño máximo permitido.')
+                    await self.cerrar(CIERRE_DEMASIADO_GRANDE)
+                    return
+                parcial, fin_de_voz = await sync_to_async(self._aceptar)(mensaje['bytes'])
+                if parcial != self.parcial:
+                    self.parcial = parcial
+                    await self.enviar('parcial', texto=parcial)
+                if fin_de_voz:
+                    break
+
+        try:
+            await self.finalizar()
+        except Exception:
+            logger.exception('Error finalizando la interacción por WebSocket')
+            await self.enviar('error', error='No se pudo procesar la interacción')
+        await self.cerrar()
+
+
+async def interaccion_websocket(scope, receive, send):
+    """Aplicación ASGI del WebSocket de interacción."""
+    conexion = ConexionInteraccion(scope, receive, send)
+    # Un hilo propio por conexión para el ORM y el reconocedor
+    async with ThreadSensitiveContext():
+        try:
+            await conexion.atender()
+        finally:
+            await sync_to_async(conexion._liberar)()
@@ -3,7 +3,7 @@ Admin para la app Users.
 """
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
-from .models import Usuario, Estudiante, Docente, Administrador, AsignacionDocenteEstudiante
+from .models import Usuario, Estudiante, Docente, Administrador, AsignacionDocenteEstudiante, TokenRevocado
 
 
 @admin.register(Usuario)
@@ -62,3 +62,11 @@ class AsignacionDocenteEstudianteAdmin(admin.ModelAdmin):
     list_display = ['docente', 'estudiante', 'fecha_asignacion', 'activo']
     list_filter = ['activo', 'fecha_asignacion']
     raw_id_fields = ['docente', 'estudiante']
+
+
+@admin.register(TokenRevocado)
+class TokenRevocadoAdmin(admin.ModelAdmin):
+    """Admin para los tokens JWT revocados."""
+    list_display = ['jti', 'fecha_revocacion', 'expira']
+    search_fields = ['jti']
+    ordering = ['-fecha_revocacion']
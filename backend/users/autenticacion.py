@@ -0,0 +1,109 @@
+"""
+Autenticación JWT sin consultar el usuario en cada petición.
+
+Los tokens llevan, además del ``user_id``, el ``tipo_usuario`` y el id del
+perfil (``estudiante_id``, ``docente_id`` o ``administrador_id``).
+``AutenticacionJWT`` arma con esos claims un ``Usuario`` con solo ``id`` y
+``tipo_usuario`` cargados y el perfil ya en caché, así que las vistas
+habituales (revisar el tipo, filtrar por ``perfil_estudiante``) no consultan
+la base. El primer acceso a otro campo (nombre, email, contraseña...) carga la
+fila completa en una consulta (ver ``CargaDiferidaMixin``).
+
+Los claims se fijan al iniciar sesión y se vuelven a leer de la base al
+renovar (``TokenRefrescoSerializer``): un cambio de tipo de usuario o de
+perfil se refleja en la siguiente renovación, a más tardar cuando vence el
+access token.
+Los tokens emitidos antes de estos claims se siguen aceptando con la consulta
+del usuario de siempre. Los tokens revocados (logout) y los de usuarios
+desactivados se rechazan sin consultar la base; ver ``revocacion.py``.
+"""
+from django.db import router
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from .models import Administrador, Docente, Estudiante, TipoUsuario, Usuario
+from .revocacion import esta_revocado, usuario_desactivado
+
+CLAIM_TIPO = 'tipo_usuario'
+
+# tipo de usuario -> (accesor del perfil en Usuario, claim con su id, modelo)
+PERFILES = {
+    TipoUsuario.ESTUDIANTE: ('perfil_estudiante', 'estudiante_id', Estudiante),
+    TipoUsuario.DOCENTE: ('perfil_docente', 'docente_id', Docente),
+    TipoUsuario.ADMINISTRADOR: ('perfil_administrador', 'administrador_id', Administrador),
+}
+
+
+def claims_usuario(usuario):
+    """Claims de tipo y perfil de ``usuario`` (el perfil es ``None`` si no tiene)."""
+    claims = {CLAIM_TIPO: usuario.tipo_usuario}
+    if usuario.tipo_usuario in PERFILES:
+        accesor, claim, modelo = PERFILES[usuario.tipo_usuario]
+        try:
+            claims[claim] = getattr(usuario, accesor).pk
+        except modelo.DoesNotExist:
+            claims[claim] = None
+    return claims
+
+
+class TokenRefresco(RefreshToken):
+    """Refresh token con los claims de ``claims_usuario``; su access token los hereda."""
+
+    @classmethod
+    def for_user(cls, user):
+        token = super().for_user(user)
+        for claim, valor in claims_usuario(user).items():
+            token[claim] = valor
+        return token
+
+
+def _instancia_diferida(modelo, valores):
+    """Instancia de ``modelo`` con solo ``valores`` cargados y el resto diferido."""
+    campos = [campo.attname for campo in modelo._meta.concrete_fields if campo.attname in valores]
+    return modelo.from_db(router.db_for_read(modelo), campos, [valores[campo] for campo in campos])
+
+
+def usuario_desde_token(token):
+    """``Usuario`` perezoso armado con los claims de ``token``."""
+    try:
+        usuario_id = int(token[api_settings.USER_ID_CLAIM])
+    except (KeyError, TypeError, ValueError):
+        raise InvalidToken(_('Token contained no recognizable user identification'))
+
+    tipo = token[CLAIM_TIPO]
+    usuario = _instancia_diferida(Usuario, {'id': usuario_id, 'tipo_usuario': tipo})
+    usuario._campos_token = {'tipo_usuario'}
+
+    if tipo in PERFILES:
+        accesor, claim, modelo = PERFILES[tipo]
+        relacion = Usuario._meta.get_field(accesor)
+        perfil_id = token.get(claim)
+        if perfil_id is None:
+            # Sin perfil: el accesor lanza DoesNotExist como con la consulta
+            relacion.set_cached_value(usuario, None)
+        else:
+            perfil = _instancia_diferida(modelo, {'id': perfil_id, 'usuario_id': usuario_id})
+            relacion.set_cached_value(usuario, perfil)
+            relacion.field.set_cached_value(perfil, usuario)
+    return usuario
+
+
+class AutenticacionJWT(JWTAuthentication):
+    """``JWTAuthentication`` que arma el usuario desde los claims, sin consultas."""
+
+    def get_validated_token(self, raw_token):
+        token = super().get_validated_token(raw_token)
+        if esta_revocado(token):
+            raise InvalidToken(_('El token fue revocado'))
+        return token
+
+    def get_user(self, validated_token):
+        if CLAIM_TIPO not in validated_token:
+            return super().get_user(validated_token)
+        usuario = usuario_desde_token(validated_token)
+        if usuario_desactivado(usuario.pk):
+            raise AuthenticationFailed(_('User is inactive'), code='user_inactive')
+        return usuario
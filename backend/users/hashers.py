@@ -0,0 +1,128 @@
+"""
+Hash de contraseñas en un pool acotado de hilos, con control de admisión.
+
+PBKDF2 tarda cientos de milisegundos por contraseña y se calcula al iniciar
+sesión, registrarse o cambiar la contraseña. ``PBKDF2PoolHasher`` (el mismo
+formato que el hasher de Django, así que los hashes existentes siguen
+valiendo) lo calcula en ``PASSWORD_HASH_HILOS`` hilos por worker:
+``hashlib.pbkdf2_hmac`` libera el GIL, así que corren en paralelo mientras
+los hilos de las peticiones esperan.
+
+Si el worker ya tiene ``PASSWORD_HASH_COLA_MAX`` hashes en curso o en espera,
+la petición se rechaza de inmediato con 503 y ``Retry-After`` en vez de
+encolarse: una ráfaga de logins (todo un curso entrando a la vez) no acapara
+los hilos del worker y el resto de la API sigue respondiendo. Cada rechazo
+recibe un turno distinto, separado por lo que tarda un hash, para que los
+reintentos lleguen al ritmo que el pool puede atender y no todos juntos.
+
+El pool no agrega throughput (cada hilo de petición espera su hash), sino
+que acota cuántos hilos de petición pueden quedar atados a hashes. El límite
+es por worker, así que solo actúa si el worker atiende varias peticiones a la
+vez (gunicorn con ``--threads``, ver el README), y ``PASSWORD_HASH_COLA_MAX``
+debe quedar por debajo de ``WORKER_HILOS``: si no, los logins ocupan todos
+los hilos antes de llenar la cola y el 503 nunca se produce.
+"""
+import math
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth.hashers import PBKDF2PasswordHasher
+from rest_framework import status
+from rest_framework.exceptions import APIException
+
+
+class ServicioSaturado(APIException):
+    """503 con ``Retry-After`` (DRF envía ``wait`` en esa cabecera)."""
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    default_detail = 'Demasiados inicios de sesión simultáneos. Intenta de nuevo en unos segundos.'
+    default_code = 'servicio_saturado'
+
+    def __init__(self, espera):
+        super().__init__()
+        self.wait = espera
+
+
+class PoolHash:
+    """Ejecuta funciones de hash en ``hilos`` hilos con a lo sumo ``cola_max`` pendientes."""
+
+    def __init__(self, hilos=None, cola_max=None):
+        self.cola_max = max(1, settings.PASSWORD_HASH_COLA_MAX if cola_max is None else cola_max)
+        # Más hilos que pendientes admitidos nunca se usarían
+        self.hilos = max(1, min(self.cola_max, settings.PASSWORD_HASH_HILOS if hilos is None else hilos))
+        self._executor = None
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._pendientes = 0
+        self._completados = 0
+        self._rechazados = 0
+        # Segundos de CPU de los últimos hashes: no crecen con la contención de la ráfaga
+        self._costos = deque(maxlen=20)
+        self._ultimo_turno = 0.0
+
+    def _rechazo(self):
+        """``ServicioSaturado`` con el siguiente turno libre para reintentar (llamar con el lock)."""
+        ahora = time.monotonic()
+        # Ritmo optimista del pool: un reintento que llega antes de tiempo cuesta otro 503,
+        # uno tardío deja el pool ocioso
+        intervalo = sum(self._costos) / len(self._costos) / self.hilos if self._costos else 0.0
+        # Tras vaciar la cola actual y los turnos ya dados a otros rechazos
+        self._ultimo_turno = max(self._ultimo_turno, ahora + self._pendientes * intervalo) + intervalo
+        self._rechazados += 1
+        return ServicioSaturado(max(1, math.ceil(self._ultimo_turno - ahora)))
+
+    def _medir(self, funcion, args):
+        self._local.en_pool = True
+        inicio = time.thread_time()
+        try:
+            return funcion(*args)
+        finally:
+            costo = time.thread_time() - inicio
+            with self._lock:
+                self._completados += 1
+                self._costos.append(costo)
+
+    def admitir(self):
+        """Rechaza de entrada, antes de cualquier trabajo, si la cola ya está llena."""
+        with self._lock:
+            if self._pendientes >= self.cola_max:
+                raise self._rechazo()
+
+    def ejecutar(self, funcion, *args):
+        """Ejecuta ``funcion(*args)`` en el pool; lanza ``ServicioSaturado`` si la cola está llena."""
+        if getattr(self._local, 'en_pool', False):
+            return funcion(*args)
+        with self._lock:
+            if self._pendientes >= self.cola_max:
+                raise self._rechazo()
+            self._pendientes += 1
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.hilos, thread_name_prefix='hash')
+        try:
+            return self._executor.submit(self._medir, funcion, args).result()
+        finally:
+            with self._lock:
+                self._pendientes -= 1
+
+    def estadisticas(self):
+        with self._lock:
+            return {
+                'hilos': self.hilos,
+                'cola_max': self.cola_max,
+                'pendientes': self._pendientes,
+                'completados': self._completados,
+                'rechazados': self._rechazados,
+                'costo_medio_ms': round(1000 * sum(self._costos) / len(self._costos), 1) if self._costos else 0,
+            }
+
+
+pool = PoolHash()
+
+
+class PBKDF2PoolHasher(PBKDF2PasswordHasher):
+    """``PBKDF2PasswordHasher`` (mismo algoritmo e iteraciones) calculado en ``pool``."""
+
+    def encode(self, password, salt, iterations=None):
+        return pool.ejecutar(super().encode, password, salt, iterations)
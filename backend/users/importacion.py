@@ -0,0 +1,208 @@
+"""
+Importación masiva de estudiantes desde un CSV (la nómina de un colegio).
+
+Columnas obligatorias: ``email``, ``username``, ``nombre``, ``apellido`` y
+``password``. Opcionales: ``nivel_ingles``, ``objetivos`` y ``docente`` (email
+del docente al que se asigna el estudiante; si falta, se usa el docente de la
+importación, si lo hay).
+
+El archivo se lee por lotes de ``IMPORTACION_LOTE`` filas, sin cargarlo
+entero. Cada lote se valida (campos, duplicados en el archivo y en la base),
+sus contraseñas se hashean en paralelo en todos los núcleos
+(``hashlib.pbkdf2_hmac`` libera el GIL) y ``Usuario``, ``Estudiante`` y
+``AsignacionDocenteEstudiante`` se crean con ``bulk_create`` en una
+transacción. Las filas con errores se informan y se omiten; el resto se
+importa igual.
+
+Cada contraseña pasa por los validadores de ``AUTH_PASSWORD_VALIDATORS``,
+igual que en el registro. Se hashean con ``IMPORTACION_HASH_ITERACIONES``
+iteraciones de PBKDF2, menos que las de Django: con las de Django, hashear
+miles de contraseñas lleva horas de CPU. En el primer login, Django nota que
+las iteraciones no coinciden y vuelve a guardar el hash con las de siempre.
+Hasta entonces ese hash es más débil: si la base se filtra, las contraseñas
+de las cuentas que nunca iniciaron sesión se prueban más rápido.
+"""
+import csv
+import os
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+
+from django.conf import settings
+from django.contrib.auth.hashers import PBKDF2PasswordHasher, make_password
+from django.contrib.auth.password_validation import validate_password
+from django.core.exceptions import ValidationError
+from django.core.validators import validate_email
+from django.db import IntegrityError, transaction
+
+from .models import AsignacionDocenteEstudiante, Docente, Estudiante, NivelIngles, Usuario
+
+COLUMNAS_OBLIGATORIAS = ('email', 'username', 'nombre', 'apellido', 'password')
+
+
+class ErrorImportacion(Exception):
+    """El archivo no se puede importar (por ejemplo, le faltan columnas)."""
+
+
+class ImportacionEstudiantes:
+    """
+    Importa un CSV de estudiantes. ``docente`` (opcional) es el docente al que
+    se asignan las filas sin columna ``docente``.
+    """
+
+    def __init__(self, docente=None, lote=None, iteraciones=None, hilos=None):
+        self.docente = docente
+        self.lote = max(1, lote or settings.IMPORTACION_LOTE)
+        self.hilos = max(1, hilos or os.cpu_count() or 1)
+        self.hasher = PBKDF2PasswordHasher()
+        self.hasher.iterations = iteraciones or settings.IMPORTACION_HASH_ITERACIONES
+        self._emails = set()
+        self._usernames = set()
+        self._docentes = {}
+        self.resumen = {'filas': 0, 'creados': 0, 'asignados': 0, 'errores': []}
+
+    def ejecutar(self, texto):
+        """Importa el CSV de ``texto`` (un archivo de texto o iterable de líneas) y devuelve el resumen."""
+        lector = csv.DictReader(texto)
+        try:
+            columnas = {(columna or '').strip() for columna in lector.fieldnames or ()}
+        except (csv.Error, UnicodeDecodeError) as exc:
+            raise ErrorImportacion(f'No se pudo leer el encabezado del CSV: {exc}')
+        faltantes = [columna for columna in COLUMNAS_OBLIGATORIAS if columna not in columnas]
+        if faltantes:
+            raise ErrorImportacion(f'Faltan columnas en el CSV: {", ".join(faltantes)}')
+
+        filas = enumerate(lector, start=2)
+        with ThreadPoolExecutor(max_workers=self.hilos, thread_name_prefix='importacion') as executor:
+            while True:
+                try:
+                    lote = list(islice(filas, self.lote))
+                except (csv.Error, UnicodeDecodeError) as exc:
+                    # No se puede seguir leyendo con seguridad; lo ya importado queda
+                    self._error(lector.line_num, '', f'No se pudo leer el archivo desde aquí: {exc}')
+                    break
+                if not lote:
+                    break
+                self._importar_lote(lote, executor)
+        self.resumen['errores'].sort(key=lambda error: error['fila'])
+        return self.resumen
+
+    def _error(self, fila, email, *mensajes):
+        self.resumen['errores'].append({'fila': fila, 'email': email, 'errores': list(mensajes)})
+
+    def _validar(self, numero, datos):
+        """Fila normalizada, o ``None`` si tiene errores (que quedan en el resumen)."""
+        fila = {(clave or '').strip(): (valor or '').strip() for clave, valor in datos.items() if clave}
+        errores = [f'Falta {columna}' for columna in COLUMNAS_OBLIGATORIAS if not fila.get(columna)]
+
+        if fila.get('email'):
+            try:
+                validate_email(fila['email'])
+                fila['email'] = Usuario.objects.normalize_email(fila['email'])
+            except ValidationError:
+                errores.append('Email inválido')
+        for columna in ('username', 'nombre', 'apellido'):
+            maximo = Usuario._meta.get_field(columna).max_length
+            if len(fila.get(columna, '')) > maximo:
+                errores.append(f'{columna} supera {maximo} caracteres')
+        if fila.get('password'):
+            # Los mismos validadores que el registro (parecido al email/username incluido)
+            usuario = Usuario(**{
+                columna: fila.get(columna, '') for columna in ('email', 'username', 'nombre', 'apellido')
+            })
+            try:
+                validate_password(fila['password'], usuario)
+            except ValidationError as exc:
+                errores.extend(exc.messages)
+        fila['nivel_ingles'] = fila.get('nivel_ingles') or NivelIngles.A1
+        if fila['nivel_ingles'] not in NivelIngles.values:
+            errores.append(f'Nivel de inglés inválido: {fila["nivel_ingles"]}')
+
+        if not errores:
+            if fila['email'] in self._emails:
+                errores.append('Email repetido en el archivo')
+            if fila['username'] in self._usernames:
+                errores.append('Username repetido en el archivo')
+        if errores:
+            self._error(numero, fila.get('email', ''), *errores)
+            return None
+        self._emails.add(fila['email'])
+        self._usernames.add(fila['username'])
+        return fila
+
+    def _cargar_docentes(self, emails):
+        """Completa la caché email -> id de docente con los ``emails`` que falten."""
+        nuevos = set(emails) - self._docentes.keys()
+        if nuevos:
+            self._docentes.update(dict.fromkeys(nuevos))
+            self._docentes.update(
+                Docente.objects.filter(usuario__email__in=nuevos).values_list('usuario__email', 'id')
+            )
+
+    def _importar_lote(self, lote, executor):
+        self.resumen['filas'] += len(lote)
+        validas = [(numero, fila) for numero, fila in ((n, self._validar(n, datos)) for n, datos in lote) if fila]
+        if not validas:
+            return
+
+        # Duplicados contra la base, dos consultas por lote
+        emails = {fila['email'] for _, fila in validas}
+        usernames = {fila['username'] for _, fila in validas}
+        emails_existentes = set(Usuario.objects.filter(email__in=emails).values_list('email', flat=True))
+        usernames_existentes = set(Usuario.objects.filter(username__in=usernames).values_list('username', flat=True))
+        self._cargar_docentes(fila['docente'] for _, fila in validas if fila.get('docente'))
+
+        filas = []
+        for numero, fila in validas:
+            errores = []
+            if fila['email'] in emails_existentes:
+                errores.append('Ya existe un usuario con ese email')
+            if fila['username'] in usernames_existentes:
+                errores.append('Ya existe un usuario con ese username')
+            if fila.get('docente'):
+                fila['docente_id'] = self._docentes[fila['docente']]
+                if fila['docente_id'] is None:
+                    errores.append(f'No existe el docente {fila["docente"]}')
+            else:
+                fila['docente_id'] = self.docente.id if self.docente else None
+            if errores:
+                self._error(numero, fila['email'], *errores)
+            else:
+                filas.append((numero, fila))
+        if not filas:
+            return
+
+        hashes = executor.map(lambda fila: make_password(fila['password'], hasher=self.hasher), [f for _, f in filas])
+        for (_, fila), password in zip(filas, hashes):
+            fila['password'] = password
+
+        try:
+            with transaction.atomic():
+                self._crear([fila for _, fila in filas])
+        except IntegrityError:
+            # Otro proceso creó alguno de estos usuarios entre la validación y el
+            # insert: fila por fila para aislar las que chocan
+            for numero, fila in filas:
+                try:
+                    with transaction.atomic():
+                        self._crear([fila])
+                except IntegrityError:
+                    self._error(numero, fila['email'], 'Ya existe un usuario con ese email o username')
+
+    def _crear(self, filas):
+        usuarios = Usuario.objects.bulk_create([
+            Usuario(
+                email=fila['email'], username=fila['username'], nombre=fila['nombre'],
+                apellido=fila['apellido'], password=fila['password'],
+            )
+            for fila in filas
+        ])
+        estudiantes = Estudiante.objects.bulk_create([
+            Estudiante(usuario=usuario, nivel_ingles=fila['nivel_ingles'], objetivos=fila.get('objetivos', ''))
+            for usuario, fila in zip(usuarios, filas)
+        ])
+        asignaciones = AsignacionDocenteEstudiante.objects.bulk_create([
+            AsignacionDocenteEstudiante(docente_id=fila['docente_id'], estudiante=estudiante)
+            for estudiante, fila in zip(estudiantes, filas) if fila['docente_id']
+        ])
+        self.resumen['creados'] += len(usuarios)
+        self.resumen['asignados'] += len(asignaciones)
@@ -0,0 +1,191 @@
+"""
+Benchmark de una ráfaga de inicios de sesión (todo un curso entrando a la vez).
+
+Los ``--peticiones`` usuarios llegan a la vez y los atienden ``--concurrencia``
+hilos (los hilos de un worker); un usuario que recibe 503 vuelve a intentar
+pasado el ``Retry-After``. En paralelo, un cliente consulta
+``/api/auth/perfil/`` cada ``--api-intervalo-ms``, como el resto del tráfico
+de la API.
+Compara el hash en el hilo de la petición con el pool acotado de
+``users/hashers.py``: logins por segundo, tiempo hasta entrar (p50/p99,
+contado desde el inicio de la ráfaga), intentos rechazados y latencia del
+resto del tráfico.
+
+Uso:
+    python manage.py benchmark_login --peticiones 500 --concurrencia 64
+    python manage.py benchmark_login --iteraciones 100000
+"""
+import heapq
+import logging
+import math
+import statistics
+import threading
+import time
+
+from django.contrib.auth.hashers import PBKDF2PasswordHasher
+from django.core.management.base import BaseCommand
+from django.db import connections
+from django.test import Client
+
+from users import hashers
+from users.autenticacion import TokenRefresco
+from users.models import Estudiante, Usuario
+
+EMAIL = 'benchmark.login@example.com'
+PASSWORD = 'benchmark-login-123'
+
+
+class SinPool:
+    """Hash en el hilo de la petición, sin límite (el comportamiento de Django)."""
+
+    def admitir(self):
+        pass
+
+    def ejecutar(self, funcion, *args):
+        return funcion(*args)
+
+
+def percentil(valores, fraccion):
+    return valores[math.ceil(len(valores) * fraccion) - 1] if valores else 0.0
+
+
+class Command(BaseCommand):
+    help = 'Mide el rendimiento del login bajo una ráfaga, con y sin el pool de hash.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--peticiones', type=int, default=500, help='Logins de la ráfaga.')
+        parser.add_argument('--concurrencia', type=int, default=64, help='Hilos que envían los logins.')
+        parser.add_argument(
+            '--iteraciones', type=int, default=PBKDF2PasswordHasher.iterations,
+            help='Iteraciones de PBKDF2 (por defecto, las de Django).'
+        )
+        parser.add_argument('--api-intervalo-ms', type=int, default=50, help='Pausa del cliente del resto de la API.')
+        parser.add_argument('--hilos', type=int, default=None, help='Hilos del pool (PASSWORD_HASH_HILOS).')
+        parser.add_argument('--cola-max', type=int, default=None, help='Cola del pool (PASSWORD_HASH_COLA_MAX).')
+
+    def _rafaga(self, peticiones, concurrencia, token, intervalo):
+        # Intentos pendientes: (no antes de, usuario); todos llegan al inicio
+        pendientes = [(0.0, usuario) for usuario in range(peticiones)]
+        restantes = [peticiones]
+        tiempos = []
+        rechazos = []
+        errores = []
+        otras = []
+        lock = threading.Lock()
+        terminado = threading.Event()
+        inicio = time.perf_counter()
+
+        def siguiente():
+            while True:
+                with lock:
+                    if not restantes[0]:
+                        return None
+                    if pendientes and pendientes[0][0] <= time.perf_counter() - inicio:
+                        return heapq.heappop(pendientes)[1]
+                time.sleep(0.01)
+
+        def login():
+            cliente = Client()
+            try:
+                while (usuario := siguiente()) is not None:
+                    intento = time.perf_counter()
+                    respuesta = cliente.post(
+                        '/api/auth/login/', {'email': EMAIL, 'password': PASSWORD},
+                        content_type='application/json'
+                    )
+                    ahora = time.perf_counter()
+                    with lock:
+                        if respuesta.status_code == 503:
+                            rechazos.append((ahora - intento) * 1000)
+                            reintento = ahora - inicio + int(respuesta['Retry-After'])
+                            heapq.heappush(pendientes, (reintento, usuario))
+                            continue
+                        if respuesta.status_code == 200:
+                            tiempos.append((ahora - inicio) * 1000)
+                        else:
+                            errores.append(respuesta.status_code)
+                        restantes[0] -= 1
+            finally:
+                connections.close_all()
+
+        def resto_api():
+            cliente = Client(HTTP_AUTHORIZATION=f'Bearer {token}')
+            try:
+                while not terminado.wait(intervalo):
+                    antes = time.perf_counter()
+                    cliente.get('/api/auth/perfil/')
+                    otras.append((time.perf_counter() - antes) * 1000)
+            finally:
+                connections.close_all()
+
+        fondo = threading.Thread(target=resto_api)
+        hilos = [threading.Thread(target=login) for _ in range(concurrencia)]
+        fondo.start()
+        for hilo in hilos:
+            hilo.start()
+        for hilo in hilos:
+            hilo.join()
+        duracion = time.perf_counter() - inicio
+        terminado.set()
+        fondo.join()
+
+        tiempos.sort()
+        rechazos.sort()
+        otras.sort()
+        return {
+            'duracion': duracion,
+            'ok/s': len(tiempos) / duracion,
+            '503': len(rechazos),
+            '503 p99': percentil(rechazos, 0.99),
+            'errores': errores,
+            'p50': statistics.median(tiempos) if tiempos else 0.0,
+            'p99': percentil(tiempos, 0.99),
+            'api p50': statistics.median(otras) if otras else 0.0,
+            'api p99': percentil(otras, 0.99),
+        }
+
+    def handle(self, *args, **options):
+        iteraciones_originales = hashers.PBKDF2PoolHasher.iterations
+        pool_original = hashers.pool
+        hashers.PBKDF2PoolHasher.iterations = options['iteraciones']
+        # Sin un error en el log por cada 503 de la ráfaga
+        logger_peticiones = logging.getLogger('django.request')
+        nivel_original = logger_peticiones.level
+        logger_peticiones.setLevel(logging.CRITICAL)
+        try:
+            Usuario.objects.filter(email=EMAIL).delete()
+            usuario = Usuario.objects.create_user(
+                email=EMAIL, username='benchmark_login', password=PASSWORD, nombre='Benchmark', apellido='Login'
+            )
+            Estudiante.objects.create(usuario=usuario)
+            token = str(TokenRefresco.for_user(usuario).access_token)
+
+            self.stdout.write(
+                f"{options['peticiones']} logins desde {options['concurrencia']} hilos, "
+                f"PBKDF2 con {options['iteraciones']} iteraciones"
+            )
+            self.stdout.write(
+                f"{'modo':<10}{'s':>7}{'ok/s':>8}{'p50 ms':>9}{'p99 ms':>9}{'503':>6}"
+                f"{'503 p99':>9}{'api p50':>9}{'api p99':>9}"
+            )
+            for modo, pool in (
+                ('sin pool', SinPool()),
+                ('pool', hashers.PoolHash(options['hilos'], options['cola_max'])),
+            ):
+                hashers.pool = pool
+                r = self._rafaga(
+                    options['peticiones'], options['concurrencia'], token, options['api_intervalo_ms'] / 1000
+                )
+                self.stdout.write(
+                    f"{modo:<10}{r['duracion']:>7.1f}{r['ok/s']:>8.1f}{r['p50']:>9.0f}{r['p99']:>9.0f}"
+                    f"{r['503']:>6}{r['503 p99']:>9.0f}{r['api p50']:>9.0f}{r['api p99']:>9.0f}"
+                )
+                if r['errores']:
+                    self.stdout.write(self.style.WARNING(f"Respuestas con otro código: {r['errores']}"))
+                if isinstance(pool, hashers.PoolHash):
+                    self.stdout.write(f'pool: {pool.estadisticas()}')
+        finally:
+            hashers.pool = pool_original
+            logger_peticiones.setLevel(nivel_original)
+            hashers.PBKDF2PoolHasher.iterations = iteraciones_originales
+            Usuario.objects.filter(email=EMAIL).delete()
@@ -0,0 +1,59 @@
+"""
+Importa estudiantes desde un CSV (ver ``users/importacion.py`` para las columnas).
+
+Uso:
+    python manage.py importar_estudiantes nomina.csv
+    python manage.py importar_estudiantes nomina.csv --docente profe@colegio.edu --lote 2000
+"""
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from users.importacion import ErrorImportacion, ImportacionEstudiantes
+from users.models import Docente
+
+
+class Command(BaseCommand):
+    help = 'Crea estudiantes en bloque desde un CSV e informa los errores por fila.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('archivo', help='Ruta del CSV (UTF-8).')
+        parser.add_argument('--docente', help='Email del docente al que se asignan las filas sin docente.')
+        parser.add_argument('--lote', type=int, default=None, help='Filas por lote (IMPORTACION_LOTE).')
+        parser.add_argument(
+            '--iteraciones', type=int, default=None,
+            help='Iteraciones PBKDF2 de las contraseñas iniciales (IMPORTACION_HASH_ITERACIONES).'
+        )
+        parser.add_argument('--hilos', type=int, default=None, help='Hilos de hash (por defecto, uno por núcleo).')
+        parser.add_argument('--mostrar-errores', type=int, default=50, help='Errores a listar (0: ninguno).')
+
+    def handle(self, *args, **options):
+        docente = None
+        if options['docente']:
+            try:
+                docente = Docente.objects.get(usuario__email=options['docente'])
+            except Docente.DoesNotExist:
+                raise CommandError(f"No existe el docente {options['docente']}")
+
+        importacion = ImportacionEstudiantes(
+            docente=docente, lote=options['lote'], iteraciones=options['iteraciones'], hilos=options['hilos']
+        )
+        inicio = time.perf_counter()
+        try:
+            with open(options['archivo'], encoding='utf-8-sig', newline='') as texto:
+                resumen = importacion.ejecutar(texto)
+        except OSError as exc:
+            raise CommandError(f'No se pudo abrir el archivo: {exc}')
+        except ErrorImportacion as exc:
+            raise CommandError(str(exc))
+        duracion = time.perf_counter() - inicio
+
+        for error in resumen['errores'][:options['mostrar_errores']]:
+            self.stdout.write(f"Fila {error['fila']} ({error['email']}): {'; '.join(error['errores'])}")
+        if len(resumen['errores']) > options['mostrar_errores']:
+            self.stdout.write(f"... y {len(resumen['errores']) - options['mostrar_errores']} filas más con errores")
+        self.stdout.write(self.style.SUCCESS(
+            f"{resumen['creados']} de {resumen['filas']} estudiantes creados, {resumen['asignados']} asignados "
+            f"a un docente, {len(resumen['errores'])} filas con errores ({duracion:.1f} s, "
+            f"{resumen['filas'] / duracion:.0f} filas/s)"
+        ))
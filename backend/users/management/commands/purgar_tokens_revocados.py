@@ -0,0 +1,17 @@
+"""
+Borra los tokens revocados que ya expiraron (ya no son válidos de todas formas).
+
+Uso (por ejemplo, una vez al día desde cron):
+    python manage.py purgar_tokens_revocados
+"""
+from django.core.management.base import BaseCommand
+
+from users.revocacion import purgar_expirados
+
+
+class Command(BaseCommand):
+    help = 'Elimina de TokenRevocado los JTI de tokens expirados.'
+
+    def handle(self, *args, **options):
+        borrados = purgar_expirados()
+        self.stdout.write(self.style.SUCCESS(f'Tokens revocados expirados eliminados: {borrados}'))
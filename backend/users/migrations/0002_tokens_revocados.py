@@ -0,0 +1,26 @@
+# Generated by Django 6.0 on 2026-10-18 10:43
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TokenRevocado',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('jti', models.CharField(max_length=64, unique=True, verbose_name='JTI')),
+                ('expira', models.DateTimeField(db_index=True, verbose_name='Expira')),
+                ('fecha_revocacion', models.DateTimeField(auto_now_add=True, db_index=True, verbose_name='Fecha de Revocación')),
+            ],
+            options={
+                'verbose_name': 'Token Revocado',
+                'verbose_name_plural': 'Tokens Revocados',
+            },
+        ),
+    ]
@@ -28,9 +28,50 @@ class NivelIngles(models.TextChoices):
     C2 = 'C2', 'C2 - Maestría'
 
 
+class CargaDiferidaMixin:
+    """
+    Carga de campos diferidos en bloque para ``Usuario`` y los perfiles.
+
+    El usuario que arma la autenticación JWT (``users/autenticacion.py``) solo
+    trae los campos de los claims del token. El primer acceso a cualquier otro
+    campo carga todos los diferidos en una consulta, en vez de una por campo.
+    Los campos tomados del token (``_campos_token``) se releen de la base en
+    esa misma carga y no se escriben al guardar mientras no se hayan leído.
+    """
+    
+    def refresh_from_db(self, using=None, fields=None, from_queryset=None):
+        if fields is not None:
+            diferidos = self.get_deferred_fields()
+            if diferidos.intersection(fields):
+                fields = diferidos.union(fields, self.__dict__.pop('_campos_token', ()))
+        super().refresh_from_db(using=using, fields=fields, from_queryset=from_queryset)
+    
+    def save(self, *args, **kwargs):
+        campos_token = self.__dict__.get('_campos_token')
+        if campos_token and kwargs.get('update_fields') is None:
+            diferidos = self.get_deferred_fields()
+            kwargs['update_fields'] = [
+                campo.attname for campo in self._meta.concrete_fields
+                if not campo.primary_key and campo.attname not in diferidos and campo.attname not in campos_token
+            ]
+        super().save(*args, **kwargs)
+
+
+# Accesores de los perfiles en Usuario (uno por tipo de usuario)
+RELACIONES_PERFIL = ('perfil_estudiante', 'perfil_docente', 'perfil_administrador')
+
+
 class UsuarioManager(BaseUserManager):
     """Manager personalizado para el modelo Usuario."""
     
+    def con_perfil(self):
+        """Usuarios con su perfil en la misma consulta (un JOIN por tipo)."""
+        return self.select_related(*RELACIONES_PERFIL)
+    
+    def get_by_natural_key(self, username):
+        """Usado por ``authenticate``: el login obtiene usuario y perfil en una consulta."""
+        return self.con_perfil().get(**{self.model.USERNAME_FIELD: username})
+    
     def create_user(self, email, username, password=None, **extra_fields):
         """Crear y guardar un usuario regular."""
         if not email:
@@ -60,7 +101,7 @@ class UsuarioManager(BaseUserManager):
         return self.create_user(email, username, password, **extra_fields)
 
 
-class Usuario(AbstractBaseUser, PermissionsMixin):
+class Usuario(CargaDiferidaMixin, AbstractBaseUser, PermissionsMixin):
     """
     Modelo base de Usuario personalizado.
     Soporta login con email y diferentes tipos de usuario.
@@ -106,7 +147,7 @@ class Usuario(AbstractBaseUser, PermissionsMixin):
         return self.nombre
 
 
-class Estudiante(models.Model):
+class Estudiante(CargaDiferidaMixin, models.Model):
     """
     Modelo de Estudiante.
     Hereda de Usuario y gestiona nivel de inglés, objetivos y métricas.
@@ -149,7 +190,7 @@ class Estudiante(models.Model):
         return f"Estudiante: {self.usuario.get_full_name()} - Nivel {self.nivel_ingles}"
 
 
-class Docente(models.Model):
+class Docente(CargaDiferidaMixin, models.Model):
     """
     Modelo de Docente.
     Supervisa reportes y retroalimentación de estudiantes.
@@ -184,7 +225,7 @@ class Docente(models.Model):
         return f"Docente: {self.usuario.get_full_name()}"
 
 
-class Administrador(models.Model):
+class Administrador(CargaDiferidaMixin, models.Model):
     """
     Modelo de Administrador.
     Gestiona el sistema completo.
@@ -240,7 +281,30 @@ class AsignacionDocenteEstudiante(models.Model):
     class Meta:
         verbose_name = 'Asignación Docente-Estudiante'
         verbose_name_plural = 'Asignaciones Docente-Estudiante'
+        # El índice único (docente, estudiante) sirve también a los estudiantes de un docente
         unique_together = ['docente', 'estudiante']
     
     def __str__(self):
         return f"{self.docente.usuario.get_full_name()} -> {self.estudiante.usuario.get_full_name()}"
+
+
+class TokenRevocado(models.Model):
+    """
+    JTI de un token JWT revocado (logout o rotación del refresh token).
+    Se guarda hasta que el token expira; después se purga
+    (``manage.py purgar_tokens_revocados``).
+    """
+    jti = models.CharField(max_length=64, unique=True, verbose_name='JTI')
+    expira = models.DateTimeField(db_index=True, verbose_name='Expira')
+    fecha_revocacion = models.DateTimeField(
+        auto_now_add=True,
+        db_index=True,
+        verbose_name='Fecha de Revocación'
+    )
+    
+    class Meta:
+        verbose_name = 'Token Revocado'
+        verbose_name_plural = 'Tokens Revocados'
+    
+    def __str__(self):
+        return self.jti
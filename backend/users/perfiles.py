@@ -0,0 +1,45 @@
+"""
+Resolución del perfil (estudiante, docente o administrador) de un usuario.
+
+``usuario_con_perfil`` trae el usuario autenticado y su perfil en una sola
+consulta con JOIN y lo guarda en la petición, así que las vistas que
+necesitan ambos no repiten consultas por tipo de usuario.
+"""
+from .autenticacion import PERFILES
+from .models import Usuario
+
+
+def perfil_de(usuario):
+    """Perfil de ``usuario`` según su tipo, o ``None`` si no tiene."""
+    if usuario.tipo_usuario not in PERFILES:
+        return None
+    accesor, _, modelo = PERFILES[usuario.tipo_usuario]
+    try:
+        return getattr(usuario, accesor)
+    except modelo.DoesNotExist:
+        return None
+
+
+def usuario_con_perfil(request):
+    """``request.user`` completo y con su perfil cargado; una consulta por petición."""
+    usuario = getattr(request, '_usuario_con_perfil', None)
+    if usuario is None:
+        usuario = Usuario.objects.con_perfil().get(pk=request.user.pk)
+        request._usuario_con_perfil = usuario
+    return usuario
+
+
+def guardar_cambios(instancia, valores):
+    """
+    Asigna ``valores`` a ``instancia`` y guarda solo los campos que cambiaron
+    (más los ``auto_now``). Devuelve los campos modificados.
+    """
+    cambios = [campo for campo, valor in valores.items() if getattr(instancia, campo) != valor]
+    if cambios:
+        for campo in cambios:
+            setattr(instancia, campo, valores[campo])
+        auto_now = [
+            campo.attname for campo in instancia._meta.concrete_fields if getattr(campo, 'auto_now', False)
+        ]
+        instancia.save(update_fields=cambios + auto_now)
+    return cambios
@@ -0,0 +1,186 @@
+"""
+Revocación de tokens JWT (logout y rotación del refresh token).
+
+Los JTI revocados se guardan en ``TokenRevocado`` hasta que el token expira.
+Cada worker mantiene un filtro de Bloom con los JTI vigentes: si el JTI no
+está en el filtro —el caso de casi todas las peticiones— el token no está
+revocado y no se consulta la base. Si está, se confirma con una consulta
+(puede ser un falso positivo).
+
+El filtro se completa cada ``REVOCACION_REFRESCO_S`` con los JTI revocados
+desde la última lectura y se reconstruye cada ``REVOCACION_RECONSTRUCCION_S``
+para descartar los expirados. En el worker que revoca, el token deja de valer
+de inmediato; en los demás, a más tardar en ``REVOCACION_REFRESCO_S``.
+
+Los usuarios desactivados usan el mismo registro con la clave ``usuario:<id>``
+en lugar de un JTI, hasta que expiran los access tokens que ya tenían (el
+refresh token ya se rechaza: simplejwt consulta el usuario al renovar). Así
+``AutenticacionJWT`` rechaza a un usuario desactivado sin consultarlo en cada
+petición. La entrada se escribe al guardar el usuario (señal ``post_save``); un
+``QuerySet.update`` de ``is_active`` no pasa por la señal y debe llamar a
+``desactivar_usuario``.
+"""
+import hashlib
+import math
+import threading
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+from django.utils import timezone
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.utils import datetime_from_epoch
+
+from .models import TokenRevocado, Usuario
+
+TASA_FALSOS_POSITIVOS = 0.001
+
+# Las revocaciones se leen desde un poco antes de la última lectura: una fila
+# puede confirmarse con una fecha anterior a la de la consulta que la buscó
+MARGEN_LECTURA = timedelta(seconds=30)
+
+
+class FiltroBloom:
+    """Filtro de Bloom sobre un ``bytearray``; las posiciones salen de un solo blake2b."""
+
+    def __init__(self, capacidad, tasa=TASA_FALSOS_POSITIVOS):
+        capacidad = max(1, capacidad)
+        self.bits = max(64, math.ceil(-capacidad * math.log(tasa) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.bits / capacidad * math.log(2)))
+        self.tabla = bytearray((self.bits + 7) // 8)
+
+    def _posiciones(self, valor):
+        resumen = hashlib.blake2b(valor.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(resumen[:8], 'little')
+        h2 = int.from_bytes(resumen[8:], 'little') | 1
+        return [(h1 + i * h2) % self.bits for i in range(self.hashes)]
+
+    def agregar(self, valor):
+        for posicion in self._posiciones(valor):
+            self.tabla[posicion >> 3] |= 1 << (posicion & 7)
+
+    def __contains__(self, valor):
+        tabla = self.tabla
+        return all(tabla[posicion >> 3] & (1 << (posicion & 7)) for posicion in self._posiciones(valor))
+
+
+class RegistroRevocados:
+    """Filtro de Bloom del worker más su sincronización con ``TokenRevocado``."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._filtro = None
+        self._leido_hasta = None
+        self._refrescado = float('-inf')
+        self._reconstruido = float('-inf')
+
+    def _reconstruir(self):
+        ahora = timezone.now()
+        jtis = list(TokenRevocado.objects.filter(expira__gt=ahora).values_list('jti', flat=True))
+        filtro = FiltroBloom(max(settings.REVOCACION_BLOOM_CAPACIDAD, 2 * len(jtis)))
+        for jti in jtis:
+            filtro.agregar(jti)
+        self._filtro = filtro
+        self._leido_hasta = ahora
+        self._reconstruido = time.monotonic()
+
+    def _refrescar(self):
+        ahora = timezone.now()
+        nuevos = TokenRevocado.objects.filter(
+            fecha_revocacion__gte=self._leido_hasta - MARGEN_LECTURA,
+            expira__gt=ahora,
+        ).values_list('jti', flat=True)
+        for jti in nuevos:
+            self._filtro.agregar(jti)
+        self._leido_hasta = ahora
+
+    def _actualizar(self):
+        if time.monotonic() - self._refrescado < settings.REVOCACION_REFRESCO_S:
+            return
+        with self._lock:
+            reloj = time.monotonic()
+            if reloj - self._refrescado < settings.REVOCACION_REFRESCO_S:
+                return
+            if self._filtro is None or reloj - self._reconstruido >= settings.REVOCACION_RECONSTRUCCION_S:
+                self._reconstruir()
+            else:
+                self._refrescar()
+            self._refrescado = time.monotonic()
+
+    def esta_revocado(self, jti):
+        if not jti:
+            return False
+        self._actualizar()
+        if jti not in self._filtro:
+            return False
+        return TokenRevocado.objects.filter(jti=jti, expira__gt=timezone.now()).exists()
+
+    def revocar(self, jti, expira):
+        """Registra ``jti``; devuelve ``False`` si ya estaba revocado."""
+        try:
+            with transaction.atomic():
+                TokenRevocado.objects.create(jti=jti, expira=expira)
+        except IntegrityError:
+            return False
+        self._actualizar()
+        with self._lock:
+            self._filtro.agregar(jti)
+        return True
+
+    def purgar_expirados(self):
+        """Borra los JTI de tokens ya expirados; devuelve cuántos."""
+        borrados, _ = TokenRevocado.objects.filter(expira__lte=timezone.now()).delete()
+        return borrados
+
+
+_registro = RegistroRevocados()
+
+
+def esta_revocado(token):
+    """``True`` si el JTI de ``token`` fue revocado y el token aún no expira."""
+    return _registro.esta_revocado(token.get(api_settings.JTI_CLAIM))
+
+
+def revocar(token):
+    """Revoca ``token`` hasta su expiración; devuelve ``False`` si ya lo estaba."""
+    return _registro.revocar(token[api_settings.JTI_CLAIM], datetime_from_epoch(token['exp']))
+
+
+def purgar_expirados():
+    return _registro.purgar_expirados()
+
+
+def clave_usuario(usuario_id):
+    return f'usuario:{usuario_id}'
+
+
+def usuario_desactivado(usuario_id):
+    """``True`` si el usuario fue desactivado y aún puede tener access tokens vigentes."""
+    return _registro.esta_revocado(clave_usuario(usuario_id))
+
+
+def desactivar_usuario(usuario_id):
+    """Rechaza los access tokens de ``usuario_id`` emitidos hasta ahora."""
+    clave = clave_usuario(usuario_id)
+    expira = timezone.now() + api_settings.ACCESS_TOKEN_LIFETIME
+    if not _registro.revocar(clave, expira):
+        # Ya estaba: se extiende y se marca como nueva para que la lean los demás workers
+        TokenRevocado.objects.filter(jti=clave).update(expira=expira, fecha_revocacion=timezone.now())
+
+
+def reactivar_usuario(usuario_id):
+    TokenRevocado.objects.filter(jti=clave_usuario(usuario_id)).delete()
+
+
+@receiver(post_save, sender=Usuario)
+def _al_guardar_usuario(sender, instance, created, update_fields, **kwargs):
+    if update_fields is not None and 'is_active' not in update_fields:
+        # p. ej. last_login al iniciar sesión
+        return
+    if not instance.is_active:
+        desactivar_usuario(instance.pk)
+    elif not created:
+        reactivar_usuario(instance.pk)
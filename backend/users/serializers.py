@@ -2,8 +2,13 @@
 Serializers para la app Users.
 """
 from rest_framework import serializers
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.serializers import TokenRefreshSerializer
+from rest_framework_simplejwt.settings import api_settings
 from django.contrib.auth import authenticate
+from .autenticacion import CLAIM_TIPO, PERFILES, claims_usuario
 from .models import Usuario, Estudiante, Docente, Administrador, TipoUsuario, NivelIngles
+from .revocacion import esta_revocado, revocar
 
 
 class UsuarioSerializer(serializers.ModelSerializer):
@@ -186,3 +191,40 @@ class AdministradorSerializer(serializers.ModelSerializer):
     class Meta:
         model = Administrador
         fields = ['id', 'usuario', 'nivel_acceso', 'departamento']
+
+
+class TokenRefrescoSerializer(TokenRefreshSerializer):
+    """
+    Renovación del access token que rechaza refresh tokens revocados y, con
+    rotación, revoca el refresh token usado: solo sirve una vez. Los claims de
+    tipo y perfil se vuelven a leer de la base, así un cambio de tipo de
+    usuario llega a los tokens en la siguiente renovación.
+    """
+    
+    def validate(self, attrs):
+        refresh = self.token_class(attrs['refresh'])
+        if esta_revocado(refresh):
+            raise InvalidToken('El token fue revocado')
+        if api_settings.ROTATE_REFRESH_TOKENS and api_settings.BLACKLIST_AFTER_ROTATION:
+            # Revocar antes de emitir: de dos renovaciones simultáneas solo pasa una
+            if not revocar(refresh):
+                raise InvalidToken('El token fue revocado')
+        
+        usuario = Usuario.objects.select_related(
+            *(accesor for accesor, _, _ in PERFILES.values())
+        ).filter(pk=refresh.payload.get(api_settings.USER_ID_CLAIM)).first()
+        if usuario is None or not api_settings.USER_AUTHENTICATION_RULE(usuario):
+            raise AuthenticationFailed(self.error_messages['no_active_account'], 'no_active_account')
+        
+        for claim in (CLAIM_TIPO, *(claim for _, claim, _ in PERFILES.values())):
+            refresh.payload.pop(claim, None)
+        for claim, valor in claims_usuario(usuario).items():
+            refresh[claim] = valor
+        
+        data = {'access': str(refresh.access_token)}
+        if api_settings.ROTATE_REFRESH_TOKENS:
+            refresh.set_jti()
+            refresh.set_exp()
+            refresh.set_iat()
+            data['refresh'] = str(refresh)
+        return data
@@ -1,3 +1,357 @@
-from django.test import TestCase
+"""
+Tests de la app Users.
+"""
+import io
+import threading
+import time
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib.auth.hashers import PBKDF2PasswordHasher
+from django.db import connections
+from django.test import override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient, APIRequestFactory, APITestCase, APITransactionTestCase
+from rest_framework_simplejwt.tokens import AccessToken
+
+from . import hashers, revocacion
+from .autenticacion import AutenticacionJWT, TokenRefresco
+from .importacion import ImportacionEstudiantes
+from .models import Docente, Estudiante, TipoUsuario, TokenRevocado, Usuario
+from .revocacion import RegistroRevocados
+
+
+# Hasher rápido: los tests crean muchos usuarios
+HASHER_RAPIDO = override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+
+
+def crear_estudiante(indice=0):
+    usuario = Usuario.objects.create_user(
+        email=f'estudiante{indice}@avi.test',
+        username=f'estudiante{indice}',
+        password='clave-segura',
+        nombre='Estudiante',
+        apellido=f'{indice:04d}'
+    )
+    return Estudiante.objects.create(usuario=usuario)
+
+
+@HASHER_RAPIDO
+@override_settings(REVOCACION_REFRESCO_S=60)
+class AutenticacionJWTTest(APITestCase):
+    """El access token autentica sin consultas y deja de valer al desactivar al usuario."""
+
+    def setUp(self):
+        self.usuario = crear_estudiante().usuario
+        self.refresh = TokenRefresco.for_user(self.usuario)
+        self.access = str(self.refresh.access_token)
+        self.url = reverse('perfil')
+
+    def autenticar(self):
+        peticion = APIRequestFactory().get('/', HTTP_AUTHORIZATION=f'Bearer {self.access}')
+        return AutenticacionJWT().authenticate(peticion)
+
+    def test_autenticar_sin_consultas(self):
+        # La primera llamada del worker carga el filtro de revocados
+        self.autenticar()
+        with self.assertNumQueries(0):
+            usuario, _ = self.autenticar()
+            self.assertEqual(usuario.pk, self.usuario.pk)
+            self.assertEqual(usuario.perfil_estudiante.pk, self.usuario.perfil_estudiante.pk)
+
+    def test_usuario_desactivado_rechazado(self):
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {self.access}')
+        self.assertEqual(self.client.get(self.url).status_code, 200)
+
+        self.usuario.is_active = False
+        self.usuario.save()
+        respuesta = self.client.get(self.url)
+        self.assertEqual(respuesta.status_code, 401)
+        self.assertEqual(respuesta.data['code'], 'user_inactive')
+        respuesta = self.client.post(reverse('token_refresh'), {'refresh': str(self.refresh)})
+        self.assertEqual(respuesta.status_code, 401)
+
+        # Guardados que no tocan is_active (p. ej. last_login) no lo reactivan
+        Usuario.objects.get(pk=self.usuario.pk).save(update_fields=['nombre'])
+        self.assertEqual(self.client.get(self.url).status_code, 401)
+
+        self.usuario.is_active = True
+        self.usuario.save()
+        self.assertEqual(self.client.get(self.url).status_code, 200)
+
+
+@HASHER_RAPIDO
+class RevocacionTest(APITestCase):
+    """Logout y rotación revocan tokens; el filtro de Bloom no pierde revocaciones."""
+
+    def setUp(self):
+        self.usuario = crear_estudiante().usuario
+        self.refresh = TokenRefresco.for_user(self.usuario)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {self.refresh.access_token}')
+
+    def renovar(self, refresh):
+        return self.client.post(reverse('token_refresh'), {'refresh': str(refresh)})
+
+    def test_logout_revoca_ambos_tokens(self):
+        self.assertEqual(self.client.get(reverse('perfil')).status_code, 200)
+        respuesta = self.client.post(reverse('logout'), {'refresh': str(self.refresh)})
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertEqual(self.client.get(reverse('perfil')).status_code, 401)
+        self.assertEqual(self.renovar(self.refresh).status_code, 401)
+
+    def test_refresh_rotado_no_se_reutiliza(self):
+        respuesta = self.renovar(self.refresh)
+        self.assertEqual(respuesta.status_code, 200)
+        nuevo = respuesta.data['refresh']
+        self.assertEqual(self.renovar(self.refresh).status_code, 401)
+        self.assertEqual(self.renovar(nuevo).status_code, 200)
+
+    def test_renovar_relee_tipo_y_perfil(self):
+        self.usuario.tipo_usuario = TipoUsuario.DOCENTE
+        self.usuario.save()
+        docente = Docente.objects.create(usuario=self.usuario)
+
+        respuesta = self.renovar(self.refresh)
+        self.assertEqual(respuesta.status_code, 200)
+        for token in (AccessToken(respuesta.data['access']), TokenRefresco(respuesta.data['refresh'])):
+            self.assertEqual(token['tipo_usuario'], TipoUsuario.DOCENTE)
+            self.assertEqual(token['docente_id'], docente.pk)
+            self.assertNotIn('estudiante_id', token)
+        usuario, _ = AutenticacionJWT().authenticate(
+            APIRequestFactory().get('/', HTTP_AUTHORIZATION=f"Bearer {respuesta.data['access']}")
+        )
+        self.assertEqual(usuario.perfil_docente.pk, docente.pk)
+
+    @override_settings(REVOCACION_REFRESCO_S=0)
+    def test_revocaciones_persisten_entre_refrescos(self):
+        otro_worker = RegistroRevocados()
+        self.assertFalse(otro_worker.esta_revocado('jti-1'))
+        expira = timezone.now() + timedelta(hours=1)
+
+        RegistroRevocados().revocar('jti-1', expira)
+        self.assertTrue(otro_worker.esta_revocado('jti-1'))
+        RegistroRevocados().revocar('jti-2', expira)
+        self.assertTrue(otro_worker.esta_revocado('jti-2'))
+        # El refresco que trajo jti-2 conserva jti-1 en el filtro
+        self.assertIn('jti-1', otro_worker._filtro)
+        self.assertTrue(otro_worker.esta_revocado('jti-1'))
+
+        with override_settings(REVOCACION_RECONSTRUCCION_S=0):
+            self.assertTrue(otro_worker.esta_revocado('jti-2'))
+        self.assertIn('jti-1', otro_worker._filtro)
+        self.assertIn('jti-2', otro_worker._filtro)
+
+    def test_falso_positivo_se_confirma_en_la_base(self):
+        registro = RegistroRevocados()
+        self.assertFalse(registro.esta_revocado('jti-libre'))
+        # Simula que el JTI colisiona en el filtro sin estar revocado
+        registro._filtro.agregar('jti-libre')
+        with self.assertNumQueries(1):
+            self.assertFalse(registro.esta_revocado('jti-libre'))
+        self.assertFalse(TokenRevocado.objects.filter(jti='jti-libre').exists())
+
+
+@HASHER_RAPIDO
+class PerfilConsultasTest(APITestCase):
+    """Login y perfil con un número fijo de consultas; el PUT guarda solo lo que cambió."""
+
+    def setUp(self):
+        self.usuario = crear_estudiante().usuario
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {TokenRefresco.for_user(self.usuario).access_token}')
+        # Filtro de revocados propio: los de otros tests podrían dar falsos positivos (una consulta más)
+        parche = mock.patch.object(revocacion, '_registro', RegistroRevocados())
+        parche.start()
+        self.addCleanup(parche.stop)
+        # La primera petición del worker carga el filtro
+        self.client.get(reverse('perfil'))
+
+    def actualizar(self, usuario=None, perfil=None):
+        return self.client.put(reverse('perfil'), {'usuario': usuario or {}, 'perfil': perfil or {}}, format='json')
+
+    def test_login_una_consulta(self):
+        # Usuario y perfil en un JOIN; el hash de MD5 no necesita actualizarse
+        with self.assertNumQueries(1):
+            respuesta = APIClient().post(reverse('login'), {'email': self.usuario.email, 'password': 'clave-segura'})
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertEqual(respuesta.data['perfil']['id'], self.usuario.perfil_estudiante.pk)
+
+    def test_get_perfil_una_consulta(self):
+        with self.assertNumQueries(1):
+            respuesta = self.client.get(reverse('perfil'))
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertEqual(respuesta.data['perfil']['id'], self.usuario.perfil_estudiante.pk)
+
+    def test_put_perfil_guarda_solo_lo_que_cambia(self):
+        with mock.patch.object(Usuario, 'save', autospec=True, side_effect=Usuario.save) as guardar_usuario, \
+                mock.patch.object(Estudiante, 'save', autospec=True, side_effect=Estudiante.save) as guardar_perfil, \
+                self.assertNumQueries(3):
+            respuesta = self.actualizar({'nombre': 'Otro', 'apellido': self.usuario.apellido}, {'objetivos': 'Hablar'})
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertEqual(guardar_usuario.call_args.kwargs, {'update_fields': ['nombre', 'updated_at']})
+        self.assertEqual(guardar_perfil.call_args.kwargs, {'update_fields': ['objetivos']})
+        self.assertEqual(respuesta.data['usuario']['nombre'], 'Otro')
+        self.assertEqual(respuesta.data['perfil']['objetivos'], 'Hablar')
+        self.usuario.refresh_from_db()
+        self.assertEqual(self.usuario.nombre, 'Otro')
+
+        # Sin cambios solo se lee
+        with self.assertNumQueries(1):
+            self.assertEqual(self.actualizar({'nombre': 'Otro'}, {'objetivos': 'Hablar'}).status_code, 200)
+
+
+class PoolHashTest(APITestCase):
+    """Con la cola de hash llena el login responde 503; los hashes son los de Django."""
+
+    def test_login_con_cola_llena_responde_503(self):
+        pool = hashers.PoolHash(hilos=1, cola_max=1)
+        ocupado, liberar = threading.Event(), threading.Event()
+
+        def bloquear():
+            ocupado.set()
+            liberar.wait(5)
+
+        hilo = threading.Thread(target=pool.ejecutar, args=(bloquear,))
+        hilo.start()
+        try:
+            self.assertTrue(ocupado.wait(5))
+            with mock.patch.object(hashers, 'pool', pool):
+                respuesta = self.client.post(reverse('login'), {'email': 'nadie@avi.test', 'password': 'x'})
+        finally:
+            liberar.set()
+            hilo.join()
+        self.assertEqual(respuesta.status_code, 503)
+        self.assertGreaterEqual(int(respuesta['Retry-After']), 1)
+        self.assertEqual(respuesta.data['detail'].code, 'servicio_saturado')
+        self.assertEqual(pool.estadisticas()['rechazados'], 1)
+
+    def test_hash_compatible_con_pbkdf2_de_django(self):
+        hasher_pool = hashers.PBKDF2PoolHasher()
+        hasher_django = PBKDF2PasswordHasher()
+        self.assertEqual(hasher_pool.algorithm, hasher_django.algorithm)
+
+        completados = hashers.pool.estadisticas()['completados']
+        codificada = hasher_pool.encode('clave-segura', hasher_pool.salt(), iterations=1000)
+        self.assertEqual(hashers.pool.estadisticas()['completados'], completados + 1)
+        self.assertTrue(hasher_django.verify('clave-segura', codificada))
+        self.assertFalse(hasher_django.verify('otra-clave', codificada))
+
+        codificada = hasher_django.encode('clave-segura', hasher_django.salt(), iterations=1000)
+        self.assertTrue(hasher_pool.verify('clave-segura', codificada))
+
+
+@mock.patch.object(hashers.PBKDF2PoolHasher, 'iterations', 1000)
+class PoolHashConcurrenteTest(APITransactionTestCase):
+    """Con un login por hilo del worker, los que exceden la cola reciben 503."""
+
+    def test_rafaga_de_logins_excede_la_cola(self):
+        usuario = crear_estudiante().usuario
+        pool = hashers.PoolHash()
+        self.assertLess(pool.cola_max, settings.WORKER_HILOS)
+        esperados = settings.WORKER_HILOS - pool.cola_max
+        codificar = PBKDF2PasswordHasher.encode
+
+        def codificar_lento(hasher, *args, **kwargs):
+            # Los hashes admitidos siguen ocupando la cola hasta que llegan los rechazos
+            inicio = time.monotonic()
+            while pool.estadisticas()['rechazados'] < esperados and time.monotonic() - inicio < 5:
+                time.sleep(0.01)
+            return codificar(hasher, *args, **kwargs)
+
+        barrera = threading.Barrier(settings.WORKER_HILOS)
+        respuestas = []
+
+        def login():
+            try:
+                barrera.wait(5)
+                respuesta = APIClient().post(reverse('login'), {'email': usuario.email, 'password': 'clave-segura'})
+                respuestas.append(respuesta)
+            finally:
+                connections.close_all()
+
+        hilos = [threading.Thread(target=login) for _ in range(settings.WORKER_HILOS)]
+        with mock.patch.object(hashers, 'pool', pool), \
+                mock.patch.object(PBKDF2PasswordHasher, 'encode', codificar_lento):
+            for hilo in hilos:
+                hilo.start()
+            for hilo in hilos:
+                hilo.join()
+
+        estados = sorted(respuesta.status_code for respuesta in respuestas)
+        self.assertEqual(estados, [200] * pool.cola_max + [503] * esperados)
+        for respuesta in respuestas:
+            if respuesta.status_code == 503:
+                self.assertGreaterEqual(int(respuesta['Retry-After']), 1)
+        self.assertEqual(pool.estadisticas()['pendientes'], 0)
+
+
+class ImportacionEstudiantesTest(APITestCase):
+    """La importación informa los errores por fila e importa el resto."""
+    ENCABEZADO = 'email,username,nombre,apellido,password\n'
+
+    def importar(self, *filas, importacion=None):
+        importacion = importacion or ImportacionEstudiantes(iteraciones=1, hilos=1)
+        return importacion.ejecutar(io.StringIO(self.ENCABEZADO + ''.join(f'{fila}\n' for fila in filas)))
+
+    def errores_por_fila(self, resumen):
+        return {error['fila']: error['errores'] for error in resumen['errores']}
+
+    def test_errores_por_fila(self):
+        resumen = self.importar(
+            'ana@avi.test,ana,Ana,Pérez,clave-segura-1',
+            'no-es-email,beto,Beto,Díaz,clave-segura-2',
+            'caro@avi.test,caro,Caro,Ríos,123456',
+            'dani@avi.test,danielito,Dani,Soto,danielito1',
+            'eva@avi.test,,Eva,Luna,clave-segura-3',
+        )
+        self.assertEqual((resumen['filas'], resumen['creados']), (5, 1))
+        errores = self.errores_por_fila(resumen)
+        self.assertEqual(sorted(errores), [3, 4, 5, 6])
+        self.assertIn('Email inválido', errores[3])
+        # Validadores de AUTH_PASSWORD_VALIDATORS: común, numérica y parecida al username
+        self.assertTrue(any('común' in error or 'common' in error for error in errores[4]), errores[4])
+        self.assertTrue(any('similar' in error or 'parecida' in error for error in errores[5]), errores[5])
+        self.assertEqual(errores[6], ['Falta username'])
+        usuario = Usuario.objects.get(email='ana@avi.test')
+        self.assertTrue(usuario.check_password('clave-segura-1'))
+        self.assertTrue(Estudiante.objects.filter(usuario=usuario).exists())
+
+    def test_duplicados_en_archivo_y_base(self):
+        crear_estudiante(0)
+        resumen = self.importar(
+            'ana@avi.test,ana,Ana,Pérez,clave-segura-1',
+            'ana@avi.test,ana2,Ana,Pérez,clave-segura-1',
+            'otra@avi.test,ana,Ana,Pérez,clave-segura-1',
+            'estudiante0@avi.test,nuevo,Ana,Pérez,clave-segura-1',
+            'nueva@avi.test,estudiante0,Ana,Pérez,clave-segura-1',
+        )
+        self.assertEqual(resumen['creados'], 1)
+        self.assertEqual(self.errores_por_fila(resumen), {
+            3: ['Email repetido en el archivo'],
+            4: ['Username repetido en el archivo'],
+            5: ['Ya existe un usuario con ese email'],
+            6: ['Ya existe un usuario con ese username'],
+        })
+
+    def test_usuario_creado_durante_la_importacion(self):
+        importacion = ImportacionEstudiantes(iteraciones=1, hilos=1)
+        cargar_docentes = importacion._cargar_docentes
+
+        def cargar_con_carrera(emails):
+            # Otro proceso crea uno de los usuarios después de buscar duplicados en la base
+            Usuario.objects.create_user(email='beto@avi.test', username='otro-beto', password='x')
+            return cargar_docentes(emails)
+
+        with mock.patch.object(importacion, '_cargar_docentes', cargar_con_carrera):
+            resumen = self.importar(
+                'ana@avi.test,ana,Ana,Pérez,clave-segura-1',
+                'beto@avi.test,beto,Beto,Díaz,clave-segura-2',
+                'caro@avi.test,caro,Caro,Ríos,clave-segura-3',
+                importacion=importacion,
+            )
+        self.assertEqual(resumen['creados'], 2)
+        self.assertEqual(self.errores_por_fila(resumen), {3: ['Ya existe un usuario con ese email o username']})
+        self.assertEqual(
+            set(Estudiante.objects.values_list('usuario__email', flat=True)), {'ana@avi.test', 'caro@avi.test'}
+        )
@@ -6,7 +6,7 @@ from rest_framework_simplejwt.views import TokenRefreshView
 
 from .views import (
     RegistroView, LoginView, LogoutView, PerfilView, CambiarPasswordView,
-    EstudianteListView, EstudianteDetailView,
+    EstudianteListView, EstudianteDetailView, ImportarEstudiantesView,
     DocenteListView, DocenteDetailView
 )
 
@@ -22,6 +22,7 @@ urlpatterns = [
     # Estudiantes
     path('estudiantes/', EstudianteListView.as_view(), name='estudiante_list'),
     path('estudiantes/<int:pk>/', EstudianteDetailView.as_view(), name='estudiante_detail'),
+    path('estudiantes/importar/', ImportarEstudiantesView.as_view(), name='estudiante_importar'),
     
     # Docentes
     path('docentes/', DocenteListView.as_view(), name='docente_list'),
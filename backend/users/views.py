@@ -1,14 +1,22 @@
 """
 Views para la app Users - Autenticación y gestión de usuarios.
 """
+import io
+
 from rest_framework import generics, status, permissions
 from rest_framework.response import Response
 from rest_framework.views import APIView
+from rest_framework_simplejwt.exceptions import TokenError
 from rest_framework_simplejwt.tokens import RefreshToken
 from rest_framework_simplejwt.views import TokenObtainPairView
 from django.contrib.auth import authenticate
 
-from .models import Usuario, Estudiante, Docente, Administrador, TipoUsuario
+from . import hashers
+from .autenticacion import TokenRefresco
+from .importacion import ErrorImportacion, ImportacionEstudiantes
+from .models import Usuario, Estudiante, Docente, TipoUsuario
+from .perfiles import guardar_cambios, perfil_de, usuario_con_perfil
+from .revocacion import revocar
 from .serializers import (
     UsuarioSerializer, RegistroUsuarioSerializer, LoginSerializer,
     CambiarPasswordSerializer, EstudianteSerializer, EstudianteUpdateSerializer,
@@ -16,6 +24,22 @@ from .serializers import (
 )
 
 
+# Serializers de lectura y de actualización del perfil de cada tipo de usuario
+SERIALIZERS_PERFIL = {
+    TipoUsuario.ESTUDIANTE: (EstudianteSerializer, EstudianteUpdateSerializer),
+    TipoUsuario.DOCENTE: (DocenteSerializer, DocenteUpdateSerializer),
+    TipoUsuario.ADMINISTRADOR: (AdministradorSerializer, None),
+}
+
+
+def _perfil_serializado(usuario):
+    """Datos del perfil de ``usuario`` según su tipo, o ``None`` si no tiene."""
+    perfil = perfil_de(usuario)
+    if perfil is None:
+        return None
+    return SERIALIZERS_PERFIL[usuario.tipo_usuario][0](perfil).data
+
+
 class RegistroView(generics.CreateAPIView):
     """
     Endpoint para registrar nuevos usuarios.
@@ -26,12 +50,13 @@ class RegistroView(generics.CreateAPIView):
     permission_classes = [permissions.AllowAny]
     
     def create(self, request, *args, **kwargs):
+        hashers.pool.admitir()
         serializer = self.get_serializer(data=request.data)
         serializer.is_valid(raise_exception=True)
         usuario = serializer.save()
         
         # Generar tokens JWT
-        refresh = RefreshToken.for_user(usuario)
+        refresh = TokenRefresco.for_user(usuario)
         
         return Response({
             'mensaje': 'Usuario registrado exitosamente',
@@ -51,29 +76,16 @@ class LoginView(APIView):
     permission_classes = [permissions.AllowAny]
     
     def post(self, request):
+        # Con la cola de hash llena se responde 503 sin consultar la base
+        hashers.pool.admitir()
         serializer = LoginSerializer(data=request.data, context={'request': request})
         serializer.is_valid(raise_exception=True)
         
         usuario = serializer.validated_data['user']
-        refresh = RefreshToken.for_user(usuario)
+        perfil = _perfil_serializado(usuario)
         
-        # Obtener perfil según tipo de usuario
-        perfil = None
-        if usuario.tipo_usuario == TipoUsuario.ESTUDIANTE:
-            try:
-                perfil = EstudianteSerializer(usuario.perfil_estudiante).data
-            except Estudiante.DoesNotExist:
-                pass
-        elif usuario.tipo_usuario == TipoUsuario.DOCENTE:
-            try:
-                perfil = DocenteSerializer(usuario.perfil_docente).data
-            except Docente.DoesNotExist:
-                pass
-        elif usuario.tipo_usuario == TipoUsuario.ADMINISTRADOR:
-            try:
-                perfil = AdministradorSerializer(usuario.perfil_administrador).data
-            except Administrador.DoesNotExist:
-                pass
+        # El perfil vino con el usuario: sus claims no necesitan otra consulta
+        refresh = TokenRefresco.for_user(usuario)
         
         return Response({
             'mensaje': 'Login exitoso',
@@ -88,20 +100,23 @@ class LoginView(APIView):
 
 class LogoutView(APIView):
     """
-    Endpoint para cerrar sesión (invalidar refresh token).
+    Endpoint para cerrar sesión: revoca el refresh token enviado y el access
+    token de la petición.
     POST /api/auth/logout/
     """
     permission_classes = [permissions.IsAuthenticated]
     
     def post(self, request):
-        try:
-            refresh_token = request.data.get('refresh')
-            if refresh_token:
-                token = RefreshToken(refresh_token)
-                token.blacklist()
-            return Response({'mensaje': 'Logout exitoso'})
-        except Exception:
-            return Response({'mensaje': 'Logout exitoso'})
+        refresh_token = request.data.get('refresh')
+        if refresh_token:
+            try:
+                revocar(RefreshToken(refresh_token))
+            except TokenError:
+                # Inválido o expirado: ya no sirve para renovar, no hay nada que revocar
+                pass
+        if request.auth is not None:
+            revocar(request.auth)
+        return Response({'mensaje': 'Logout exitoso'})
 
 
 class PerfilView(APIView):
@@ -112,68 +127,34 @@ class PerfilView(APIView):
     permission_classes = [permissions.IsAuthenticated]
     
     def get(self, request):
-        usuario = request.user
-        
-        # Obtener perfil según tipo
-        perfil = None
-        if usuario.tipo_usuario == TipoUsuario.ESTUDIANTE:
-            try:
-                perfil = EstudianteSerializer(usuario.perfil_estudiante).data
-            except Estudiante.DoesNotExist:
-                pass
-        elif usuario.tipo_usuario == TipoUsuario.DOCENTE:
-            try:
-                perfil = DocenteSerializer(usuario.perfil_docente).data
-            except Docente.DoesNotExist:
-                pass
-        elif usuario.tipo_usuario == TipoUsuario.ADMINISTRADOR:
-            try:
-                perfil = AdministradorSerializer(usuario.perfil_administrador).data
-            except Administrador.DoesNotExist:
-                pass
+        usuario = usuario_con_perfil(request)
         
         return Response({
             'usuario': UsuarioSerializer(usuario).data,
-            'perfil': perfil
+            'perfil': _perfil_serializado(usuario)
         })
     
     def put(self, request):
-        usuario = request.user
+        usuario = usuario_con_perfil(request)
         
-        # Actualizar datos del usuario
+        # Actualizar datos del usuario (solo los campos que cambian)
         usuario_data = request.data.get('usuario', {})
-        for field in ['nombre', 'apellido', 'avatar_url']:
-            if field in usuario_data:
-                setattr(usuario, field, usuario_data[field])
-        usuario.save()
+        guardar_cambios(usuario, {
+            campo: usuario_data[campo] for campo in ['nombre', 'apellido', 'avatar_url'] if campo in usuario_data
+        })
         
         # Actualizar perfil según tipo
-        perfil_data = request.data.get('perfil', {})
-        perfil = None
-        
-        if usuario.tipo_usuario == TipoUsuario.ESTUDIANTE:
-            try:
-                estudiante = usuario.perfil_estudiante
-                serializer = EstudianteUpdateSerializer(estudiante, data=perfil_data, partial=True)
-                if serializer.is_valid():
-                    serializer.save()
-                perfil = EstudianteSerializer(estudiante).data
-            except Estudiante.DoesNotExist:
-                pass
-        elif usuario.tipo_usuario == TipoUsuario.DOCENTE:
-            try:
-                docente = usuario.perfil_docente
-                serializer = DocenteUpdateSerializer(docente, data=perfil_data, partial=True)
-                if serializer.is_valid():
-                    serializer.save()
-                perfil = DocenteSerializer(docente).data
-            except Docente.DoesNotExist:
-                pass
+        perfil = perfil_de(usuario)
+        _, update_serializer = SERIALIZERS_PERFIL.get(usuario.tipo_usuario, (None, None))
+        if perfil is not None and update_serializer is not None:
+            serializer = update_serializer(perfil, data=request.data.get('perfil', {}), partial=True)
+            if serializer.is_valid():
+                guardar_cambios(perfil, serializer.validated_data)
         
         return Response({
             'mensaje': 'Perfil actualizado',
             'usuario': UsuarioSerializer(usuario).data,
-            'perfil': perfil
+            'perfil': _perfil_serializado(usuario)
         })
 
 
@@ -247,6 +228,50 @@ class EstudianteDetailView(generics.RetrieveUpdateAPIView):
         return EstudianteSerializer
 
 
+class ImportarEstudiantesView(APIView):
+    """
+    Importar estudiantes desde un CSV (solo administradores). Campo
+    ``archivo`` con el CSV y, opcionalmente, ``docente`` (email) al que se
+    asignan las filas sin docente. Ver ``users/importacion.py``.
+    POST /api/estudiantes/importar/
+    """
+    permission_classes = [permissions.IsAuthenticated]
+    
+    def post(self, request):
+        if request.user.tipo_usuario != TipoUsuario.ADMINISTRADOR:
+            return Response(
+                {'error': 'Solo disponible para administradores'},
+                status=status.HTTP_403_FORBIDDEN
+            )
+        
+        archivo = request.FILES.get('archivo')
+        if archivo is None:
+            return Response(
+                {'error': 'Debe enviar el CSV en el campo "archivo"'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        docente = None
+        if request.data.get('docente'):
+            try:
+                docente = Docente.objects.get(usuario__email=request.data['docente'])
+            except Docente.DoesNotExist:
+                return Response(
+                    {'error': 'Docente no encontrado'},
+                    status=status.HTTP_404_NOT_FOUND
+                )
+        
+        texto = io.TextIOWrapper(archivo.file, encoding='utf-8-sig', newline='')
+        try:
+            resumen = ImportacionEstudiantes(docente=docente).ejecutar(texto)
+        except ErrorImportacion as exc:
+            return Response({'error': str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+        finally:
+            texto.detach()
+        
+        return Response(resumen)
+
+
 # ==================== CRUD DOCENTES ====================
 
 class DocenteListView(generics.ListAPIView):